@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+ViewGuard Auto-Tuning
+Sweeps the detection server's inference settings on this machine and writes a
+profile that detection_server.py loads at startup.
+
+Every combination of model input size (imgsz), worker count, threads per worker
+and batch size pushes the same JPEG frames through the server's own worker pool
+(create_executor + decode_and_detect_batch), keeping one batch in flight per
+worker like the scheduler does. Each one is measured for throughput and p95
+batch latency (the time a frame spends in decode + inference). Torch sets its
+thread count per process, so with the ultralytics backend thread workers are
+swept over one shared thread count instead of threads per worker.
+
+The best configuration is the fastest one whose p95 latency fits --max-p95-ms.
+With --target-fps, it is the one with the largest imgsz (the most accurate) that
+still reaches the target, so input size is only given up when the hardware
+needs it.
+
+The profile stores the chosen settings as VIEWGUARD_* variables, together with
+the CPU and model it was measured on. `python detection_server.py` uses them for
+the variables the environment leaves unset, and ignores a profile measured on
+another CPU or model.
+
+Usage:
+    python autotune.py                                  # sample video, write the profile
+    python autotune.py --target-fps 30 --max-p95-ms 300
+    python autotune.py --synthetic --imgsz 320 640 --batch-sizes 1 4
+    python autotune.py --show                           # print the current profile
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional
+
+DEFAULT_PROFILE_PATH = os.getenv("VIEWGUARD_PROFILE",
+                                 str(Path.home() / ".cache" / "viewguard" / "autotune_profile.json"))
+PROFILE_VERSION = 2  # 2: the model identity includes imgsz
+DEFAULT_VIDEO = Path(__file__).parent / "public" / "videos" / "vandalism" / "Vandalism005_x264.mp4"
+
+# Settings a profile may set, in the order they are printed
+TUNED_SETTINGS = ["VIEWGUARD_IMGSZ", "VIEWGUARD_EXECUTOR", "VIEWGUARD_WORKERS", "VIEWGUARD_WORKER_THREADS",
+                  "VIEWGUARD_MAX_BATCH_SIZE"]
+
+
+def machine() -> Dict:
+    """What a profile is only valid for: the CPU it was measured on"""
+    model = platform.processor()
+    try:
+        with open("/proc/cpuinfo") as f:
+            model = next((line.split(":", 1)[1].strip() for line in f if line.startswith("model name")), model)
+    except OSError:
+        pass
+    return {"cpu_model": model, "cpu_count": os.cpu_count(), "platform": platform.platform()}
+
+
+def model_identity() -> Dict:
+    """The model the server would load (detectors.resolve_model): backend, weights file name and input size"""
+    from detectors import resolve_model
+
+    backend, weights, imgsz = resolve_model()
+    return {"backend": backend, "weights": Path(weights).name, "imgsz": imgsz}
+
+
+def load_profile(path: str = DEFAULT_PROFILE_PATH) -> Optional[Dict]:
+    if not path or not Path(path).exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def resolve_profile(path: str = DEFAULT_PROFILE_PATH) -> Dict:
+    """
+    The profile's VIEWGUARD_* settings that the environment doesn't set ("applied"),
+    for the caller to pass on; os.environ is left alone. Also lists the ones the
+    environment overrode, or why the profile was ignored, for logging.
+    """
+    status = {"path": path, "applied": {}, "overridden": [], "ignored": None}
+    try:
+        profile = load_profile(path)
+    except (OSError, ValueError) as e:
+        status["ignored"] = f"unreadable ({e})"
+        return status
+    if profile is None:
+        status["ignored"] = "not found"
+        return status
+
+    current = machine()
+    if profile.get("version") != PROFILE_VERSION:
+        status["ignored"] = f"version {profile.get('version')} (expected {PROFILE_VERSION})"
+    elif (profile["machine"]["cpu_model"], profile["machine"]["cpu_count"]) != (current["cpu_model"], current["cpu_count"]):
+        status["ignored"] = (f"measured on {profile['machine']['cpu_count']} x {profile['machine']['cpu_model']}, "
+                             f"this is {current['cpu_count']} x {current['cpu_model']}")
+    elif profile["model"] != model_identity():
+        status["ignored"] = f"measured for {profile['model']}, this server runs {model_identity()}"
+    if status["ignored"]:
+        return status
+
+    for name, value in profile["settings"].items():
+        if name in os.environ:
+            status["overridden"].append(name)
+        else:
+            status["applied"][name] = value
+    return status
+
+
+def load_payloads(video: Optional[Path], frames: int, size) -> List[bytes]:
+    """JPEG frames as the browser client sends them: from a sample video, or synthetic when video is None"""
+    import cv2
+    import numpy as np
+
+    images = []
+    if video is not None:
+        from frame_sampling import FrameSampler
+
+        with FrameSampler(video) as sampler:
+            every = max(1, sampler.total_frames // frames)
+        with FrameSampler(video, every=every) as sampler:
+            images = [cv2.resize(frame, size) for _, frame in sampler][:frames]
+    else:
+        # Moving bright rectangles on a noisy gradient: compresses and decodes like camera footage
+        rng = np.random.default_rng(0)
+        background = np.linspace(40, 200, size[0], dtype=np.float32)[None, :, None].repeat(size[1], 0).repeat(3, 2)
+        for i in range(frames):
+            frame = (background + rng.normal(0, 8, background.shape)).clip(0, 255).astype(np.uint8)
+            for k in range(3):
+                x = (i * 7 + k * size[0] // 3) % (size[0] - size[0] // 8)
+                y = size[1] // 3 + k * 10
+                cv2.rectangle(frame, (x, y), (x + size[0] // 16, y + size[1] // 3), (200, 190, 180), -1)
+            images.append(frame)
+    if not images:
+        raise RuntimeError(f"No frames decoded from {video}")
+    return [cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 80])[1].tobytes() for image in images]
+
+
+def measure(executor_backend: str, workers: int, threads: int, batch_size: int, imgsz: int,
+            payloads: List[bytes]) -> Dict:
+    """Throughput and batch latency of one configuration, on a fresh worker pool"""
+    import numpy as np
+
+    import detection_server
+
+    executor = detection_server.create_executor(executor_backend, workers, threads)
+    batches = [payloads[i:i + batch_size] for i in range(0, len(payloads) - batch_size + 1, batch_size)]
+    options = [{"imgsz": imgsz}] * batch_size
+    thresholds = [0.5] * batch_size
+    latencies = []
+    try:
+        # Load and warm up every worker at this input size (first-call allocations)
+        for future in [executor.submit(detection_server.decode_and_detect_batch, batches[0], thresholds, None, options)
+                       for _ in range(workers * 2)]:
+            future.result()
+
+        inflight = deque()
+        started = time.perf_counter()
+        for batch in batches:
+            if len(inflight) >= workers:
+                _, future = inflight.popleft()
+                future.result()
+            submitted = time.perf_counter()
+            future = executor.submit(detection_server.decode_and_detect_batch, batch, thresholds, None, options)
+            future.add_done_callback(lambda _, submitted=submitted: latencies.append(time.perf_counter() - submitted))
+            inflight.append((submitted, future))
+        for _, future in inflight:
+            future.result()
+        elapsed = time.perf_counter() - started
+    finally:
+        executor.shutdown(wait=True)
+
+    p50, p95 = np.percentile(np.array(latencies) * 1000, [50, 95])
+    return {"imgsz": imgsz, "executor": executor_backend, "workers": workers, "threads": threads,
+            "batch_size": batch_size, "fps": round(len(batches) * batch_size / elapsed, 2),
+            "p50_ms": round(float(p50), 1), "p95_ms": round(float(p95), 1)}
+
+
+def choose(results: List[Dict], max_p95_ms: float, target_fps: float) -> Optional[Dict]:
+    """The configuration the profile should use (see the module docstring), or None if none fits the latency"""
+    candidates = [r for r in results if "error" not in r and r["p95_ms"] <= max_p95_ms]
+    if not candidates:
+        return None
+    if target_fps > 0:
+        fast_enough = [r for r in candidates if r["fps"] >= target_fps]
+        if fast_enough:
+            return max(fast_enough, key=lambda r: (r["imgsz"], r["fps"]))
+        return max(candidates, key=lambda r: r["fps"])
+    largest = max(r["imgsz"] for r in candidates)
+    return max((r for r in candidates if r["imgsz"] == largest), key=lambda r: r["fps"])
+
+
+def worker_layouts(cpus: int, workers: Optional[List[int]], threads: Optional[List[int]],
+                   shared_threads: bool = False):
+    """
+    (workers, threads per worker) pairs that don't oversubscribe the CPU. With
+    shared_threads (thread workers of a backend whose thread count is process-wide,
+    like torch) all workers run on one pool, so the thread count is swept as a single
+    global value: all cores, or each of `threads`, whatever the worker count.
+    """
+    if not workers:
+        workers, n = [], 1
+        while n < cpus:
+            workers.append(n)
+            n *= 2
+        workers.append(cpus)
+    layouts = []
+    for count in workers:
+        if shared_threads:
+            layouts.extend((count, total) for total in threads or [cpus] if total <= cpus)
+            continue
+        for per_worker in threads or [max(1, cpus // count)]:
+            if count * per_worker <= max(cpus, count):
+                layouts.append((count, per_worker))
+    return layouts
+
+
+def write_profile(path: Path, best: Dict, results: List[Dict], args) -> Dict:
+    profile = {
+        "version": PROFILE_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": machine(),
+        "model": model_identity(),
+        "settings": {
+            "VIEWGUARD_IMGSZ": best["imgsz"],
+            "VIEWGUARD_EXECUTOR": best["executor"],
+            "VIEWGUARD_WORKERS": best["workers"],
+            "VIEWGUARD_WORKER_THREADS": best["threads"],
+            "VIEWGUARD_MAX_BATCH_SIZE": best["batch_size"],
+        },
+        "criteria": {"max_p95_ms": args.max_p95_ms, "target_fps": args.target_fps},
+        "best": best,
+        "results": results,
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(profile, f, indent=2)
+    os.replace(tmp, path)
+    return profile
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find the fastest detection server settings for this machine")
+    parser.add_argument("--profile", type=Path, default=Path(DEFAULT_PROFILE_PATH),
+                        help="Where to write the profile (env: VIEWGUARD_PROFILE)")
+    parser.add_argument("--show", action="store_true", help="Print the current profile and exit")
+    parser.add_argument("--video", type=Path, default=DEFAULT_VIDEO)
+    parser.add_argument("--synthetic", action="store_true", help="Generated frames instead of a video")
+    parser.add_argument("--frames", type=int, default=64, help="Frames pushed through each configuration")
+    parser.add_argument("--frame-size", default="1280x720", help="Camera resolution, WIDTHxHEIGHT")
+    parser.add_argument("--imgsz", type=int, nargs="+", default=[320, 480, 640])
+    parser.add_argument("--workers", type=int, nargs="+", help="Worker counts (default: 1, 2, 4, ... up to the CPU count)")
+    parser.add_argument("--threads", type=int, nargs="+", help="Threads per worker (default: CPU cores / workers)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--executors", nargs="+", choices=["thread", "process"], default=["thread"])
+    parser.add_argument("--max-p95-ms", type=float, default=500, help="Latency budget per batch (default: 500)")
+    parser.add_argument("--target-fps", type=float, default=0,
+                        help="Frames per second to sustain; allows a smaller imgsz when the largest is too slow")
+    parser.add_argument("--dry-run", action="store_true", help="Measure and print, but don't write the profile")
+    args = parser.parse_args()
+
+    if args.show:
+        profile = load_profile(str(args.profile))
+        if profile is None:
+            print(f"❌ No profile at {args.profile}")
+            sys.exit(1)
+        print(json.dumps({key: profile[key] for key in ["created", "machine", "model", "settings", "best"]}, indent=2))
+        return
+
+    os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")
+    import cv2
+
+    import detection_server
+
+    cv2.setNumThreads(1)
+    width, height = (int(value) for value in args.frame_size.lower().split("x"))
+    payloads = load_payloads(None if args.synthetic else args.video, args.frames, (width, height))
+    cpus = os.cpu_count() or 1
+    detector = detection_server.load_detector()
+    # Torch's thread count is per process: thread workers can only share one, process workers each have their own
+    layouts = {executor_backend: worker_layouts(cpus, args.workers, args.threads,
+                                                detector.shared_threads and executor_backend == "thread")
+               for executor_backend in args.executors}
+
+    print("=" * 70)
+    print("ViewGuard Auto-Tuning")
+    print("=" * 70)
+    print(f"CPU: {cpus} x {machine()['cpu_model']}")
+    print(f"Model: {detector.describe()}")
+    print(f"Frames: {len(payloads)} at {width}x{height} ({'synthetic' if args.synthetic else args.video.name})")
+    print(f"Configurations: {len(args.imgsz) * sum(map(len, layouts.values())) * len(args.batch_sizes)}")
+    if detector.shared_threads and "thread" in args.executors:
+        print(f"Thread workers share {detector.backend}'s process-wide thread count: threads is the total for them")
+    print()
+    print(f"{'imgsz':>6}{'executor':>10}{'workers':>9}{'threads':>9}{'batch':>7}{'fps':>10}{'p50 ms':>9}{'p95 ms':>9}")
+    print("-" * 69)
+
+    results = []
+    for imgsz in args.imgsz:
+        for executor_backend in args.executors:
+            for workers, threads in layouts[executor_backend]:
+                for batch_size in args.batch_sizes:
+                    try:
+                        result = measure(executor_backend, workers, threads, batch_size, imgsz, payloads)
+                    except Exception as e:
+                        # e.g. an ONNX model exported with a fixed input size
+                        result = {"imgsz": imgsz, "executor": executor_backend, "workers": workers,
+                                  "threads": threads, "batch_size": batch_size, "error": str(e)}
+                        print(f"{imgsz:>6}{executor_backend:>10}{workers:>9}{threads:>9}{batch_size:>7}  ❌ {e}")
+                    else:
+                        print(f"{imgsz:>6}{executor_backend:>10}{workers:>9}{threads:>9}{batch_size:>7}"
+                              f"{result['fps']:>10.1f}{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}")
+                    results.append(result)
+
+    best = choose(results, args.max_p95_ms, args.target_fps)
+    if best is None:
+        print(f"\n❌ No configuration kept p95 latency under {args.max_p95_ms:.0f} ms; try --max-p95-ms or fewer --batch-sizes")
+        sys.exit(1)
+    print(f"\n✅ Best: imgsz {best['imgsz']}, {best['workers']} {best['executor']} workers x {best['threads']} threads, "
+          f"batch {best['batch_size']}: {best['fps']:.1f} fps, p95 {best['p95_ms']:.0f} ms")
+    if args.target_fps > 0 and best["fps"] < args.target_fps:
+        print(f"⚠️  No configuration reaches {args.target_fps:.0f} fps; this is the fastest one")
+    baseline = next((r for r in results if "error" not in r and r["imgsz"] == max(args.imgsz)
+                     and r["workers"] == 1 and r["batch_size"] == 1), None)
+    if baseline:
+        print(f"   vs {baseline['fps']:.1f} fps with 1 worker, batch 1 at imgsz {baseline['imgsz']} "
+              f"({best['fps'] / baseline['fps']:.1f}x)")
+
+    if args.dry_run:
+        return
+    profile = write_profile(args.profile, best, results, args)
+    print(f"💾 Saved: {args.profile}")
+    print("   detection_server.py applies it at startup: " +
+          " ".join(f"{name}={profile['settings'][name]}" for name in TUNED_SETTINGS))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,493 @@
+#!/usr/bin/env python3
+"""
+ViewGuard Bounding Box Format (v2)
+Stores pre-computed bounding boxes as keyframe-only columnar arrays instead of
+one JSON dictionary per frame.
+
+v1 (`*_boxes.json` from older generate_bounding_boxes runs) repeats the last
+keyframe's boxes for every frame in between. v2 keeps only the keyframes:
+
+    keyframes    [K]      frame index of each keyframe, increasing
+    box_offsets  [K + 1]  boxes of keyframe k are box_offsets[k]:box_offsets[k + 1]
+    boxes        [B * 4]  x1, y1, x2, y2 as int16, flattened
+    confidences  [B]      confidence * 255 as uint8
+    track_ids    [B]      optional, persistent track ID of each box (see tracking.py)
+
+A frame uses the boxes of the last keyframe at or before it, found by binary
+search. When the file has track IDs, boxes whose track also appears in the next
+keyframe are linearly interpolated towards it instead of holding still.
+
+v2 is written as compact JSON (`*_boxes.json`, with "version": 2) and
+optionally as a little-endian binary blob (`*_boxes.bbx`) that can be
+memory-mapped or range-read:
+
+    offset 0   BINARY_HEADER (44 bytes): magic "VGBB", uint16 version, uint16 name_length,
+               uint32 width, uint32 height, float64 fps, uint32 frame_count,
+               uint32 total_frames, uint32 frame_interval, uint32 K, uint32 B
+    then       uint32 keyframes[K], uint32 box_offsets[K + 1], int16 boxes[B * 4],
+               uint8 confidences[B], (version 3 only) int32 track_ids[B],
+               utf-8 video name[name_length]
+
+The binary header says version 3 when the track_ids column is present, so
+untracked files are unchanged.
+
+Usage:
+    # Convert existing v1 files in place, also writing .bbx blobs
+    python bbox_format.py convert public/bounding_boxes/*_boxes.json --binary
+"""
+
+import argparse
+import json
+import os
+import shutil
+import struct
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from result_log import write_json_stream
+from tracking import interpolate_boxes
+
+FORMAT_VERSION = 2
+BINARY_VERSION_TRACKED = 3
+BINARY_MAGIC = b"VGBB"
+BINARY_HEADER = struct.Struct("<4sHHIIdIIIII")
+INT16_MAX = np.iinfo(np.int16).max
+
+
+class BoxTrack:
+    """Keyframe boxes for one video, with lookup of any frame by binary search"""
+
+    def __init__(self, video_info: Dict, frame_count: int, keyframes: np.ndarray, box_offsets: np.ndarray,
+                 boxes: np.ndarray, confidences: np.ndarray, track_ids: Optional[np.ndarray] = None):
+        self.video_info = video_info
+        self.frame_count = frame_count  # frames in the video; lookups past the end return no boxes
+        self.keyframes = keyframes  # uint32 [K]
+        self.box_offsets = box_offsets  # uint32 [K + 1]
+        self.boxes = boxes.reshape(-1, 4)  # [B, 4] x1, y1, x2, y2
+        self.confidences = confidences  # float32 [B]
+        self.track_ids = track_ids  # int32 [B], or None if the boxes were not tracked
+
+    @classmethod
+    def from_keyframes(cls, video_info: Dict, frame_count: int,
+                       keyframe_results: Dict[int, Tuple]) -> "BoxTrack":
+        """Build a track from {frame_index: (boxes, confidences[, track_ids])} for every keyframe"""
+        keyframes = np.array(sorted(keyframe_results), dtype=np.uint32)
+        counts = [len(keyframe_results[k][0]) for k in keyframes]
+        box_offsets = np.zeros(len(keyframes) + 1, dtype=np.uint32)
+        np.cumsum(counts, out=box_offsets[1:])
+
+        boxes = [box for k in keyframes for box in keyframe_results[k][0]]
+        confidences = [c for k in keyframes for c in keyframe_results[k][1]]
+        track_ids = None
+        if keyframes.size and all(len(result) > 2 and result[2] is not None for result in keyframe_results.values()):
+            track_ids = np.array([t for k in keyframes for t in keyframe_results[k][2]], dtype=np.int32)
+        return cls(video_info, frame_count, keyframes, box_offsets,
+                   np.array(boxes, dtype=np.int64).reshape(-1, 4), np.array(confidences, dtype=np.float32),
+                   track_ids)
+
+    @classmethod
+    def from_v1(cls, data: Dict) -> "BoxTrack":
+        """Build a track from a v1 per-frame dictionary, keeping only the keyframes"""
+        frames = data["frames"]
+        keyframe_results = {int(index): (frame["boxes"], frame["confidences"], frame.get("track_ids"))
+                            for index, frame in frames.items() if frame["is_keyframe"]}
+        return cls.from_keyframes(data["video_info"], len(frames), keyframe_results)
+
+    @classmethod
+    def from_v2(cls, data: Dict) -> "BoxTrack":
+        return cls(data["video_info"], data["frame_count"],
+                   np.array(data["keyframes"], dtype=np.uint32),
+                   np.array(data["box_offsets"], dtype=np.uint32),
+                   np.array(data["boxes"], dtype=np.int16),
+                   np.array(data["confidences"], dtype=np.uint8) / np.float32(255),
+                   np.array(data["track_ids"], dtype=np.int32) if "track_ids" in data else None)
+
+    def keyframe_position(self, frame_index: int) -> int:
+        """Position in `keyframes` of the last keyframe at or before frame_index, or -1"""
+        if frame_index < 0 or frame_index >= self.frame_count:
+            return -1
+        return int(np.searchsorted(self.keyframes, frame_index, side="right")) - 1
+
+    def _keyframe_slice(self, position: int) -> slice:
+        return slice(int(self.box_offsets[position]), int(self.box_offsets[position + 1]))
+
+    def _segment_boxes(self, position: int, frame_indices: np.ndarray) -> np.ndarray:
+        """Boxes of keyframe `position` at each of frame_indices (all before the next keyframe), [F, N, 4]"""
+        current = self._keyframe_slice(position)
+        boxes = self.boxes[current]
+        if self.track_ids is None or position + 1 >= len(self.keyframes):
+            return np.broadcast_to(boxes, (len(frame_indices), *boxes.shape))
+        following = self._keyframe_slice(position + 1)
+        start, end = int(self.keyframes[position]), int(self.keyframes[position + 1])
+        alphas = (np.asarray(frame_indices) - start) / (end - start)
+        interpolated = interpolate_boxes(boxes, self.track_ids[current], self.boxes[following],
+                                         self.track_ids[following], alphas)
+        return np.rint(interpolated).astype(self.boxes.dtype)
+
+    def frame(self, frame_index: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Boxes [N, 4] (x1, y1, x2, y2) and confidences [N] shown at frame_index"""
+        position = self.keyframe_position(frame_index)
+        if position < 0:
+            return self.boxes[:0], self.confidences[:0]
+        return self._segment_boxes(position, np.array([frame_index]))[0], self.confidences[self._keyframe_slice(position)]
+
+    def frame_track_ids(self, frame_index: int) -> Optional[np.ndarray]:
+        """Track IDs [N] of the boxes shown at frame_index, or None if the boxes were not tracked"""
+        if self.track_ids is None:
+            return None
+        position = self.keyframe_position(frame_index)
+        return self.track_ids[:0] if position < 0 else self.track_ids[self._keyframe_slice(position)]
+
+    def window(self, start_frame: int, end_frame: int) -> "BoxTrack":
+        """The keyframes needed to show frames start_frame to end_frame: from the last one at or before
+        start_frame through the first one after end_frame, which boxes are interpolated towards"""
+        first = max(0, int(np.searchsorted(self.keyframes, start_frame, side="right")) - 1)
+        last = min(len(self.keyframes), int(np.searchsorted(self.keyframes, end_frame, side="right")) + 1)
+        first = min(first, last)
+        boxes = slice(int(self.box_offsets[first]), int(self.box_offsets[last]))
+        return BoxTrack(self.video_info, self.frame_count, self.keyframes[first:last],
+                        self.box_offsets[first:last + 1] - self.box_offsets[first], self.boxes[boxes],
+                        self.confidences[boxes], None if self.track_ids is None else self.track_ids[boxes])
+
+    def to_v1(self) -> Dict:
+        """Expand to the v1 per-frame dictionary (what older readers expect)"""
+        frames = {}
+        for position, keyframe in enumerate(self.keyframes.tolist()):
+            end = int(self.keyframes[position + 1]) if position + 1 < len(self.keyframes) else self.frame_count
+            indices = np.arange(keyframe, min(end, self.frame_count))
+            confidences = self.confidences[self._keyframe_slice(position)].astype(float).tolist()
+            track_ids = None if self.track_ids is None else self.track_ids[self._keyframe_slice(position)].tolist()
+            for index, boxes in zip(indices.tolist(), self._segment_boxes(position, indices)):
+                frames[str(index)] = _v1_entry(boxes.astype(np.int64).tolist(), confidences,
+                                               index == keyframe, track_ids)
+        empty = _v1_entry([], [], False, None if self.track_ids is None else [])
+        frames = {str(index): frames.get(str(index), empty) for index in range(self.frame_count)}
+        return {"video_info": self.video_info, "frames": frames}
+
+    def to_v2(self) -> Dict:
+        return {
+            "version": FORMAT_VERSION,
+            "video_info": self.video_info,
+            "frame_count": self.frame_count,
+            "keyframes": self.keyframes.tolist(),
+            "box_offsets": self.box_offsets.tolist(),
+            "boxes": _pack_boxes(self.boxes).ravel().tolist(),
+            "confidences": _pack_confidences(self.confidences).tolist(),
+            **({} if self.track_ids is None else {"track_ids": self.track_ids.tolist()}),
+        }
+
+    def to_binary(self) -> bytes:
+        info = self.video_info
+        name = info.get("name", "").encode("utf-8")
+        version = FORMAT_VERSION if self.track_ids is None else BINARY_VERSION_TRACKED
+        header = BINARY_HEADER.pack(BINARY_MAGIC, version, len(name), info["width"], info["height"],
+                                    info["fps"], self.frame_count, info.get("total_frames", self.frame_count),
+                                    info.get("frame_interval", 0), len(self.keyframes), len(self.boxes))
+        return b"".join([
+            header,
+            self.keyframes.astype("<u4").tobytes(),
+            self.box_offsets.astype("<u4").tobytes(),
+            _pack_boxes(self.boxes).astype("<i2").tobytes(),
+            _pack_confidences(self.confidences).tobytes(),
+            b"" if self.track_ids is None else self.track_ids.astype("<i4").tobytes(),
+            name,
+        ])
+
+
+def _v1_entry(boxes: List, confidences: List, is_keyframe: bool, track_ids: Optional[List]) -> Dict:
+    entry = {"boxes": boxes, "confidences": confidences, "is_keyframe": is_keyframe}
+    if track_ids is not None:
+        entry["track_ids"] = track_ids
+    return entry
+
+
+def _pack_boxes(boxes: np.ndarray) -> np.ndarray:
+    return np.clip(boxes, 0, INT16_MAX).astype(np.int16)
+
+
+def _pack_confidences(confidences: np.ndarray) -> np.ndarray:
+    return np.clip(np.rint(np.asarray(confidences, dtype=np.float32) * 255), 0, 255).astype(np.uint8)
+
+
+def parse_binary(buffer: Union[bytes, memoryview, np.ndarray]) -> BoxTrack:
+    """Read a .bbx blob. Arrays are views into `buffer`, so a memory map is not copied."""
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    (magic, version, name_length, width, height, fps, frame_count, total_frames, frame_interval,
+     keyframe_count, box_count) = BINARY_HEADER.unpack_from(data)
+    if magic != BINARY_MAGIC:
+        raise ValueError(f"Not a ViewGuard bounding box file (magic {magic!r})")
+    if version not in (FORMAT_VERSION, BINARY_VERSION_TRACKED):
+        raise ValueError(f"Unsupported bounding box format version: {version}")
+
+    offset = BINARY_HEADER.size
+
+    def take(dtype: str, count: int) -> np.ndarray:
+        nonlocal offset
+        array = np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+        offset += array.nbytes
+        return array
+
+    keyframes = take("<u4", keyframe_count)
+    box_offsets = take("<u4", keyframe_count + 1)
+    boxes = take("<i2", box_count * 4)
+    confidences = take("u1", box_count) / np.float32(255)
+    track_ids = take("<i4", box_count) if version == BINARY_VERSION_TRACKED else None
+    name = bytes(data[offset:offset + name_length]).decode("utf-8")
+
+    video_info = {"name": name, "width": width, "height": height, "fps": fps,
+                  "total_frames": total_frames, "frame_interval": frame_interval}
+    return BoxTrack(video_info, frame_count, keyframes, box_offsets, boxes, confidences, track_ids)
+
+
+def load_boxes(path: Union[str, Path], mmap: bool = True) -> BoxTrack:
+    """Load a bounding box file: v1 or v2 JSON, or a .bbx blob (memory-mapped by default)"""
+    path = Path(path)
+    if path.suffix == ".bbx":
+        if mmap:
+            return parse_binary(np.memmap(path, dtype=np.uint8, mode="r"))
+        return parse_binary(path.read_bytes())
+
+    with open(path) as f:
+        data = json.load(f)
+    if data.get("version") == FORMAT_VERSION:
+        return BoxTrack.from_v2(data)
+    return BoxTrack.from_v1(data)
+
+
+def _write_atomic(path: Path, content: Union[str, bytes]):
+    """Write via a temporary file so readers never see a partial file"""
+    temp_path = path.with_name(path.name + ".tmp")
+    with open(temp_path, "wb" if isinstance(content, bytes) else "w") as f:
+        f.write(content)
+    os.replace(temp_path, path)
+
+
+def save_json(track: BoxTrack, path: Union[str, Path], version: int = FORMAT_VERSION):
+    """Write v2 as compact JSON, or v1 with indent=2 as older tooling expects"""
+    if version == 1:
+        _write_atomic(Path(path), json.dumps(track.to_v1(), indent=2))
+    else:
+        _write_atomic(Path(path), json.dumps(track.to_v2(), separators=(",", ":")))
+
+
+def save_binary(track: BoxTrack, path: Union[str, Path]):
+    _write_atomic(Path(path), track.to_binary())
+
+
+class _ColumnSpool:
+    """One v2 array column, spooled to temporary files while the keyframes stream past"""
+
+    def __init__(self, directory: Path, name: str, text: bool, binary: bool, dtype: str):
+        self.dtype = dtype
+        self.text = open(directory / f"{name}.txt", "w+") if text else None
+        self.raw = open(directory / f"{name}.bin", "w+b") if binary else None
+        self.empty = True
+
+    def extend(self, values: np.ndarray):
+        if len(values) == 0:
+            return
+        if self.text:
+            self.text.write(("" if self.empty else ",") + ",".join(map(str, values.tolist())))
+        if self.raw:
+            self.raw.write(values.astype(self.dtype).tobytes())
+        self.empty = False
+
+    def copy_text(self, out):
+        self.text.seek(0)
+        shutil.copyfileobj(self.text, out)
+
+    def copy_raw(self, out):
+        self.raw.seek(0)
+        shutil.copyfileobj(self.raw, out)
+
+    def close(self):
+        for f in (self.text, self.raw):
+            if f:
+                f.close()
+
+
+def write_track_stream(keyframes: Iterable[Tuple], video_info: Dict, frame_count: int,
+                       json_path: Union[str, Path], version: int = FORMAT_VERSION, binary: bool = False,
+                       tracked: bool = False):
+    """
+    Write the same files as save_json / save_binary from (frame_index, boxes,
+    confidences) keyframes in increasing frame order, in one pass and constant
+    memory. With `tracked`, each keyframe is (frame_index, boxes, confidences,
+    track_ids) and the track_ids column is written too. v2 columns are spooled
+    to temporary files and stitched together at the end; v1 frames are written
+    as they are expanded.
+    """
+    json_path = Path(json_path)
+    with tempfile.TemporaryDirectory(dir=json_path.parent) as spool_dir:
+        spool_dir = Path(spool_dir)
+        text = version != 1
+        column_types = [("keyframes", "<u4"), ("box_offsets", "<u4"), ("boxes", "<i2"), ("confidences", "u1")]
+        if tracked:
+            column_types.append(("track_ids", "<i4"))
+        columns = {name: _ColumnSpool(spool_dir, name, text, binary, dtype) for name, dtype in column_types}
+        counts = {"keyframes": 0, "boxes": 0}
+        columns["box_offsets"].extend(np.zeros(1, dtype=np.int64))
+
+        def spooled() -> Iterator[Tuple]:
+            for keyframe in keyframes:
+                frame_index, boxes, confidences = keyframe[:3]
+                boxes_array = np.array(boxes, dtype=np.int64).reshape(-1, 4)
+                counts["keyframes"] += 1
+                counts["boxes"] += len(boxes_array)
+                columns["keyframes"].extend(np.array([frame_index], dtype=np.int64))
+                columns["box_offsets"].extend(np.array([counts["boxes"]], dtype=np.int64))
+                columns["boxes"].extend(_pack_boxes(boxes_array).ravel())
+                columns["confidences"].extend(_pack_confidences(confidences))
+                if tracked:
+                    columns["track_ids"].extend(np.array(keyframe[3], dtype=np.int64))
+                yield keyframe
+
+        try:
+            if version == 1:
+                template = {"video_info": video_info, "frames": {}}
+                write_json_stream(json_path, template, "frames", _expand_frames(spooled(), frame_count, tracked))
+            else:
+                for _ in spooled():
+                    pass
+                temp_path = json_path.with_name(json_path.name + ".tmp")
+                with open(temp_path, "w") as f:
+                    f.write(json.dumps({"version": FORMAT_VERSION, "video_info": video_info,
+                                        "frame_count": frame_count}, separators=(",", ":"))[:-1])
+                    for name, column in columns.items():
+                        f.write(f',"{name}":[')
+                        column.copy_text(f)
+                        f.write("]")
+                    f.write("}")
+                os.replace(temp_path, json_path)
+
+            if binary:
+                output_file = binary_path(json_path)
+                name = video_info.get("name", "").encode("utf-8")
+                temp_path = output_file.with_name(output_file.name + ".tmp")
+                with open(temp_path, "wb") as f:
+                    f.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION_TRACKED if tracked else FORMAT_VERSION,
+                                               len(name), video_info["width"],
+                                               video_info["height"], video_info["fps"], frame_count,
+                                               video_info.get("total_frames", frame_count),
+                                               video_info.get("frame_interval", 0), counts["keyframes"],
+                                               counts["boxes"]))
+                    for column in columns.values():
+                        column.copy_raw(f)
+                    f.write(name)
+                os.replace(temp_path, output_file)
+            else:
+                # A .bbx left from an earlier binary run would otherwise shadow the new JSON
+                binary_path(json_path).unlink(missing_ok=True)
+        finally:
+            for column in columns.values():
+                column.close()
+
+
+def _expand_frames(keyframes: Iterable[Tuple], frame_count: int, tracked: bool = False) -> Iterator[Tuple[str, Dict]]:
+    """
+    v1 per-frame entries: every frame repeats the boxes of the last keyframe at
+    or before it, or with `tracked`, moves them towards the next keyframe. Each
+    keyframe is held back until the next one arrives, so its gap can be filled.
+    """
+    previous = None  # (frame_index, boxes, confidences, track_ids) of the last keyframe
+    next_frame = 0
+
+    def fill(until: int, following=None) -> Iterator[Tuple[str, Dict]]:
+        nonlocal next_frame
+        until = min(until, frame_count)
+        if next_frame >= until:
+            return
+        if previous is None:
+            boxes_at = [[]] * (until - next_frame)
+            confidences, track_ids = [], [] if tracked else None
+        else:
+            start, boxes, confidences, track_ids = previous
+            indices = np.arange(next_frame, until)
+            if tracked and following is not None:
+                alphas = (indices - start) / (following[0] - start)
+                moved = interpolate_boxes(boxes, np.array(track_ids, dtype=np.int64).reshape(-1), following[1],
+                                          np.array(following[3], dtype=np.int64).reshape(-1), alphas)
+                boxes_at = np.rint(moved).astype(np.int64).tolist()
+            else:
+                boxes_at = [boxes] * len(indices)
+        for boxes in boxes_at:
+            yield str(next_frame), _v1_entry(boxes, confidences, False, track_ids)
+            next_frame += 1
+
+    for keyframe in keyframes:
+        frame_index, boxes, confidences = keyframe[:3]
+        track_ids = keyframe[3] if tracked else None
+        yield from fill(frame_index, (frame_index, boxes, confidences, track_ids))
+        previous = (frame_index, boxes, confidences, track_ids)
+        if frame_index < frame_count:
+            yield str(frame_index), _v1_entry(boxes, confidences, True, track_ids)
+            next_frame = frame_index + 1
+    yield from fill(frame_count)
+
+
+def binary_path(json_path: Union[str, Path]) -> Path:
+    """`X_boxes.json` -> `X_boxes.bbx`"""
+    return Path(json_path).with_suffix(".bbx")
+
+
+def current_box_file(json_path: Union[str, Path]) -> Path:
+    """
+    The file to read for `X_boxes.json`: its .bbx if that exists and is at least
+    as new as the JSON (they are written together), else the JSON itself
+    """
+    json_path = Path(json_path)
+    binary = binary_path(json_path)
+    try:
+        binary_mtime = binary.stat().st_mtime_ns
+    except OSError:
+        return json_path
+    try:
+        return binary if binary_mtime >= json_path.stat().st_mtime_ns else json_path
+    except OSError:
+        return binary
+
+
+def convert(paths: List[Path], output_dir: Optional[Path] = None, binary: bool = False):
+    total_before = total_after = 0
+    for path in paths:
+        track = load_boxes(path)
+        output_file = (output_dir or path.parent) / path.name
+        before = path.stat().st_size
+
+        save_json(track, output_file)
+        after = output_file.stat().st_size
+        line = f"  {path.name}: {before / 1024:.0f} KB -> {after / 1024:.0f} KB"
+        if binary:
+            save_binary(track, binary_path(output_file))
+            line += f" (.bbx {binary_path(output_file).stat().st_size / 1024:.0f} KB)"
+        print(line)
+
+        total_before += before
+        total_after += after
+
+    if paths:
+        print(f"\n✅ Converted {len(paths)} files: {total_before / 1024:.0f} KB -> {total_after / 1024:.0f} KB "
+              f"({total_before / max(total_after, 1):.1f}x smaller)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ViewGuard bounding box format tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert_parser = subparsers.add_parser("convert", help="Convert v1 bounding box JSON files to v2")
+    convert_parser.add_argument("files", nargs="+", type=Path)
+    convert_parser.add_argument("--output-dir", type=Path, help="Write here instead of replacing the input files")
+    convert_parser.add_argument("--binary", action="store_true", help="Also write a .bbx blob next to each file")
+
+    args = parser.parse_args()
+    if args.command == "convert":
+        if args.output_dir:
+            args.output_dir.mkdir(parents=True, exist_ok=True)
+        convert(args.files, args.output_dir, args.binary)
+
+
+if __name__ == "__main__":
+    main()
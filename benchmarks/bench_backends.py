@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Detector Backend Benchmark
+Compares CPU throughput of the detector backends in detectors.py on the same
+frames, at one or more input sizes and batch sizes.
+
+Usage:
+    python detectors.py export yolov8n.pt --imgsz 640
+    python benchmarks/bench_backends.py --weights yolov8n.pt --onnx yolov8n.onnx
+    python benchmarks/bench_backends.py --onnx yolov8n.onnx --imgsz 320 640 --threads 4 --output results.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+# Hide GPUs so the numbers reflect a CPU-only node
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+import cv2
+
+from detectors import load_detector
+
+DEFAULT_VIDEO = REPO_ROOT / "public" / "videos" / "vandalism" / "Vandalism005_x264.mp4"
+
+
+def load_frames(video_path: Path, max_frames: int):
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise FileNotFoundError(f"Could not open video: {video_path}")
+
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+
+    if not frames:
+        raise RuntimeError(f"No frames decoded from {video_path}")
+    return frames
+
+
+def run_case(detector, frames, batch_size: int):
+    """Return FPS of detector.predict over all frames, after one warm-up batch"""
+    batches = [frames[i:i + batch_size] for i in range(0, len(frames), batch_size)]
+    detector.predict(batches[0])
+
+    start = time.perf_counter()
+    for batch in batches:
+        detector.predict(batch)
+    return len(frames) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark detector backends on CPU")
+    parser.add_argument("--video", type=Path, default=DEFAULT_VIDEO)
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--weights", default="yolov8n.pt", help="Ultralytics weights (skip with --no-ultralytics)")
+    parser.add_argument("--onnx", help="Exported ONNX weights (see `python detectors.py export`)")
+    parser.add_argument("--no-ultralytics", action="store_true", help="Skip the PyTorch backend")
+    parser.add_argument("--imgsz", type=int, nargs="+", default=[640])
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[1])
+    parser.add_argument("--threads", type=int, default=0, help="Inference threads (0 = library default)")
+    parser.add_argument("--output", type=Path, help="Write results as JSON")
+    args = parser.parse_args()
+
+    backends = [("stub", "")]
+    if not args.no_ultralytics:
+        backends.append(("ultralytics", args.weights))
+    if args.onnx:
+        backends.append(("onnx", args.onnx))
+
+    frames = load_frames(args.video, args.frames)
+
+    print("=" * 60)
+    print("ViewGuard Detector Backend Benchmark")
+    print("=" * 60)
+    print(f"Video: {args.video.name} ({len(frames)} frames)")
+    print(f"CPU cores: {os.cpu_count()}, threads: {args.threads or 'default'}\n")
+    print(f"{'backend':<13}{'imgsz':>7}{'batch':>7}{'fps':>10}{'vs torch':>10}")
+    print("-" * 47)
+
+    results = []
+    for imgsz in args.imgsz:
+        for batch_size in args.batch_size:
+            baseline = None
+            for backend, weights in backends:
+                detector = load_detector(backend=backend, weights=weights or None, imgsz=imgsz,
+                                         num_threads=args.threads)
+                if detector.imgsz != imgsz:
+                    print(f"{backend:<13}{imgsz:>7}{batch_size:>7}   skipped (model has fixed input {detector.imgsz})")
+                    continue
+                if getattr(detector, "fixed_batch", None) not in (None, batch_size):
+                    print(f"{backend:<13}{imgsz:>7}{batch_size:>7}   skipped (model has fixed batch size)")
+                    continue
+
+                fps = run_case(detector, frames, batch_size)
+                if backend == "ultralytics":
+                    baseline = fps
+                relative = f"{fps / baseline:.2f}x" if baseline and backend != "stub" else "-"
+                results.append({"backend": backend, "imgsz": imgsz, "batch_size": batch_size,
+                                "fps": round(fps, 2)})
+                print(f"{backend:<13}{imgsz:>7}{batch_size:>7}{fps:>10.2f}{relative:>10}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"video": args.video.name, "frames": len(frames), "cpu_count": os.cpu_count(),
+                       "threads": args.threads, "results": results}, f, indent=2)
+        print(f"\nSaved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
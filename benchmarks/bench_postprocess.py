@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Detection Post-processing Micro-benchmark
+Compares the per-box loop detect_persons used to run (one tensor-to-host transfer
+per coordinate/score) against the vectorized extraction, at 0, 10 and 100 detections.
+
+Usage:
+    python benchmarks/bench_postprocess.py
+    python benchmarks/bench_postprocess.py --counts 0 10 100 1000 --repeat 2000
+"""
+
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+import numpy as np
+import torch
+from ultralytics.engine.results import Boxes
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from detection_server import detections_from_arrays
+
+FRAME_SHAPE = (480, 640)
+
+
+def make_boxes(count: int, seed: int = 0) -> Boxes:
+    """Random person boxes in the (x1, y1, x2, y2, conf, cls) layout YOLO returns"""
+    rng = np.random.default_rng(seed)
+    xy = rng.uniform(0, [FRAME_SHAPE[1] - 50, FRAME_SHAPE[0] - 100], size=(count, 2))
+    wh = rng.uniform([10, 30], [50, 100], size=(count, 2))
+    conf = rng.uniform(0.05, 1.0, size=(count, 1))
+    cls = np.zeros((count, 1))
+    data = np.hstack([xy, xy + wh, conf, cls]).astype(np.float32)
+    return Boxes(torch.from_numpy(data), FRAME_SHAPE)
+
+
+def legacy_postprocess(boxes: Boxes, confidence_threshold: float):
+    """The original per-box loop from detect_persons"""
+    detections = []
+    for box in boxes:
+        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
+        confidence = float(box.conf[0])
+        if confidence >= confidence_threshold:
+            width = x2 - x1
+            height = y2 - y1
+            detections.append({
+                "bbox": [float(x1), float(y1), float(width), float(height)],
+                "score": confidence
+            })
+    return detections
+
+
+def vectorized_postprocess(boxes: Boxes, confidence_threshold: float):
+    """What detect_persons_batch does now"""
+    data = boxes.data.cpu().numpy()
+    return detections_from_arrays(data[:, :4], data[:, 4], confidence_threshold)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark detection post-processing")
+    parser.add_argument("--counts", type=int, nargs="+", default=[0, 10, 100])
+    parser.add_argument("--repeat", type=int, default=1000)
+    parser.add_argument("--threshold", type=float, default=0.5)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Detection Post-processing Benchmark")
+    print("=" * 60)
+    print(f"{'detections':>10}{'legacy (us)':>14}{'vectorized (us)':>18}{'speedup':>10}")
+    print("-" * 52)
+
+    for count in args.counts:
+        boxes = make_boxes(count)
+
+        # Both paths must produce the same detections
+        legacy = legacy_postprocess(boxes, args.threshold)
+        vectorized = vectorized_postprocess(boxes, args.threshold)
+        assert len(legacy) == len(vectorized)
+        for a, b in zip(legacy, vectorized):
+            assert np.allclose(a["bbox"], b["bbox"], atol=1e-4) and abs(a["score"] - b["score"]) < 1e-6
+
+        legacy_us = min(timeit.repeat(lambda: legacy_postprocess(boxes, args.threshold),
+                                      number=args.repeat, repeat=3)) / args.repeat * 1e6
+        vectorized_us = min(timeit.repeat(lambda: vectorized_postprocess(boxes, args.threshold),
+                                          number=args.repeat, repeat=3)) / args.repeat * 1e6
+        print(f"{count:>10}{legacy_us:>14.1f}{vectorized_us:>18.1f}{legacy_us / vectorized_us:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
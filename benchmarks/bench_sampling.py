@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Frame Sampling Benchmark
+Compares wall time of decoding every frame with cap.read() (the old loop in
+generate_bounding_boxes / generate_annotations) against FrameSampler with
+grab() and with seeking, and checks that all three return identical frames.
+
+Usage:
+    python benchmarks/bench_sampling.py
+    python benchmarks/bench_sampling.py --video path/to/long.mp4 --every 5 15 150 --fps 2 0.5
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+import cv2
+import numpy as np
+
+from frame_sampling import FrameSampler
+
+DEFAULT_VIDEO = REPO_ROOT / "public" / "videos" / "vandalism" / "Vandalism005_x264.mp4"
+
+
+def read_every_frame(video_path: Path, indices):
+    """Baseline: cap.read() on every frame, keep the sampled ones"""
+    cap = cv2.VideoCapture(str(video_path))
+    wanted = set(indices)
+    frames = {}
+    frame_count = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if frame_count in wanted:
+            frames[frame_count] = frame
+        frame_count += 1
+    cap.release()
+    return frames
+
+
+def sample(video_path: Path, seek_min_gap=None, **kwargs):
+    with FrameSampler(video_path, seek_min_gap=seek_min_gap, **kwargs) as sampler:
+        return dict(sampler)
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark frame sampling strategies")
+    parser.add_argument("--video", type=Path, default=DEFAULT_VIDEO)
+    parser.add_argument("--every", type=int, nargs="+", default=[5, 15, 60])
+    parser.add_argument("--fps", type=float, nargs="+", default=[2.0])
+    parser.add_argument("--seek-min-gap", type=int, default=30, help="Gap (frames) above which the seek variant seeks")
+    parser.add_argument("--output", type=Path, help="Write results as JSON")
+    args = parser.parse_args()
+
+    cases = [(f"every {n}", {"every": n}) for n in args.every]
+    cases += [(f"{fps:g} fps", {"fps": fps}) for fps in args.fps]
+
+    print("=" * 60)
+    print("ViewGuard Frame Sampling Benchmark")
+    print("=" * 60)
+    print(f"Video: {args.video.name}\n")
+    print(f"{'sampling':<12}{'frames':>8}{'read()':>10}{'grab()':>10}{'seek':>10}{'speedup':>9}  identical")
+    print("-" * 70)
+
+    results = []
+    for label, kwargs in cases:
+        grabbed, grab_time = timed(sample, args.video, **kwargs)
+        baseline, read_time = timed(read_every_frame, args.video, list(grabbed))
+        seeked, seek_time = timed(sample, args.video, seek_min_gap=args.seek_min_gap, **kwargs)
+
+        identical = all(
+            variant.keys() == baseline.keys() and all(np.array_equal(variant[i], baseline[i]) for i in baseline)
+            for variant in (grabbed, seeked)
+        )
+        best = min(grab_time, seek_time)
+        results.append({"sampling": label, "frames": len(grabbed), "read_s": round(read_time, 3),
+                        "grab_s": round(grab_time, 3), "seek_s": round(seek_time, 3),
+                        "speedup": round(read_time / best, 2), "identical": identical})
+        print(f"{label:<12}{len(grabbed):>8}{read_time:>9.2f}s{grab_time:>9.2f}s{seek_time:>9.2f}s"
+              f"{read_time / best:>8.2f}x  {'yes' if identical else 'NO'}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"video": args.video.name, "seek_min_gap": args.seek_min_gap, "results": results}, f, indent=2)
+        print(f"\nSaved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
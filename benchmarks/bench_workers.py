@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Worker Pool Scaling Benchmark
+Measures aggregate decode + detection FPS of the detection server's executor
+backends (thread / process) as the worker count grows. Runs on CPU only.
+
+Usage:
+    python benchmarks/bench_workers.py
+    python benchmarks/bench_workers.py --backends process --max-workers 8 --output results.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import wait
+from pathlib import Path
+
+# Hide GPUs so the numbers reflect a CPU-only node
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+import cv2
+
+import detection_server
+
+DEFAULT_VIDEO = REPO_ROOT / "public" / "videos" / "vandalism" / "Vandalism005_x264.mp4"
+
+
+def load_jpeg_frames(video_path: Path, max_frames: int):
+    """Read frames from a video and JPEG-encode them the way the browser client does"""
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise FileNotFoundError(f"Could not open video: {video_path}")
+
+    payloads = []
+    while len(payloads) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        payloads.append(buffer.tobytes())
+    cap.release()
+
+    if not payloads:
+        raise RuntimeError(f"No frames decoded from {video_path}")
+    return payloads
+
+
+def run_case(backend: str, workers: int, payloads, batch_size: int):
+    """Push every payload through a fresh pool and return aggregate FPS"""
+    executor = detection_server.create_executor(backend, workers)
+    try:
+        batches = [payloads[i:i + batch_size] for i in range(0, len(payloads), batch_size)]
+
+        # Warm up every worker (model load, first-call allocations)
+        warmup = [executor.submit(detection_server.decode_and_detect_batch, batches[0], [0.5] * len(batches[0]))
+                  for _ in range(workers)]
+        wait(warmup)
+
+        start = time.perf_counter()
+        futures = [executor.submit(detection_server.decode_and_detect_batch, batch, [0.5] * len(batch))
+                   for batch in batches]
+        wait(futures)
+        elapsed = time.perf_counter() - start
+
+        for future in futures:
+            future.result()
+    finally:
+        executor.shutdown(wait=True)
+
+    return len(payloads) / elapsed
+
+
+def worker_counts(max_workers: int):
+    counts = []
+    n = 1
+    while n < max_workers:
+        counts.append(n)
+        n *= 2
+    counts.append(max_workers)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark detection FPS scaling with worker count")
+    parser.add_argument("--video", type=Path, default=DEFAULT_VIDEO)
+    parser.add_argument("--frames", type=int, default=200, help="Frames to push through each configuration")
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--backends", nargs="+", choices=["thread", "process"], default=["thread", "process"])
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--output", type=Path, help="Write results as JSON")
+    args = parser.parse_args()
+
+    payloads = load_jpeg_frames(args.video, args.frames)
+
+    print("=" * 60)
+    print("ViewGuard Worker Pool Benchmark")
+    print("=" * 60)
+    print(f"Video: {args.video.name} ({len(payloads)} frames)")
+    print(f"CPU cores: {os.cpu_count()}, batch size: {args.batch_size}\n")
+    print(f"{'backend':<10}{'workers':>8}{'fps':>10}{'speedup':>10}")
+    print("-" * 38)
+
+    results = []
+    for backend in args.backends:
+        baseline = None
+        for workers in worker_counts(args.max_workers):
+            fps = run_case(backend, workers, payloads, args.batch_size)
+            baseline = baseline or fps
+            results.append({"backend": backend, "workers": workers, "fps": round(fps, 2),
+                            "speedup": round(fps / baseline, 2)})
+            print(f"{backend:<10}{workers:>8}{fps:>10.2f}{fps / baseline:>9.2f}x")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"video": args.video.name, "frames": len(payloads), "cpu_count": os.cpu_count(),
+                       "batch_size": args.batch_size, "results": results}, f, indent=2)
+        print(f"\nSaved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
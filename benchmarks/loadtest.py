@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+WebSocket Load Test
+Simulates many cameras against the detection server's /ws endpoint to find how
+many it can serve. Every simulated camera is one socket that replays JPEG frames
+from public/videos at a fixed rate (the browser hook sends one every 300ms),
+using the same messages as usePersonDetectionPython: base64-in-JSON by default,
+or FRAME_HEADER + raw JPEG with --protocol binary.
+
+The camera count is ramped up level by level. For each level the report shows
+end-to-end latency percentiles (matched by the echoed "timestamp"), achieved vs
+offered FPS, frames the server dropped or never answered, and connection
+errors. The first level that misses the targets (--min-fps-ratio, --max-p95-ms,
+--max-error-rate) is the saturation point.
+
+Test a running server, or let the script start one per configuration:
+
+Usage:
+    python benchmarks/loadtest.py --url ws://localhost:8001/ws --cameras 10 50 100 200
+    VIEWGUARD_BACKEND=stub python benchmarks/loadtest.py \\
+        --server-config "--executor thread --workers 1" \\
+        --server-config "--executor process --workers 4" --output loadtest.json
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import random
+import shlex
+import socket
+import struct
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+import cv2
+import numpy as np
+import websockets
+
+from frame_sampling import FrameSampler
+
+VIDEOS_DIR = REPO_ROOT / "public" / "videos"
+
+# Binary frame header, same layout as detection_server.FRAME_HEADER:
+# version, codec (0 = JPEG), reserved, camera_id, timestamp (ms), confidence
+FRAME_HEADER = struct.Struct("<BBHIdf")
+
+
+def load_clips(videos, max_frames: int, width: int):
+    """JPEG frames (quality 0.8, like the browser canvas) from each video, scaled to `width`"""
+    clips = []
+    for video in videos:
+        with FrameSampler(video) as sampler:
+            frames = []
+            for _, frame in sampler:
+                height = round(frame.shape[0] * width / frame.shape[1])
+                frame = cv2.resize(frame, (width, height))
+                frames.append(cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 80])[1].tobytes())
+                if len(frames) >= max_frames:
+                    break
+        if frames:
+            clips.append(frames)
+    if not clips:
+        raise FileNotFoundError("No readable videos to replay")
+    return clips
+
+
+class Camera:
+    """One simulated camera: a socket that sends frames at a fixed rate and times the responses"""
+
+    def __init__(self, camera_id: int, frames, fps: float, protocol: str, confidence: float):
+        self.camera_id = camera_id
+        self.frames = frames
+        self.interval = 1.0 / fps
+        self.protocol = protocol
+        self.confidence = confidence
+        self.payloads = [base64.b64encode(frame).decode() for frame in frames] if protocol == "json" else frames
+
+        self.pending = {}  # echoed timestamp -> send time
+        self.latencies = []
+        self.sent = 0
+        self.received = 0
+        self.received_in_window = 0
+        self.server_dropped = 0
+        self.send_lag = 0.0  # worst delay of a send behind its schedule
+        self.connect_failed = False
+        self.disconnected = False
+        self.errors = 0
+
+    def encode(self, index: int, timestamp):
+        payload = self.payloads[index % len(self.payloads)]
+        if self.protocol == "binary":
+            return FRAME_HEADER.pack(1, 0, 0, self.camera_id, timestamp, self.confidence) + payload
+        return (f'{{"type":"frame","data":"{payload}","camera_id":{self.camera_id},'
+                f'"confidence":{self.confidence},"timestamp":"{timestamp}"}}')
+
+    async def send_loop(self, ws, start_at: float, stop_at: float):
+        loop = asyncio.get_running_loop()
+        next_send = start_at
+        while next_send < stop_at:
+            await asyncio.sleep(max(0.0, next_send - loop.time()))
+            now = loop.time()
+            self.send_lag = max(self.send_lag, now - next_send)
+            # Binary headers carry a float timestamp; JSON sends an ISO string like the browser
+            timestamp = time.time() * 1000 if self.protocol == "binary" else datetime.now().isoformat()
+            self.pending[timestamp] = now
+            await ws.send(self.encode(self.sent, timestamp))
+            self.sent += 1
+            # Like setInterval, a late tick doesn't trigger a burst of catch-up sends
+            next_send = max(next_send + self.interval, now)
+
+    async def receive_loop(self, ws, stop_at: float):
+        loop = asyncio.get_running_loop()
+        async for message in ws:
+            now = loop.time()
+            response = json.loads(message)
+            sent_at = self.pending.pop(response.get("timestamp"), None)
+            if sent_at is None:
+                continue
+            self.received += 1
+            self.received_in_window += now <= stop_at
+            self.latencies.append((now - sent_at) * 1000)
+            self.server_dropped = max(self.server_dropped, response.get("dropped_frames", 0))
+
+    async def run(self, url: str, start_at: float, stop_at: float, drain_s: float):
+        try:
+            ws = await websockets.connect(url, max_size=None, open_timeout=10)
+        except (OSError, asyncio.TimeoutError, websockets.InvalidHandshake):
+            self.connect_failed = True
+            return
+
+        receiver = asyncio.create_task(self.receive_loop(ws, stop_at))
+        try:
+            await self.send_loop(ws, start_at, stop_at)
+            # Give in-flight frames time to come back before closing
+            deadline = asyncio.get_running_loop().time() + drain_s
+            while self.pending and asyncio.get_running_loop().time() < deadline and not receiver.done():
+                await asyncio.sleep(0.05)
+        except websockets.ConnectionClosed:
+            self.disconnected = True
+        except Exception:
+            self.errors += 1
+        finally:
+            receiver.cancel()
+            try:
+                await receiver
+            except websockets.ConnectionClosed:
+                self.disconnected = True
+            except asyncio.CancelledError:
+                pass
+            except Exception:
+                self.errors += 1
+            await ws.close()
+
+
+async def run_level(url: str, clips, cameras: int, args) -> dict:
+    """Run `cameras` simulated cameras for args.duration seconds and summarize them"""
+    rng = random.Random(cameras)
+    clients = [Camera(args.first_camera_id + i, clips[i % len(clips)], args.fps, args.protocol, args.confidence)
+               for i in range(cameras)]
+    loop = asyncio.get_running_loop()
+    begin = loop.time() + 1.0  # leave time to connect every socket
+    stop_at = begin + args.duration
+    # Random phase per camera: browser tiles aren't synchronized either
+    await asyncio.gather(*(client.run(url, begin + rng.uniform(0, client.interval), stop_at, args.drain)
+                           for client in clients))
+
+    latencies = np.array([latency for client in clients for latency in client.latencies])
+    sent = sum(client.sent for client in clients)
+    received = sum(client.received for client in clients)
+    failures = sum(client.connect_failed or client.disconnected or client.errors > 0 for client in clients)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (float("nan"),) * 3
+    return {
+        "cameras": cameras,
+        "offered_fps": round(cameras * args.fps, 1),
+        "achieved_fps": round(sum(client.received_in_window for client in clients) / args.duration, 1),
+        "sent": sent,
+        "received": received,
+        "unanswered_ratio": round(1 - received / sent, 4) if sent else 1.0,
+        "server_dropped": sum(client.server_dropped for client in clients),
+        "latency_ms": {"p50": round(float(p50), 1), "p95": round(float(p95), 1), "p99": round(float(p99), 1),
+                       "max": round(float(latencies.max()), 1) if len(latencies) else float("nan")},
+        "connect_failures": sum(client.connect_failed for client in clients),
+        "disconnects": sum(client.disconnected for client in clients),
+        "errors": sum(client.errors for client in clients),
+        "error_rate": round(failures / cameras, 4),
+        "max_send_lag_ms": round(max(client.send_lag for client in clients) * 1000, 1),
+    }
+
+
+def saturated(level: dict, args) -> list:
+    """Targets this level missed (empty if it kept up)"""
+    missed = []
+    if level["achieved_fps"] < args.min_fps_ratio * level["offered_fps"]:
+        missed.append(f"fps {level['achieved_fps']} < {args.min_fps_ratio:.0%} of {level['offered_fps']}")
+    if not level["latency_ms"]["p95"] <= args.max_p95_ms:
+        missed.append(f"p95 {level['latency_ms']['p95']}ms > {args.max_p95_ms}ms")
+    if level["error_rate"] > args.max_error_rate:
+        missed.append(f"errors {level['error_rate']:.1%} > {args.max_error_rate:.1%}")
+    return missed
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(config: str, timeout_s: float = 180.0):
+    """Start detection_server.py with extra CLI arguments; returns (process, ws url) once /health/ready answers"""
+    port = free_port()
+    process = subprocess.Popen([sys.executable, "detection_server.py", "--host", "127.0.0.1", "--port", str(port),
+                                *shlex.split(config)], cwd=REPO_ROOT, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL)
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode} (config: {config!r})")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health/ready", timeout=1)
+            return process, f"ws://127.0.0.1:{port}/ws"
+        except OSError:
+            time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"Server did not become healthy within {timeout_s:.0f}s (config: {config!r})")
+
+
+def ramp(url: str, clips, args) -> dict:
+    levels = []
+    saturation = None
+    print(f"\n{'cameras':>8}{'offered':>9}{'achieved':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'unanswered':>12}{'errors':>8}")
+    print("-" * 74)
+    for cameras in args.cameras:
+        level = asyncio.run(run_level(url, clips, cameras, args))
+        missed = saturated(level, args)
+        level["saturated"] = missed
+        levels.append(level)
+        latency = level["latency_ms"]
+        print(f"{cameras:>8}{level['offered_fps']:>9.1f}{level['achieved_fps']:>10.1f}{latency['p50']:>9.1f}"
+              f"{latency['p95']:>9.1f}{latency['p99']:>9.1f}{level['unanswered_ratio']:>11.1%}"
+              f"{level['error_rate']:>8.1%}{'  ❌ ' + '; '.join(missed) if missed else ''}")
+        if level["max_send_lag_ms"] > 1000 / args.fps:
+            print(f"{'':>8}⚠️  load generator fell {level['max_send_lag_ms']:.0f}ms behind schedule; "
+                  f"this level is limited by the client, not the server")
+        if missed and saturation is None:
+            saturation = cameras
+            if not args.full_ramp:
+                break
+        time.sleep(1.0)  # let the server's mailboxes drain between levels
+
+    capacity = max((level["cameras"] for level in levels if not level["saturated"]), default=0)
+    return {"levels": levels, "saturation_cameras": saturation, "capacity_cameras": capacity}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the detection server's /ws endpoint")
+    parser.add_argument("--url", default="ws://localhost:8001/ws", help="Server to test (ignored with --server-config)")
+    parser.add_argument("--server-config", action="append", default=[], metavar="ARGS",
+                        help="Start detection_server.py with these CLI arguments and test it; can be repeated "
+                             "to compare configurations (environment variables are passed through)")
+    parser.add_argument("--cameras", type=int, nargs="+", default=[1, 5, 10, 25, 50, 100, 200],
+                        help="Camera counts to ramp through")
+    parser.add_argument("--fps", type=float, default=1000 / 300, help="Frames per second per camera (default: 3.33)")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds per level")
+    parser.add_argument("--drain", type=float, default=2.0, help="Seconds to wait for in-flight responses")
+    parser.add_argument("--protocol", choices=["json", "binary"], default="json")
+    parser.add_argument("--confidence", type=float, default=0.5)
+    parser.add_argument("--first-camera-id", type=int, default=10000,
+                        help="Simulated cameras use IDs from here up, away from real ones")
+    parser.add_argument("--videos", type=Path, nargs="+", help="Videos to replay (default: all in public/videos)")
+    parser.add_argument("--max-frames", type=int, default=100, help="Frames kept per video")
+    parser.add_argument("--width", type=int, default=640, help="Frame width sent (height keeps the aspect ratio)")
+    parser.add_argument("--min-fps-ratio", type=float, default=0.95,
+                        help="Saturated below this fraction of the offered FPS")
+    parser.add_argument("--max-p95-ms", type=float, default=1000.0, help="Saturated above this p95 latency")
+    parser.add_argument("--max-error-rate", type=float, default=0.01,
+                        help="Saturated above this fraction of failed sockets")
+    parser.add_argument("--full-ramp", action="store_true", help="Keep ramping past the saturation point")
+    parser.add_argument("--output", type=Path, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    videos = args.videos or sorted(VIDEOS_DIR.rglob("*.mp4"))
+    print("=" * 74)
+    print("ViewGuard WebSocket Load Test")
+    print("=" * 74)
+    clips = load_clips(videos, args.max_frames, args.width)
+    print(f"Replaying {sum(len(clip) for clip in clips)} frames from {len(clips)} videos, "
+          f"{args.fps:.2f} fps per camera, {args.protocol} protocol, {args.duration:.0f}s per level")
+
+    runs = []
+    for config in args.server_config or [None]:
+        if config is None:
+            print(f"\nServer: {args.url}")
+            runs.append({"server": args.url, **ramp(args.url, clips, args)})
+            continue
+        label = config or "(defaults)"
+        print(f"\nServer config: {label}")
+        process, url = start_server(config)
+        try:
+            runs.append({"server": label, **ramp(url, clips, args)})
+        finally:
+            process.terminate()
+            process.wait()
+
+    print("\nSummary")
+    for run in runs:
+        if run["saturation_cameras"] is None:
+            print(f"  ✅ {run['server']}: kept up with every level (up to {run['capacity_cameras']} cameras)")
+        else:
+            print(f"  ❌ {run['server']}: saturated at {run['saturation_cameras']} cameras, "
+                  f"capacity {run['capacity_cameras']} cameras ({run['capacity_cameras'] * args.fps:.0f} fps)")
+
+    if args.output:
+        settings = {key: value for key, value in vars(args).items() if key not in ("output", "videos")}
+        settings["videos"] = [str(video) for video in videos]
+        with open(args.output, "w") as f:
+            json.dump({"settings": settings, "runs": runs}, f, indent=2, default=str)
+        print(f"\n💾 Saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+ViewGuard Benchmark Suite
+Reproducible benchmarks of the detection pipeline that run offline on a CPU-only
+machine: the model is the deterministic stub detector (detectors.StubDetector),
+so the numbers measure ViewGuard's own code, not the network.
+
+Suites:
+    postprocess  detections_from_arrays + boxes_to_frame at 0, 10 and 100 boxes
+    decode       base64 + JPEG decode at full, 1/2 and 1/4 size; FrameSampler vs read()
+    websocket    /ws round trip with N concurrent clients against a local server
+    generator    generate_bounding_boxes on one video
+
+Results are written as JSON. Passing --baseline compares every metric against an
+earlier run and exits with status 1 if any got worse by more than --tolerance.
+
+Usage:
+    python benchmarks/run.py --save-baseline           # record benchmarks/results/baseline.json
+    python benchmarks/run.py                           # compare against it
+    python benchmarks/run.py --suites websocket --clients 1 4 16
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import timeit
+from pathlib import Path
+
+# Stub model, no motion gate (every frame is inferred), no GPU: the same work on every machine
+os.environ.setdefault("VIEWGUARD_BACKEND", "stub")
+os.environ.setdefault("VIEWGUARD_MOTION_GATE", "0")
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "scripts"))
+
+import cv2
+import numpy as np
+
+import detection_server
+from detectors import StubDetector
+from frame_sampling import FrameSampler
+
+DEFAULT_VIDEO = REPO_ROOT / "public" / "videos" / "vandalism" / "Vandalism006_x264.mp4"
+RESULTS_DIR = REPO_ROOT / "benchmarks" / "results"
+SUITES = ["postprocess", "decode", "websocket", "generator"]
+
+
+class Results:
+    """Named measurements with their unit and direction, in the order they were recorded"""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def add(self, name: str, value: float, unit: str, higher_is_better: bool):
+        self.metrics[name] = {"value": round(value, 4), "unit": unit, "higher_is_better": higher_is_better}
+        print(f"  {name:<44}{value:>12.3f} {unit}")
+
+
+def median_time(fn, repeat: int, number: int) -> float:
+    """Median seconds per call over `repeat` rounds of `number` calls"""
+    return statistics.median(timeit.repeat(fn, repeat=repeat, number=number)) / number
+
+
+def load_frames(video_path: Path, count: int, size=(1280, 720)):
+    """Evenly spaced frames from a video, scaled to a typical camera resolution"""
+    with FrameSampler(video_path) as sampler:
+        every = max(1, sampler.total_frames // count)
+    with FrameSampler(video_path, every=every) as sampler:
+        frames = [cv2.resize(frame, size) for _, frame in sampler][:count]
+    return frames
+
+
+def bench_postprocess(results: Results, args):
+    rng = np.random.default_rng(0)
+    for count in (0, 10, 100):
+        xy = rng.uniform(0, [1200, 600], size=(count, 2))
+        xyxy = np.hstack([xy, xy + rng.uniform([20, 60], [80, 200], size=(count, 2))]).astype(np.float32)
+        confidences = rng.uniform(0.05, 1.0, count).astype(np.float32)
+        mask = np.ones((360, 640), dtype=np.uint8)
+
+        def run():
+            boxes, scores = detection_server.boxes_to_frame(xyxy, confidences, (0, 0), mask, (2.0, 2.0), (1280, 720))
+            detection_server.detections_from_arrays(boxes, scores, 0.5)
+
+        seconds = median_time(run, args.repeat, 2000)
+        results.add(f"postprocess.{count}_boxes", seconds * 1e6, "us", higher_is_better=False)
+
+
+def bench_decode(results: Results, args):
+    frames = load_frames(args.video, 20)
+    payloads = [base64.b64encode(cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 80])[1]).decode()
+                for frame in frames]
+
+    seconds = median_time(lambda: [base64.b64decode(payload) for payload in payloads], args.repeat, 5)
+    results.add("decode.base64_1280x720", seconds / len(payloads) * 1e3, "ms", higher_is_better=False)
+
+    encoded = [base64.b64decode(payload) for payload in payloads]
+    for reduce in (1, 2, 4):
+        seconds = median_time(lambda: [detection_server.decode_frame(data, reduce) for data in encoded], args.repeat, 2)
+        results.add(f"decode.imdecode_1280x720_reduce{reduce}", seconds / len(encoded) * 1e3, "ms",
+                    higher_is_better=False)
+
+    def read_all():
+        cap = cv2.VideoCapture(str(args.video))
+        count = 0
+        while cap.read()[0]:
+            count += 1
+        cap.release()
+        return count
+
+    def sample_every_15():
+        with FrameSampler(args.video, every=15) as sampler:
+            for _ in sampler:
+                pass
+        return sampler.position
+
+    for name, fn in [("decode.video_read_all", read_all), ("decode.video_sample_every_15", sample_every_15)]:
+        started = time.perf_counter()
+        frames_read = fn()
+        results.add(f"{name}_fps", frames_read / (time.perf_counter() - started), "fps", higher_is_better=True)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class LocalServer:
+    """The detection server running in a background thread on a free local port"""
+
+    def __init__(self):
+        import uvicorn
+
+        self.port = free_port()
+        config = uvicorn.Config(detection_server.app, host="127.0.0.1", port=self.port, log_level="warning")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+        logging.getLogger("detection_server").setLevel(logging.WARNING)  # no per-connection log lines
+
+    def __enter__(self):
+        self.thread.start()
+        while not (self.server.started and detection_server.model_state.ready):
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+async def ws_client(url: str, camera_id: int, payloads, latencies: list):
+    """Send frames one at a time (binary protocol) and time each round trip"""
+    import websockets
+
+    async with websockets.connect(url, max_size=None) as ws:
+        for payload in payloads:
+            header = detection_server.FRAME_HEADER.pack(detection_server.PROTOCOL_VERSION, detection_server.CODEC_JPEG,
+                                                        0, camera_id, time.time() * 1000, 0.5)
+            started = time.perf_counter()
+            await ws.send(header + payload)
+            await ws.recv()
+            latencies.append((time.perf_counter() - started) * 1000)
+
+
+async def run_clients(url: str, clients: int, payloads):
+    latencies = []
+    started = time.perf_counter()
+    await asyncio.gather(*(ws_client(url, 1000 + i, payloads, latencies) for i in range(clients)))
+    return latencies, time.perf_counter() - started
+
+
+def bench_websocket(results: Results, args):
+    frames = load_frames(args.video, args.frames, size=(640, 360))
+    payloads = [cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 80])[1].tobytes() for frame in frames]
+
+    with LocalServer() as server:
+        url = f"ws://127.0.0.1:{server.port}/ws"
+        asyncio.run(run_clients(url, 1, payloads[:5]))  # warm up
+        for clients in args.clients:
+            latencies, elapsed = asyncio.run(run_clients(url, clients, payloads))
+            p50, p95 = np.percentile(latencies, [50, 95])
+            results.add(f"websocket.{clients}_clients_p50", p50, "ms", higher_is_better=False)
+            results.add(f"websocket.{clients}_clients_p95", p95, "ms", higher_is_better=False)
+            results.add(f"websocket.{clients}_clients_fps", len(latencies) / elapsed, "fps", higher_is_better=True)
+
+
+def bench_generator(results: Results, args):
+    from generate_bounding_boxes import generate_bounding_boxes
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        started = time.perf_counter()
+        result = generate_bounding_boxes(str(args.video), output_dir, frame_interval=15, detector=StubDetector(),
+                                         verbose=False, resume=False, cache=None)
+        elapsed = time.perf_counter() - started
+    results.add("generator.interval_15_fps", result["frame_count"] / elapsed, "fps", higher_is_better=True)
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                                text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+            "opencv": cv2.__version__, "numpy": np.__version__, "commit": commit,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def compare(metrics: dict, baseline: dict, tolerance: float) -> list:
+    """Print each metric's change against the baseline; return the names that regressed"""
+    regressions = []
+    print(f"\n{'metric':<44}{'baseline':>12}{'now':>12}{'change':>9}")
+    print("-" * 77)
+    for name, metric in metrics.items():
+        if name not in baseline:
+            continue
+        before, now = baseline[name]["value"], metric["value"]
+        change = (now - before) / before if before else 0.0
+        worse = -change if metric["higher_is_better"] else change
+        flag = ""
+        if worse > tolerance:
+            regressions.append(name)
+            flag = "  ❌ regression"
+        print(f"{name:<44}{before:>12.3f}{now:>12.3f}{change * 100:>+8.1f}%{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the ViewGuard benchmark suite")
+    parser.add_argument("--suites", nargs="+", choices=SUITES, default=SUITES)
+    parser.add_argument("--video", type=Path, default=DEFAULT_VIDEO)
+    parser.add_argument("--repeat", type=int, default=5, help="Rounds per micro-benchmark; the median is kept")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16], help="Concurrent /ws clients")
+    parser.add_argument("--frames", type=int, default=40, help="Frames each /ws client sends")
+    parser.add_argument("--output", type=Path, default=RESULTS_DIR / "latest.json")
+    parser.add_argument("--baseline", type=Path, default=RESULTS_DIR / "baseline.json",
+                        help="Results to compare against (skipped if the file doesn't exist)")
+    parser.add_argument("--save-baseline", action="store_true", help="Also store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Relative slowdown that counts as a regression (default: 0.15)")
+    args = parser.parse_args()
+
+    cv2.setNumThreads(1)
+    print("=" * 60)
+    print("ViewGuard Benchmark Suite")
+    print("=" * 60)
+
+    results = Results()
+    runners = {"postprocess": bench_postprocess, "decode": bench_decode, "websocket": bench_websocket,
+               "generator": bench_generator}
+    for suite in args.suites:
+        print(f"\n{suite}")
+        runners[suite](results, args)
+
+    report = {"environment": environment(), "settings": {"suites": args.suites, "video": args.video.name,
+                                                         "clients": args.clients, "frames": args.frames},
+              "metrics": results.metrics}
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Saved: {args.output}")
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Baseline: {args.baseline}")
+        return
+
+    if not args.baseline.exists():
+        print(f"\nNo baseline at {args.baseline} (record one with --save-baseline)")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results.metrics, baseline["metrics"], args.tolerance)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regressions over {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print(f"\n✅ No regressions over {args.tolerance:.0%} against {baseline['environment'].get('commit') or args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+ViewGuard Detection Cache
+On-disk cache of per-frame detections for the offline scripts, so rerunning
+them with the same video, model and inference settings skips inference.
+
+Entries are keyed by (run key, frame index). The run key is a hash of the video
+content, the model weights content and the inference parameters. Anything
+downstream of inference (output format, frame interval, coordinate conversion)
+is not part of the key, so changing it reuses the cached detections. The cache
+is a single SQLite file with a size cap; the least recently used frames are
+evicted first.
+
+Usage:
+    cache = DetectionCache()
+    key = cache.run_key(video_path, model_files=["yolov8s.pt"], params={"conf": 0.2, "iou": 0.2})
+    hits = cache.get_many(key, [0, 15, 30])
+    cache.put_many(key, {45: {"boxes": [...], "confidences": [...]}})
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Union
+
+DEFAULT_CACHE_PATH = os.getenv("VIEWGUARD_CACHE", str(Path.home() / ".cache" / "viewguard" / "detections.sqlite"))
+DEFAULT_CACHE_MAX_MB = float(os.getenv("VIEWGUARD_CACHE_MAX_MB", "1024"))
+
+HASH_CHUNK_SIZE = 1 << 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS detections (
+    run_key TEXT NOT NULL,
+    frame INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (run_key, frame)
+);
+CREATE INDEX IF NOT EXISTS detections_last_used ON detections (last_used);
+
+-- Frame count of videos that were processed to the end, per run key
+CREATE TABLE IF NOT EXISTS videos (
+    run_key TEXT PRIMARY KEY,
+    frame_count INTEGER NOT NULL
+);
+
+-- Content hashes, so unchanged files are not re-read on every run
+CREATE TABLE IF NOT EXISTS file_hashes (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL
+);
+
+-- Running total of detections.size, kept by triggers so eviction never scans the table
+CREATE TABLE IF NOT EXISTS usage (id INTEGER PRIMARY KEY CHECK (id = 0), total INTEGER NOT NULL);
+INSERT OR IGNORE INTO usage VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS detections_insert AFTER INSERT ON detections
+    BEGIN UPDATE usage SET total = total + new.size; END;
+CREATE TRIGGER IF NOT EXISTS detections_update AFTER UPDATE OF size ON detections
+    BEGIN UPDATE usage SET total = total + new.size - old.size; END;
+CREATE TRIGGER IF NOT EXISTS detections_delete AFTER DELETE ON detections
+    BEGIN UPDATE usage SET total = total - old.size; END;
+"""
+
+
+class DetectionCache:
+    """SQLite-backed per-frame detection cache with a size cap and LRU eviction"""
+
+    def __init__(self, path: Union[str, Path] = DEFAULT_CACHE_PATH, max_mb: float = DEFAULT_CACHE_MAX_MB):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+
+        # Several worker processes may share the file: WAL lets readers and one writer coexist
+        self.db = sqlite3.connect(str(self.path), timeout=60)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def file_hash(self, path: Union[str, Path]) -> str:
+        """SHA-256 of a file's content, remembered until its size or mtime changes"""
+        path = Path(path).resolve()
+        stat = path.stat()
+        row = self.db.execute("SELECT size, mtime_ns, sha256 FROM file_hashes WHERE path = ?",
+                              (str(path),)).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        sha256 = digest.hexdigest()
+
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO file_hashes VALUES (?, ?, ?, ?)",
+                            (str(path), stat.st_size, stat.st_mtime_ns, sha256))
+        return sha256
+
+    def run_key(self, video_path: Union[str, Path], model_files: Iterable[Union[str, Path]] = (),
+                params: Optional[Dict] = None) -> str:
+        """
+        Key for one (video, model, inference parameters) combination. Model files
+        that don't exist locally (e.g. weights a library downloads by name) are
+        identified by name.
+        """
+        models = [self.file_hash(f) if Path(f).is_file() else str(f) for f in model_files]
+        identity = {"video": self.file_hash(video_path), "model": models, "params": params or {}}
+        return hashlib.sha256(json.dumps(identity, sort_keys=True).encode()).hexdigest()
+
+    def get_many(self, run_key: str, frames: Iterable[int]) -> Dict[int, object]:
+        """Cached results for the given frames; frames that aren't cached are left out"""
+        frames = list(frames)
+        results = {}
+        for start in range(0, len(frames), 500):
+            chunk = frames[start:start + 500]
+            rows = self.db.execute(
+                f"SELECT frame, data FROM detections WHERE run_key = ? AND frame IN ({','.join('?' * len(chunk))})",
+                [run_key, *chunk]).fetchall()
+            results.update((frame, json.loads(data)) for frame, data in rows)
+
+        if results:
+            with self.db:
+                self.db.executemany("UPDATE detections SET last_used = ? WHERE run_key = ? AND frame = ?",
+                                    [(time.time(), run_key, frame) for frame in results])
+        self.hits += len(results)
+        self.misses += len(frames) - len(results)
+        return results
+
+    def put_many(self, run_key: str, results: Dict[int, object]):
+        if not results:
+            return
+        now = time.time()
+        rows = []
+        for frame, result in results.items():
+            data = json.dumps(result, separators=(",", ":"))
+            rows.append((run_key, frame, data, len(data), now))
+        with self.db:
+            self.db.executemany(
+                "INSERT INTO detections VALUES (?, ?, ?, ?, ?) ON CONFLICT (run_key, frame) DO UPDATE SET "
+                "data = excluded.data, size = excluded.size, last_used = excluded.last_used", rows)
+        self.evict()
+
+    def get_frame_count(self, run_key: str) -> Optional[int]:
+        """Frame count recorded by set_frame_count once a video was processed to the end"""
+        row = self.db.execute("SELECT frame_count FROM videos WHERE run_key = ?", (run_key,)).fetchone()
+        return row[0] if row else None
+
+    def set_frame_count(self, run_key: str, frame_count: int):
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO videos VALUES (?, ?)", (run_key, frame_count))
+
+    def size_bytes(self) -> int:
+        return self.db.execute("SELECT total FROM usage").fetchone()[0]
+
+    def evict(self):
+        """Drop least recently used frames until the cache is 10% under its cap"""
+        if self.size_bytes() <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        with self.db:
+            while self.size_bytes() > target:
+                deleted = self.db.execute(
+                    "DELETE FROM detections WHERE rowid IN "
+                    "(SELECT rowid FROM detections ORDER BY last_used LIMIT 256)").rowcount
+                if not deleted:
+                    break
+            self.db.execute("DELETE FROM videos WHERE run_key NOT IN (SELECT DISTINCT run_key FROM detections)")
+
+    def clear(self):
+        with self.db:
+            self.db.execute("DELETE FROM detections")
+            self.db.execute("DELETE FROM videos")
+
+    def stats(self) -> Dict:
+        frames, runs = self.db.execute("SELECT COUNT(*), COUNT(DISTINCT run_key) FROM detections").fetchone()
+        return {"path": str(self.path), "size_mb": round(self.size_bytes() / 1024 / 1024, 2),
+                "max_mb": round(self.max_bytes / 1024 / 1024, 2), "frames": frames, "runs": runs}
+
+    def close(self):
+        self.db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or clear the ViewGuard detection cache")
+    parser.add_argument("command", choices=["stats", "clear"])
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="Cache file (env: VIEWGUARD_CACHE)")
+    args = parser.parse_args()
+
+    cache = DetectionCache(args.cache)
+    if args.command == "clear":
+        cache.clear()
+        print(f"🗑️  Cleared {cache.path}")
+    print(json.dumps(cache.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
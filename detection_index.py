@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+"""
+ViewGuard Detection Index
+Queryable index of the person detections in all processed footage, so questions
+like "which clips have more than 3 people between 10s and 20s" are answered from
+a local SQLite file in milliseconds instead of by loading every JSON file.
+
+Ingests the outputs of scripts/generate_bounding_boxes.py (`*_boxes.json` v1/v2
+and `*_boxes.bbx`) and of generate_annotations.py (annotation JSON). Per file it
+stores:
+
+    count spans   time intervals with a constant person count, in an R*Tree
+                  interval index, for exact time-window queries
+    buckets       peak and time-weighted mean person count per time bucket
+                  (1 second by default), for timelines
+    track spans   first and last appearance of each tracked person (files
+                  generated with tracking only), in a second interval index
+
+Files are re-indexed only when their size or modification time changed, and
+files that no longer exist are dropped on every update.
+
+Usage:
+    python detection_index.py update                     # public/bounding_boxes and public/annotations
+    python detection_index.py count --min-persons 4 --start 10 --end 20
+    python detection_index.py timeline Burglary003_x264.mp4
+    python detection_index.py tracks --min-duration 5
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from bbox_format import current_box_file, load_boxes
+
+DEFAULT_INDEX_PATH = os.getenv("VIEWGUARD_INDEX", str(Path.home() / ".cache" / "viewguard" / "detection_index.sqlite"))
+DEFAULT_SOURCES = [Path(__file__).parent / "public" / "bounding_boxes", Path(__file__).parent / "public" / "annotations"]
+DEFAULT_BUCKET_SECONDS = 1.0
+
+# Annotation files that are examples, not generated output
+IGNORED_FILES = {"EXAMPLE_TEMPLATE.json"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+
+-- One row per indexed file
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,          -- "boxes" or "annotations"
+    video TEXT NOT NULL,
+    category TEXT NOT NULL,
+    duration REAL NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sources_video ON sources (video);
+
+-- Intervals [start, end) with a constant, non-zero person count. R*Tree coordinates are
+-- 32-bit floats, so the exact bounds are kept in t0/t1 for the final comparison.
+CREATE VIRTUAL TABLE IF NOT EXISTS count_spans USING rtree(
+    id, start, end, +source_id INTEGER, +persons INTEGER, +t0 REAL, +t1 REAL
+);
+
+-- Peak and time-weighted mean person count per time bucket (buckets without people are left out)
+CREATE TABLE IF NOT EXISTS buckets (
+    source_id INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    max_persons INTEGER NOT NULL,
+    mean_persons REAL NOT NULL,
+    PRIMARY KEY (source_id, bucket)
+) WITHOUT ROWID;
+
+-- Time span of each tracked person, from its first keyframe until its box disappears
+CREATE VIRTUAL TABLE IF NOT EXISTS track_spans USING rtree(
+    id, start, end, +source_id INTEGER, +track_id INTEGER, +keyframes INTEGER, +mean_confidence REAL,
+    +t0 REAL, +t1 REAL
+);
+"""
+
+
+def video_category(video: str) -> str:
+    """Category from a video name like "Burglary003_x264.mp4" -> "burglary\""""
+    match = re.match(r"[A-Za-z]+", video)
+    return match.group(0).lower() if match else "unknown"
+
+
+def merge_spans(starts: np.ndarray, ends: np.ndarray, counts: np.ndarray) -> List[Tuple[float, float, int]]:
+    """Join adjacent intervals with the same count and drop the ones without people"""
+    spans = []
+    for start, end, count in zip(starts.tolist(), ends.tolist(), counts.tolist()):
+        if count <= 0 or end <= start:
+            continue
+        if spans and spans[-1][2] == count and abs(spans[-1][1] - start) < 1e-9:
+            spans[-1] = (spans[-1][0], end, count)
+        else:
+            spans.append((start, end, count))
+    return spans
+
+
+def bucket_counts(spans: List[Tuple[float, float, int]], bucket_seconds: float) -> Dict[int, Tuple[int, float]]:
+    """{bucket: (peak count, time-weighted mean count)} over the buckets the spans cover"""
+    peaks: Dict[int, int] = {}
+    weighted: Dict[int, float] = {}
+    for start, end, count in spans:
+        for bucket in range(int(start // bucket_seconds), int(np.ceil(end / bucket_seconds))):
+            overlap = min(end, (bucket + 1) * bucket_seconds) - max(start, bucket * bucket_seconds)
+            if overlap <= 0:
+                continue
+            peaks[bucket] = max(peaks.get(bucket, 0), count)
+            weighted[bucket] = weighted.get(bucket, 0.0) + count * overlap
+    return {bucket: (peak, weighted[bucket] / bucket_seconds) for bucket, peak in peaks.items()}
+
+
+def read_boxes_file(path: Path) -> Dict:
+    """Count spans and track spans of a generate_bounding_boxes output file"""
+    track = load_boxes(path, mmap=False)
+    fps = float(track.video_info.get("fps") or 30.0)
+    duration = track.frame_count / fps
+
+    keyframes = track.keyframes.astype(np.float64)
+    # Keyframe k's boxes are shown until keyframe k + 1 (the last ones until the end of the video)
+    starts = keyframes / fps
+    ends = np.append(keyframes[1:], track.frame_count) / fps
+    counts = np.diff(track.box_offsets.astype(np.int64))
+
+    tracks = []
+    if track.track_ids is not None and len(track.track_ids):
+        positions = np.repeat(np.arange(len(keyframes)), counts)
+        ids, inverse = np.unique(track.track_ids, return_inverse=True)
+        first = np.full(len(ids), len(keyframes), dtype=np.int64)
+        last = np.zeros(len(ids), dtype=np.int64)
+        np.minimum.at(first, inverse, positions)
+        np.maximum.at(last, inverse, positions)
+        seen = np.bincount(inverse, minlength=len(ids))
+        mean_confidence = np.bincount(inverse, weights=track.confidences, minlength=len(ids)) / seen
+        tracks = [(float(starts[f]), float(ends[l]), int(track_id), int(n), round(float(c), 4))
+                  for track_id, f, l, n, c in zip(ids, first, last, seen, mean_confidence)]
+
+    video = track.video_info.get("name") or path.name.replace("_boxes", "")
+    return {"kind": "boxes", "video": video, "category": video_category(video), "duration": duration,
+            "spans": merge_spans(starts, ends, counts), "tracks": tracks}
+
+
+def read_annotation_file(path: Path) -> Optional[Dict]:
+    """Count spans of a generate_annotations output file, or None if it isn't one"""
+    with open(path) as f:
+        data = json.load(f)
+    if not isinstance(data, dict) or "videoFile" not in data or "detections" not in data:
+        return None
+
+    # Generated detections are samples with a "time"; hand-made ones may give startTime/endTime
+    times = []
+    ranges = []
+    for detection in data["detections"]:
+        if "time" in detection:
+            times.append(float(detection["time"]))
+        elif "startTime" in detection and "endTime" in detection:
+            ranges.append((float(detection["startTime"]), float(detection["endTime"])))
+
+    edges = sorted({edge for r in ranges for edge in r})
+    samples, sample_counts = np.unique(np.array(times, dtype=np.float64), return_counts=True)
+    # A sample holds until the next one, but no longer than the sampling step, so frames
+    # without detections (which are not in the file) stay empty
+    steps = np.diff(samples)
+    step = float(np.median(steps)) if len(steps) else 0.2  # a lone sample: about every 5th frame
+    ends = np.minimum(samples + step, np.append(samples[1:], np.inf))
+    spans = merge_spans(samples, ends, sample_counts)
+
+    if ranges:
+        # Count how many ranges cover each interval between consecutive range edges
+        starts_ = np.array(edges[:-1])
+        ends_ = np.array(edges[1:])
+        covered = np.array([sum(s <= a and b <= e for s, e in ranges) for a, b in zip(starts_, ends_)], dtype=np.int64)
+        spans = sorted(spans + merge_spans(starts_, ends_, covered))
+
+    duration = float(data.get("duration") or 0.0) or (max(end for _, end, _ in spans) if spans else 0.0)
+    return {"kind": "annotations", "video": data["videoFile"],
+            "category": data.get("category") or video_category(data["videoFile"]),
+            "duration": duration, "spans": spans, "tracks": []}
+
+
+def discover(paths: Iterable[Union[str, Path]]) -> List[Path]:
+    """Indexable files among the given files and directories"""
+    files = []
+    for path in map(Path, paths):
+        if path.is_file():
+            files.append(path)
+        elif path.is_dir():
+            candidates = sorted(path.glob("*.json")) + sorted(path.glob("*_boxes.bbx"))
+            for candidate in candidates:
+                # A .bbx and its JSON hold the same data unless one is left from an older
+                # run: index only the newer one, as the server serves it
+                if (candidate.name.endswith(("_boxes.json", "_boxes.bbx"))
+                        and current_box_file(candidate.with_suffix(".json")) != candidate):
+                    continue
+                if candidate.name not in IGNORED_FILES:
+                    files.append(candidate)
+    return files
+
+
+class DetectionIndex:
+    """SQLite index of person counts and tracks over time, per processed video"""
+
+    def __init__(self, path: Union[str, Path] = DEFAULT_INDEX_PATH, bucket_seconds: Optional[float] = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.path))
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+
+        stored = self.db.execute("SELECT value FROM meta WHERE key = 'bucket_seconds'").fetchone()
+        self.bucket_seconds = float(stored[0]) if stored else DEFAULT_BUCKET_SECONDS
+        if bucket_seconds is not None and bucket_seconds != self.bucket_seconds:
+            # A different bucket size invalidates every bucket: re-index everything on the next update
+            self.bucket_seconds = bucket_seconds
+            with self.db:
+                self.db.execute("UPDATE sources SET mtime_ns = -1")
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES ('bucket_seconds', ?)", (str(self.bucket_seconds),))
+
+    def update(self, paths: Iterable[Union[str, Path]] = DEFAULT_SOURCES) -> Dict[str, int]:
+        """Index new and changed files under `paths` and forget files that were deleted"""
+        counts = {"indexed": 0, "unchanged": 0, "skipped": 0, "removed": 0}
+        known = {path: (size, mtime_ns) for path, size, mtime_ns in
+                 self.db.execute("SELECT path, size, mtime_ns FROM sources")}
+
+        for path in discover(paths):
+            path = path.resolve()
+            stat = path.stat()
+            if known.get(str(path)) == (stat.st_size, stat.st_mtime_ns):
+                counts["unchanged"] += 1
+                continue
+            try:
+                if path.name.endswith(("_boxes.json", "_boxes.bbx")):
+                    entry = read_boxes_file(path)
+                else:
+                    entry = read_annotation_file(path)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"⚠️  Skipping {path.name}: {e}")
+                entry = None
+            if entry is None:
+                counts["skipped"] += 1
+                continue
+            self._store(path, stat, entry)
+            counts["indexed"] += 1
+
+        for path in known:
+            if not Path(path).exists():
+                self._remove(path)
+                counts["removed"] += 1
+        return counts
+
+    def _remove(self, path: str):
+        row = self.db.execute("SELECT id FROM sources WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return
+        with self.db:
+            self.db.execute("DELETE FROM count_spans WHERE source_id = ?", row)
+            self.db.execute("DELETE FROM track_spans WHERE source_id = ?", row)
+            self.db.execute("DELETE FROM buckets WHERE source_id = ?", row)
+            self.db.execute("DELETE FROM sources WHERE id = ?", row)
+
+    def _store(self, path: Path, stat: os.stat_result, entry: Dict):
+        self._remove(str(path))
+        with self.db:
+            source_id = self.db.execute(
+                "INSERT INTO sources (path, kind, video, category, duration, size, mtime_ns) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (str(path), entry["kind"], entry["video"], entry["category"], entry["duration"], stat.st_size,
+                 stat.st_mtime_ns)).lastrowid
+            self.db.executemany(
+                "INSERT INTO count_spans (start, end, source_id, persons, t0, t1) VALUES (?, ?, ?, ?, ?, ?)",
+                [(start, end, source_id, count, start, end) for start, end, count in entry["spans"]])
+            self.db.executemany(
+                "INSERT INTO buckets VALUES (?, ?, ?, ?)",
+                [(source_id, bucket, peak, round(mean, 3))
+                 for bucket, (peak, mean) in bucket_counts(entry["spans"], self.bucket_seconds).items()])
+            self.db.executemany(
+                "INSERT INTO track_spans (start, end, source_id, track_id, keyframes, mean_confidence, t0, t1) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(start, end, source_id, track_id, n, c, start, end) for start, end, track_id, n, c in entry["tracks"]])
+
+    @staticmethod
+    def _filters(category: Optional[str], kind: Optional[str], video: Optional[str] = None) -> Tuple[str, Dict]:
+        """SQL conditions on the `src` (sources) table, with their named parameters"""
+        clauses, params = [], {}
+        if category:
+            clauses.append("src.category LIKE :category || '%'")
+            params["category"] = category.lower()
+        if kind:
+            clauses.append("src.kind = :kind")
+            params["kind"] = kind
+        if video:
+            clauses.append("(src.video = :video OR src.video LIKE :video || '.%')")
+            params["video"] = video
+        return "".join(f" AND {clause}" for clause in clauses), params
+
+    def videos_with_persons(self, min_persons: int, start: float = 0.0, end: Optional[float] = None,
+                            category: Optional[str] = None, kind: Optional[str] = None) -> List[Dict]:
+        """
+        Videos with at least `min_persons` people at some moment in [start, end), with the
+        peak count, when the threshold is first reached and for how many seconds in total
+        """
+        end = float("inf") if end is None else end
+        extra, params = self._filters(category, kind)
+        rows = self.db.execute(
+            f"""
+            SELECT src.video, src.kind, src.category, MAX(s.persons),
+                   MIN(MAX(s.t0, :start)), SUM(MIN(s.t1, :end) - MAX(s.t0, :start))
+            FROM count_spans s JOIN sources src ON src.id = s.source_id
+            WHERE s.start <= :end AND s.end >= :start AND s.t0 < :end AND s.t1 > :start
+              AND s.persons >= :min_persons {extra}
+            GROUP BY s.source_id ORDER BY src.video, src.kind
+            """, {"start": start, "end": min(end, 3.0e38), "min_persons": max(1, min_persons), **params}).fetchall()
+        return [{"video": video, "kind": kind, "category": category, "peak_persons": peak,
+                 "first_time": round(first, 2), "seconds": round(seconds, 2)}
+                for video, kind, category, peak, first, seconds in rows]
+
+    def person_counts(self, video: str, start: float = 0.0, end: Optional[float] = None,
+                      kind: Optional[str] = None) -> List[Dict]:
+        """Peak and mean person count per time bucket of one video, including empty buckets"""
+        extra, params = self._filters(None, kind, video)
+        sources = self.db.execute(f"SELECT src.id, src.kind, src.duration FROM sources src WHERE 1 {extra}",
+                                  params).fetchall()
+        results = []
+        for source_id, source_kind, duration in sources:
+            last = duration if end is None else min(end, duration)
+            first_bucket = int(start // self.bucket_seconds)
+            last_bucket = max(first_bucket, int(np.ceil(last / self.bucket_seconds)) - 1)
+            stored = {bucket: (peak, mean) for bucket, peak, mean in self.db.execute(
+                "SELECT bucket, max_persons, mean_persons FROM buckets WHERE source_id = ? AND bucket BETWEEN ? AND ?",
+                (source_id, first_bucket, last_bucket))}
+            for bucket in range(first_bucket, last_bucket + 1):
+                peak, mean = stored.get(bucket, (0, 0.0))
+                results.append({"kind": source_kind, "start": round(bucket * self.bucket_seconds, 3),
+                                "max_persons": peak, "mean_persons": mean})
+        return results
+
+    def tracks(self, video: Optional[str] = None, start: float = 0.0, end: Optional[float] = None,
+               min_duration: float = 0.0, category: Optional[str] = None) -> List[Dict]:
+        """Tracked people visible at some point in [start, end), optionally only those seen for min_duration seconds"""
+        end = float("inf") if end is None else end
+        extra, params = self._filters(category, None, video)
+        rows = self.db.execute(
+            f"""
+            SELECT src.video, t.track_id, t.t0, t.t1, t.keyframes, t.mean_confidence
+            FROM track_spans t JOIN sources src ON src.id = t.source_id
+            WHERE t.start <= :end AND t.end >= :start AND t.t0 < :end AND t.t1 > :start
+              AND t.t1 - t.t0 >= :min_duration {extra}
+            ORDER BY src.video, t.t0
+            """, {"start": start, "end": min(end, 3.0e38), "min_duration": min_duration, **params}).fetchall()
+        return [{"video": video_name, "track_id": track_id, "start": round(t0, 2), "end": round(t1, 2),
+                 "duration": round(t1 - t0, 2), "keyframes": keyframes, "mean_confidence": confidence}
+                for video_name, track_id, t0, t1, keyframes, confidence in rows]
+
+    def stats(self) -> Dict:
+        by_kind = dict(self.db.execute("SELECT kind, COUNT(*) FROM sources GROUP BY kind").fetchall())
+        return {
+            "path": str(self.path),
+            "bucket_seconds": self.bucket_seconds,
+            "sources": by_kind,
+            "count_spans": self.db.execute("SELECT COUNT(*) FROM count_spans").fetchone()[0],
+            "buckets": self.db.execute("SELECT COUNT(*) FROM buckets").fetchone()[0],
+            "tracks": self.db.execute("SELECT COUNT(*) FROM track_spans").fetchone()[0],
+            "size_mb": round(self.path.stat().st_size / 1024 / 1024, 2),
+        }
+
+    def close(self):
+        self.db.close()
+
+
+def print_rows(rows: List[Dict], columns: List[str], elapsed_ms: float):
+    if rows:
+        widths = [max(len(column), *(len(str(row[column])) for row in rows)) for column in columns]
+        print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+        for row in rows:
+            print("  ".join(str(row[column]).ljust(width) for column, width in zip(columns, widths)))
+    print(f"\n{len(rows)} rows in {elapsed_ms:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index and query person detections across processed footage")
+    parser.add_argument("--index", default=DEFAULT_INDEX_PATH, help="Index file (env: VIEWGUARD_INDEX)")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    update_parser = subparsers.add_parser("update", help="Index new and changed output files")
+    update_parser.add_argument("paths", nargs="*", type=Path, default=DEFAULT_SOURCES,
+                               help="Files or directories (default: public/bounding_boxes public/annotations)")
+    update_parser.add_argument("--bucket-seconds", type=float, help="Time bucket size (changing it re-indexes all)")
+
+    count_parser = subparsers.add_parser("count", help="Videos with at least N people in a time window")
+    count_parser.add_argument("--min-persons", type=int, required=True)
+    count_parser.add_argument("--start", type=float, default=0.0, help="Window start in seconds")
+    count_parser.add_argument("--end", type=float, help="Window end in seconds (default: end of video)")
+    count_parser.add_argument("--category", help="e.g. burglary, fight")
+    count_parser.add_argument("--kind", choices=["boxes", "annotations"])
+
+    timeline_parser = subparsers.add_parser("timeline", help="Person count per time bucket of one video")
+    timeline_parser.add_argument("video", help="Video file name, with or without extension")
+    timeline_parser.add_argument("--start", type=float, default=0.0)
+    timeline_parser.add_argument("--end", type=float)
+    timeline_parser.add_argument("--kind", choices=["boxes", "annotations"])
+
+    tracks_parser = subparsers.add_parser("tracks", help="Tracked people in a time window")
+    tracks_parser.add_argument("--video")
+    tracks_parser.add_argument("--start", type=float, default=0.0)
+    tracks_parser.add_argument("--end", type=float)
+    tracks_parser.add_argument("--min-duration", type=float, default=0.0, help="Seconds a person must be tracked")
+    tracks_parser.add_argument("--category")
+
+    subparsers.add_parser("stats", help="Index size and contents")
+    args = parser.parse_args()
+
+    index = DetectionIndex(args.index, bucket_seconds=getattr(args, "bucket_seconds", None))
+    started = time.perf_counter()
+    if args.command == "update":
+        counts = index.update(args.paths)
+        print(f"✅ Indexed {counts['indexed']}, unchanged {counts['unchanged']}, skipped {counts['skipped']}, "
+              f"removed {counts['removed']} in {time.perf_counter() - started:.2f}s")
+        print(json.dumps(index.stats(), indent=2))
+        return
+    if args.command == "stats":
+        print(json.dumps(index.stats(), indent=2))
+        return
+
+    if args.command == "count":
+        rows = index.videos_with_persons(args.min_persons, args.start, args.end, args.category, args.kind)
+        columns = ["video", "kind", "category", "peak_persons", "first_time", "seconds"]
+    elif args.command == "timeline":
+        rows = index.person_counts(args.video, args.start, args.end, args.kind)
+        columns = ["kind", "start", "max_persons", "mean_persons"]
+    else:
+        rows = index.tracks(args.video, args.start, args.end, args.min_duration, args.category)
+        columns = ["video", "track_id", "start", "end", "duration", "keyframes", "mean_confidence"]
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print_rows(rows, columns, elapsed_ms)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,22 +3,69 @@ ViewGuard Detection Server
 Real-time person detection using YOLOv8
 """
 
+import argparse
 import asyncio
+import gc
+import gzip
 import json
+import multiprocessing
+import os
+import re
+import signal
+import struct
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from pathlib import Path
 import cv2
 import numpy as np
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from ultralytics import YOLO
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 import base64
-from typing import List, Dict
+from typing import Any, List, Dict, Optional, Set, Tuple, Union
 import logging
+from pydantic import BaseModel
+
+import autotune
+from bbox_format import BoxTrack, current_box_file, load_boxes
+from detectors import BACKENDS, Detector, load_detector, resolve_model
+from frame_ring import FrameRing, FrameSlot, read_frame
+from metrics import Registry
+from profiling import SamplingProfiler
+
+try:
+    import brotli  # optional: /boxes answers with Brotli when the client accepts it
+except ImportError:
+    brotli = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="ViewGuard Detection Server")
+# Boot time, for the startup duration reported once the model is ready
+SERVER_STARTED = time.perf_counter()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start the scheduler, load and warm up the model in the background (see /health/ready), start sources"""
+    if tuning_profile is None:
+        apply_tuning_profile()  # served by `uvicorn detection_server:app` rather than __main__
+    scheduler.start()
+    warm_up = asyncio.create_task(load_model())
+    for config in ingestion.pending_sources:
+        await ingestion.add_source(**config)
+    yield
+    warm_up.cancel()
+    await ingestion.stop_all()
+    await scheduler.stop()
+
+
+app = FastAPI(title="ViewGuard Detection Server", lifespan=lifespan)
 
 # Enable CORS for frontend
 app.add_middleware(
@@ -29,58 +76,1303 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Load YOLOv8 model (nano version for speed, can upgrade to yolov8s.pt or yolov8m.pt for accuracy)
-model = YOLO('yolov8n.pt')  # Will auto-download on first run
+# The person detector is not loaded at import: every inference worker loads its own copy on first
+# use (_current_detector) and the lifespan handler warms all of them up at boot. Backend, weights,
+# input size and threads come from VIEWGUARD_BACKEND / VIEWGUARD_MODEL / VIEWGUARD_IMGSZ /
+# VIEWGUARD_THREADS (see detectors.py); the autotune profile can set the input size (see
+# apply_tuning_profile). The nano YOLOv8 is the default; `.onnx` weights run on ONNX Runtime without torch.
+
+# Execution backend for decode + inference: "thread" or "process" (each process worker holds its own model)
+EXECUTOR_BACKEND = os.getenv("VIEWGUARD_EXECUTOR", "thread")
+INFERENCE_WORKERS = int(os.getenv("VIEWGUARD_WORKERS", "1"))
+# Intra-op threads of each worker's model; 0 splits the CPU cores evenly between workers
+WORKER_THREADS = int(os.getenv("VIEWGUARD_WORKER_THREADS", "0"))
+
+# Server processes forked after loading the model once, sharing its memory copy-on-write (see serve_forked)
+SERVER_PROCESSES = int(os.getenv("VIEWGUARD_PROCESSES", "1"))
+
+# Batching configuration (frames from all connections are batched into a single forward pass)
+MAX_BATCH_SIZE = int(os.getenv("VIEWGUARD_MAX_BATCH_SIZE", "8"))
+MAX_BATCH_WAIT_MS = float(os.getenv("VIEWGUARD_MAX_BATCH_WAIT_MS", "10"))
+INFERENCE_QUEUE_SIZE = int(os.getenv("VIEWGUARD_QUEUE_SIZE", "64"))
+
+# Frames waiting per camera. When inference falls behind, a new frame replaces the oldest pending one.
+MAILBOX_SLOTS = int(os.getenv("VIEWGUARD_MAILBOX_SLOTS", "1"))
+
+# Shared-memory frame ring for the process executor: frames decoded by server-side sources
+# reach the workers as slot descriptors instead of pickled arrays (see frame_ring.py).
+# 0 slots turns it off; frames larger than a slot, or arriving while all slots are busy, are pickled.
+FRAME_RING_SLOTS = int(os.getenv("VIEWGUARD_FRAME_RING_SLOTS", "16"))
+FRAME_RING_SLOT_MB = float(os.getenv("VIEWGUARD_FRAME_RING_SLOT_MB", "6"))  # 6 MB fits a 1080p BGR frame
+
+# Outgoing messages buffered per connection. A client that falls further behind than this,
+# or takes longer than VIEWGUARD_SEND_TIMEOUT seconds to accept one message, is disconnected.
+SUBSCRIBER_BUFFER = int(os.getenv("VIEWGUARD_SUBSCRIBER_BUFFER", "8"))
+SEND_TIMEOUT = float(os.getenv("VIEWGUARD_SEND_TIMEOUT", "5"))
+
+# Motion gate: a frame whose downscaled grayscale thumbnail barely differs from the camera's
+# last inferred frame skips inference and reuses that frame's detections. A frame counts as
+# changed when more than VIEWGUARD_MOTION_THRESHOLD of its thumbnail pixels moved by more than
+# VIEWGUARD_MOTION_PIXEL_DELTA gray levels. Inference still runs at least every
+# VIEWGUARD_MOTION_REFRESH_S seconds per camera, so the cached detections never go stale.
+MOTION_GATE = os.getenv("VIEWGUARD_MOTION_GATE", "1") == "1"
+MOTION_THRESHOLD = float(os.getenv("VIEWGUARD_MOTION_THRESHOLD", "0.01"))
+MOTION_PIXEL_DELTA = int(os.getenv("VIEWGUARD_MOTION_PIXEL_DELTA", "25"))
+MOTION_REFRESH_S = float(os.getenv("VIEWGUARD_MOTION_REFRESH_S", "5"))
+MOTION_THUMBNAIL_WIDTH = 64
+
+# Per-camera "reduce" option: encoded frames are decoded directly at 1/2, 1/4 or 1/8 scale,
+# which is much cheaper than decoding at full size and resizing
+REDUCED_DECODE_FLAGS = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4,
+                        8: cv2.IMREAD_REDUCED_COLOR_8}
+
+# Prometheus metrics served at /metrics. Stage latencies and per-camera frame counters are
+# updated as frames flow through the server; gauges are read from the live objects on each scrape.
+metrics = Registry()
+STAGE_SECONDS = metrics.histogram(
+    "viewguard_stage_seconds",
+    "Time spent per frame in each stage: receive, queue, base64_decode, imdecode, preprocess, inference, "
+    "postprocess, send",
+    ["stage"])
+FRAME_AGE_SECONDS = metrics.histogram("viewguard_frame_age_seconds",
+                                      "Time from receiving a frame to queueing its result for sending")
+BATCH_SIZE = metrics.histogram("viewguard_batch_size", "Frames per inference batch",
+                               buckets=(1, 2, 4, 8, 16, 32, 64))
+CAMERA_FPS = metrics.gauge("viewguard_camera_fps", "Detection results published per second, per camera",
+                           ["camera_id"])
+FRAMES_RECEIVED = metrics.counter("viewguard_frames_received_total", "Frames received per camera", ["camera_id"])
+FRAMES_INFERRED = metrics.counter("viewguard_frames_inferred_total", "Frames run through the model per camera",
+                                  ["camera_id"])
+FRAMES_GATED = metrics.counter("viewguard_frames_gated_total", "Frames answered by the motion gate per camera",
+                               ["camera_id"])
+FRAMES_DROPPED = metrics.counter("viewguard_frames_dropped_total",
+                                 "Frames replaced by a newer frame before inference, per camera", ["camera_id"])
+CAMERA_SUBSCRIBERS = metrics.gauge("viewguard_camera_subscribers", "Sockets receiving each camera's detections",
+                                   ["camera_id"])
+QUEUE_DEPTH = metrics.gauge("viewguard_queue_depth", "Frames waiting for an inference batch")
+ACTIVE_CONNECTIONS = metrics.gauge("viewguard_active_connections", "Open WebSocket connections")
+EVICTED_CONNECTIONS = metrics.counter("viewguard_evicted_connections_total", "Slow clients disconnected")
+MODEL_READY = metrics.gauge("viewguard_model_ready", "1 once every inference worker has loaded and warmed up the model")
+STARTUP_SECONDS = metrics.gauge("viewguard_startup_seconds", "Time from server start until the model was ready")
+RESIDENT_MEMORY = metrics.gauge("process_resident_memory_bytes", "Resident memory of the server process")
+
+# Sampling profiler, switched on at runtime through /debug/profile
+profiler = SamplingProfiler()
+
+# Relative source paths registered through /sources are resolved against this directory
+VIDEOS_DIR = Path(__file__).parent / "public" / "videos"
+
+# Pre-computed bounding box files served by /boxes, parsed files kept in an LRU of this many videos
+BOXES_DIR = Path(os.getenv("VIEWGUARD_BOXES_DIR", Path(__file__).parent / "public" / "bounding_boxes"))
+BOX_CACHE_SIZE = int(os.getenv("VIEWGUARD_BOX_CACHE_SIZE", "32"))
+BOXES_MAX_AGE = int(os.getenv("VIEWGUARD_BOXES_MAX_AGE", "60"))  # Cache-Control max-age, seconds
+COMPRESS_MIN_BYTES = 512
+
+# Binary frame message (client -> server): fixed little-endian header followed by the raw encoded image
+#   uint8 version, uint8 codec, uint16 reserved, uint32 camera_id,
+#   float64 timestamp (ms since epoch), float32 confidence
+FRAME_HEADER = struct.Struct("<BBHIdf")
+PROTOCOL_VERSION = 1
+CODEC_JPEG = 0
+CODEC_WEBP = 1
+SUPPORTED_CODECS = {CODEC_JPEG, CODEC_WEBP}
+
+# Binary detection message (server -> client): header followed by `count` records of
+# five float32 values (x, y, width, height, score)
+#   uint32 camera_id, float64 timestamp, uint16 frame_width, uint16 frame_height,
+#   uint32 dropped_frames, float32 frame_age_ms, uint16 count
+RESULT_HEADER = struct.Struct("<IdHHIfH")
+
+
+def parse_binary_frame(data: bytes) -> Dict[str, Any]:
+    """
+    Parse a binary frame message. The image payload is returned as a uint8 view over
+    the received buffer, so it reaches cv2.imdecode without being copied.
+    """
+    if len(data) <= FRAME_HEADER.size:
+        raise ValueError(f"Binary frame too short ({len(data)} bytes)")
+
+    version, codec, _, camera_id, timestamp, confidence = FRAME_HEADER.unpack_from(data)
+    if version != PROTOCOL_VERSION:
+        raise ValueError(f"Unsupported binary protocol version: {version}")
+    if codec not in SUPPORTED_CODECS:
+        raise ValueError(f"Unsupported codec: {codec}")
+
+    return {
+        "type": "frame",
+        "data": np.frombuffer(data, np.uint8, offset=FRAME_HEADER.size),
+        "camera_id": camera_id,
+        "confidence": float(confidence),
+        "timestamp": timestamp,
+    }
+
+
+def encode_detections_binary(response: Dict) -> bytes:
+    """Pack a detection response into the binary result format"""
+    detections = response["detections"]
+    timestamp = response.get("timestamp")
+    if not isinstance(timestamp, (int, float)):
+        timestamp = 0.0
+
+    header = RESULT_HEADER.pack(response["camera_id"], timestamp, response["frame_width"],
+                                response["frame_height"], response.get("dropped_frames", 0),
+                                response.get("frame_age_ms", 0.0), len(detections))
+    records = np.asarray([d["bbox"] + [d["score"]] for d in detections], dtype="<f4")
+    return header + records.tobytes()
+
+
+def encode_response(response: Dict, binary: bool) -> Union[str, bytes]:
+    """Serialize a detection response for the wire (JSON text or packed binary)"""
+    if binary:
+        return encode_detections_binary(response)
+    return json.dumps(response, separators=(",", ":"))
+
 
 class ConnectionManager:
+    """
+    Tracks open sockets. Every connection gets a bounded outbox drained by its own
+    sender task, so a broadcast never waits on a slow client; clients that can't
+    keep up are evicted instead of buffering without limit.
+    """
+
     def __init__(self):
         self.active_connections: List[WebSocket] = []
+        # Per-connection state: negotiated response format, outbox and sender task
+        self.sessions: Dict[WebSocket, Dict] = {}
+        self.evicted = 0
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket, binary_responses: bool = False):
         await websocket.accept()
         self.active_connections.append(websocket)
+        session = {"binary_responses": binary_responses, "outbox": deque(), "ready": asyncio.Event()}
+        session["sender"] = asyncio.create_task(self._send_loop(websocket, session))
+        self.sessions[websocket] = session
         logger.info(f"Client connected. Total connections: {len(self.active_connections)}")
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        if websocket in self.active_connections:
+            self.active_connections.remove(websocket)
+        session = self.sessions.pop(websocket, None)
+        if session is not None:
+            session["sender"].cancel()
+        broker.unsubscribe_all(websocket)
         logger.info(f"Client disconnected. Total connections: {len(self.active_connections)}")
 
-    async def send_detections(self, websocket: WebSocket, detections: Dict):
-        await websocket.send_json(detections)
+    def set_binary_responses(self, websocket: WebSocket, enabled: bool):
+        self.sessions[websocket]["binary_responses"] = enabled
+
+    def wants_binary(self, websocket: WebSocket) -> bool:
+        session = self.sessions.get(websocket)
+        return session is not None and session["binary_responses"]
+
+    def enqueue(self, websocket: WebSocket, payload: Union[str, bytes]):
+        """Queue an already-encoded message for a connection without waiting for the send"""
+        session = self.sessions.get(websocket)
+        if session is None or session.get("evicted"):
+            return
+        if len(session["outbox"]) >= SUBSCRIBER_BUFFER:
+            self.evict(websocket, f"{SUBSCRIBER_BUFFER} messages pending")
+            return
+        session["outbox"].append(payload)
+        session["ready"].set()
+
+    def send_detections(self, websocket: WebSocket, detections: Dict):
+        self.enqueue(websocket, encode_response(detections, self.wants_binary(websocket)))
+
+    def evict(self, websocket: WebSocket, reason: str):
+        """Drop a slow consumer: stop publishing to it and close the socket"""
+        session = self.sessions.get(websocket)
+        if session is None or session.get("evicted"):
+            return
+        logger.warning(f"Evicting slow client ({reason})")
+        self.evicted += 1
+        session["evicted"] = True
+        session["outbox"].clear()
+        broker.unsubscribe_all(websocket)
+        asyncio.create_task(self._close(websocket))
+
+    @staticmethod
+    async def _close(websocket: WebSocket):
+        try:
+            await websocket.close(code=1013)  # "Try again later"
+        except Exception:
+            pass
+
+    async def _send_loop(self, websocket: WebSocket, session: Dict):
+        outbox = session["outbox"]
+        while True:
+            while not outbox:
+                session["ready"].clear()
+                await session["ready"].wait()
+            payload = outbox.popleft()
+
+            send = websocket.send_bytes(payload) if isinstance(payload, bytes) else websocket.send_text(payload)
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(send, SEND_TIMEOUT)
+                STAGE_SECONDS.observe(time.perf_counter() - started, stage="send")
+            except asyncio.TimeoutError:
+                self.evict(websocket, f"send took longer than {SEND_TIMEOUT}s")
+                return
+            except Exception:
+                # Socket is gone; the receive loop cleans up the connection
+                return
 
 manager = ConnectionManager()
 
 
+class FrameMailbox:
+    """
+    Bounded mailbox of pending frames for one camera. Putting a frame into a full
+    mailbox evicts the oldest pending frame, so the processed frame is never more
+    than `slots` frames behind the live feed.
+    """
+
+    def __init__(self, slots: int = MAILBOX_SLOTS):
+        self.slots = max(1, slots)
+        self.pending = deque()
+        self.received = 0
+        self.dropped = 0
+        self._ready = asyncio.Event()
+
+    def put(self, message: Dict) -> Optional[Dict]:
+        """Queue a frame; returns the evicted frame, if any"""
+        message["received_at"] = time.perf_counter()
+        evicted = None
+        if len(self.pending) >= self.slots:
+            evicted = self.pending.popleft()
+            self.dropped += 1
+        self.pending.append(message)
+        self.received += 1
+        self._ready.set()
+        return evicted
+
+    async def get(self) -> Dict:
+        while not self.pending:
+            self._ready.clear()
+            await self._ready.wait()
+        return self.pending.popleft()
+
+
+# Per-worker detector instance. Ultralytics models are not safe to share between threads,
+# so every thread (and every process) worker holds its own copy, loaded on first use.
+_worker_state = threading.local()
+
+# Detector loaded before forking server processes (see serve_forked). The first thread
+# worker of each process takes it over, so its weights stay in shared copy-on-write pages.
+_preloaded_detector: Optional[Detector] = None
+_preloaded_lock = threading.Lock()
+
+# Square black frame run through each worker's model at boot (first-call allocations, kernel selection)
+WARMUP_FRAME_SIZE = 640
+
+
+def _init_inference_worker(num_threads: int, imgsz: Optional[int] = None):
+    """Pool initializer: give this worker a share of the CPU cores and its model input size"""
+    cv2.setNumThreads(1)
+    _worker_state.num_threads = num_threads
+    _worker_state.imgsz = imgsz
+
+
+def _current_detector() -> Detector:
+    """This worker's detector, loaded (or taken over from the preloaded one) on first use"""
+    global _preloaded_detector
+    model = getattr(_worker_state, "detector", None)
+    if model is None:
+        num_threads = getattr(_worker_state, "num_threads", None)
+        with _preloaded_lock:
+            model, _preloaded_detector = _preloaded_detector, None
+        if model is None:
+            model = load_detector(imgsz=getattr(_worker_state, "imgsz", None), num_threads=num_threads)
+        elif num_threads is not None:
+            model.set_num_threads(num_threads)
+        _worker_state.detector = model
+    return model
+
+
+def resident_memory_mb() -> float:
+    """Resident memory of this process (peak resident memory where /proc is not available)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def warm_up_worker() -> Dict:
+    """Load this worker's detector if needed and run one dummy frame through it; returns timings"""
+    started = time.perf_counter()
+    model = _current_detector()
+    loaded = time.perf_counter()
+    model.predict([np.zeros((WARMUP_FRAME_SIZE, WARMUP_FRAME_SIZE, 3), dtype=np.uint8)])
+    return {
+        "pid": os.getpid(),
+        "thread": threading.current_thread().name,
+        "model": model.describe(),
+        "load_s": round(loaded - started, 3),
+        "warmup_s": round(time.perf_counter() - loaded, 3),
+        "rss_mb": round(resident_memory_mb(), 1),
+    }
+
+
 def detect_persons(frame: np.ndarray, confidence_threshold: float = 0.5) -> List[Dict]:
     """
-    Detect persons in a frame using YOLOv8
+    Detect persons in a frame using the configured detector backend
     Returns list of detections with bbox and confidence
     """
-    # Run inference
-    results = model(frame, verbose=False, classes=[0])  # class 0 is 'person' in COCO dataset
+    return detect_persons_batch([frame], [confidence_threshold])[0]
+
+
+def detect_persons_batch(frames: List[np.ndarray], confidence_thresholds: List[float]) -> List[List[Dict]]:
+    """
+    Detect persons in several frames with a single forward pass
+    Returns one detection list per frame, filtered by that frame's threshold
+    """
+    # Run inference. The lowest threshold in the batch goes into the model call so
+    # low-confidence boxes are dropped before NMS instead of after it in Python.
+    predictions = _current_detector().predict(frames, conf=min(confidence_thresholds))
+
+    return [detections_from_arrays(xyxy, confidences, confidence_threshold)
+            for (xyxy, confidences), confidence_threshold in zip(predictions, confidence_thresholds)]
+
+
+def detections_from_arrays(xyxy: np.ndarray, confidences: np.ndarray, confidence_threshold: float) -> List[Dict]:
+    """
+    Filter boxes by confidence and convert them from [x1, y1, x2, y2] to
+    [x, y, width, height] detection dicts, operating on whole arrays at once
+    """
+    keep = confidences >= confidence_threshold
+    xywh = xyxy[keep].copy()
+    xywh[:, 2:4] -= xywh[:, 0:2]
+
+    return [
+        {"bbox": bbox, "score": score}
+        for bbox, score in zip(xywh.tolist(), confidences[keep].tolist())
+    ]
+
+
+def decode_frame(payload: Union[str, bytes, np.ndarray], reduce: int = 1) -> Optional[np.ndarray]:
+    """
+    Decode a base64 string, raw encoded image bytes or a uint8 buffer view into a BGR frame,
+    optionally at 1/reduce scale. Frames that are already decoded (H x W x 3 arrays from
+    server-side sources) pass through, resized if reduce > 1.
+    """
+    if isinstance(payload, np.ndarray):
+        if payload.ndim == 3:
+            if reduce == 1:
+                return payload
+            height, width = payload.shape[:2]
+            return cv2.resize(payload, (-(-width // reduce), -(-height // reduce)), interpolation=cv2.INTER_AREA)
+        np_arr = payload
+    else:
+        img_data = base64.b64decode(payload) if isinstance(payload, str) else payload
+        np_arr = np.frombuffer(img_data, np.uint8)
+    return cv2.imdecode(np_arr, REDUCED_DECODE_FLAGS[reduce])
+
+
+def apply_roi(frame: np.ndarray, roi: Optional[List[List[float]]]) -> Tuple[np.ndarray, Tuple[int, int], Optional[np.ndarray]]:
+    """
+    Crop a frame to the bounding rectangle of an ROI polygon ([x, y] points as fractions
+    of the frame size) and gray out the pixels outside the polygon, so the model neither
+    spends time on nor detects anything outside it. Returns the image, its (x, y) offset
+    in the frame and the polygon mask of the image (None without an ROI).
+    """
+    if not roi:
+        return frame, (0, 0), None
+    height, width = frame.shape[:2]
+    points = np.round(np.asarray(roi, dtype=np.float64) * [width, height]).astype(np.int32)
+    x0, y0 = points.min(axis=0).clip(0, [width - 1, height - 1])
+    x1, y1 = (points.max(axis=0) + 1).clip(1, [width, height])
+
+    image = frame[y0:y1, x0:x1].copy()
+    mask = np.zeros(image.shape[:2], dtype=np.uint8)
+    cv2.fillPoly(mask, [points - [x0, y0]], 1)
+    image[mask == 0] = 114  # the gray ultralytics letterboxes with
+    return image, (int(x0), int(y0)), mask
+
+
+def boxes_to_frame(xyxy: np.ndarray, confidences: np.ndarray, offset: Tuple[int, int], mask: Optional[np.ndarray],
+                   scale: Tuple[float, float], size: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Map boxes found in an ROI image of a (reduced) frame back to original frame pixels,
+    dropping boxes whose center falls outside the ROI polygon
+    """
+    if mask is not None and len(xyxy):
+        centers_x = ((xyxy[:, 0] + xyxy[:, 2]) / 2).astype(np.int64).clip(0, mask.shape[1] - 1)
+        centers_y = ((xyxy[:, 1] + xyxy[:, 3]) / 2).astype(np.int64).clip(0, mask.shape[0] - 1)
+        keep = mask[centers_y, centers_x] > 0
+        xyxy, confidences = xyxy[keep], confidences[keep]
+
+    xyxy = (xyxy + [offset[0], offset[1], offset[0], offset[1]]) * [scale[0], scale[1], scale[0], scale[1]]
+    xyxy = xyxy.clip(0, [size[0], size[1], size[0], size[1]])
+    return xyxy.astype(np.float32), confidences
+
+
+def motion_thumbnail(frame: np.ndarray) -> np.ndarray:
+    """Small grayscale copy of a frame for the motion gate; area averaging smooths out sensor noise"""
+    height, width = frame.shape[:2]
+    size = (MOTION_THUMBNAIL_WIDTH, max(1, round(MOTION_THUMBNAIL_WIDTH * height / width)))
+    return cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), size, interpolation=cv2.INTER_AREA)
+
+
+def motion_score(thumbnail: np.ndarray, reference: np.ndarray) -> float:
+    """Fraction of thumbnail pixels that changed noticeably since the reference (1.0 if not comparable)"""
+    if thumbnail.shape != reference.shape:
+        return 1.0
+    return float(np.count_nonzero(cv2.absdiff(thumbnail, reference) > MOTION_PIXEL_DELTA)) / thumbnail.size
+
+
+def decode_and_detect_batch(payloads: List[Union[str, bytes, np.ndarray, FrameSlot]], confidence_thresholds: List[float],
+                            references: Optional[List[Optional[np.ndarray]]] = None,
+                            options: Optional[List[Dict]] = None) -> List[Optional[Tuple]]:
+    """
+    Decode encoded frames and run batched detection on them. This is the unit of
+    work handed to the executor, so it must stay a picklable module-level function.
+
+    `options` holds each frame's camera configuration (see CameraConfig): "reduce"
+    decodes at a fraction of the size, "roi" restricts detection to a polygon and
+    "imgsz" sets the model input size. Frames are batched per input size, and boxes
+    are always returned in original frame pixels.
+
+    With `references` (one motion thumbnail or None per payload), every frame also
+    gets a thumbnail, and frames that barely differ from their reference skip
+    inference. Returns (detections, frame_width, frame_height, thumbnail, timings)
+    per payload, where detections is None for skipped frames and timings holds the
+    seconds each stage took for that frame, or None if the payload failed to decode.
+
+    Decoded frames may arrive as FrameSlot descriptors, which are read in place from
+    the shared-memory frame ring; nothing returned refers to the slot's memory.
+    """
+    options = options or [{}] * len(payloads)
+    outputs: List[Optional[Tuple]] = [None] * len(payloads)
+    thumbnails = [None] * len(payloads)
+    timings: List[Dict[str, float]] = [{} for _ in payloads]
+    views = {}
+    groups: Dict[Optional[int], List[int]] = {}
+
+    for i, payload in enumerate(payloads):
+        reduce = options[i].get("reduce", 1)
+        started = time.perf_counter()
+        if isinstance(payload, FrameSlot):
+            payload = read_frame(payload)
+        elif isinstance(payload, str):
+            payload = base64.b64decode(payload)
+            decoded = time.perf_counter()
+            timings[i]["base64_decode"] = decoded - started
+            started = decoded
+        frame = decode_frame(payload, reduce)
+        timings[i]["imdecode"] = time.perf_counter() - started
+        if frame is None:
+            continue
+        if isinstance(payload, np.ndarray) and payload.ndim == 3:
+            size = (payload.shape[1], payload.shape[0])
+        else:
+            # Reduced decoding rounds up, so this is the original size to within `reduce` pixels
+            size = (frame.shape[1] * reduce, frame.shape[0] * reduce)
+        started = time.perf_counter()
+        image, offset, mask = apply_roi(frame, options[i].get("roi"))
+        views[i] = (image, offset, mask, (size[0] / frame.shape[1], size[1] / frame.shape[0]), size)
+
+        if references is not None:
+            # The gate only looks at the ROI, so motion elsewhere doesn't trigger inference
+            thumbnails[i] = motion_thumbnail(image)
+        timings[i]["preprocess"] = time.perf_counter() - started
+        if references is not None and references[i] is not None and \
+                motion_score(thumbnails[i], references[i]) < MOTION_THRESHOLD:
+            outputs[i] = (None, size[0], size[1], thumbnails[i], timings[i])
+            continue
+        groups.setdefault(options[i].get("imgsz"), []).append(i)
+
+    # One forward pass per model input size. The lowest threshold in each pass goes into
+    # the model call so low-confidence boxes are dropped before NMS instead of after it.
+    for imgsz, indices in groups.items():
+        started = time.perf_counter()
+        predictions = _current_detector().predict([views[i][0] for i in indices],
+                                                  conf=min(confidence_thresholds[i] for i in indices), imgsz=imgsz)
+        inference_seconds = (time.perf_counter() - started) / len(indices)
+
+        for i, (xyxy, confidences) in zip(indices, predictions):
+            started = time.perf_counter()
+            _, offset, mask, scale, size = views[i]
+            xyxy, confidences = boxes_to_frame(xyxy, confidences, offset, mask, scale, size)
+            detections = detections_from_arrays(xyxy, confidences, confidence_thresholds[i])
+            timings[i]["inference"] = inference_seconds
+            timings[i]["postprocess"] = time.perf_counter() - started
+            outputs[i] = (detections, size[0], size[1], thumbnails[i], timings[i])
+    return outputs
+
+
+def shares_thread_count(executor_backend: str) -> bool:
+    """True when the workers would all set one process-wide thread count: thread workers on torch"""
+    backend = BACKENDS.get(resolve_model()[0])
+    return executor_backend == "thread" and getattr(backend, "shared_threads", False)
+
+
+def threads_per_worker(workers: int, threads: int = WORKER_THREADS, executor_backend: str = EXECUTOR_BACKEND) -> int:
+    """
+    Threads for each inference worker: `threads` if set (default VIEWGUARD_WORKER_THREADS), else
+    a share of the CPU cores. Workers sharing one process-wide count get all of them instead:
+    splitting it would leave every worker on cpu/N threads in total.
+    """
+    if threads > 0:
+        return threads
+    if shares_thread_count(executor_backend):
+        return os.cpu_count() or 1
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def create_executor(backend: str, workers: int, threads: Optional[int] = None,
+                    imgsz: Optional[int] = None) -> Executor:
+    """
+    Build the worker pool that runs decode + inference, with `threads` per worker (default:
+    threads_per_worker) and models loaded at `imgsz` (default: VIEWGUARD_IMGSZ)
+    """
+    workers = max(1, workers)
+    threads = threads or threads_per_worker(workers, executor_backend=backend)
+
+    if backend == "process":
+        # Spawn rather than fork: forking after torch has started its thread pools can deadlock
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=_init_inference_worker, initargs=(threads, imgsz))
+    if backend == "thread":
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference",
+                                  initializer=_init_inference_worker, initargs=(threads, imgsz))
+    raise ValueError(f"Unknown executor backend: {backend!r} (expected 'thread' or 'process')")
+
+
+class BatchStats:
+    """Rolling statistics about recent inference batches"""
+
+    def __init__(self, max_batch_size: int, window: int = 1000):
+        self.max_batch_size = max_batch_size
+        self.total_batches = 0
+        self.total_frames = 0
+        self.batch_sizes = deque(maxlen=window)
+        self.batch_latencies_ms = deque(maxlen=window)
+        self.frame_latencies_ms = deque(maxlen=window)
+
+    def record(self, batch_size: int, batch_latency_ms: float, frame_latencies_ms: List[float]):
+        self.total_batches += 1
+        self.total_frames += batch_size
+        self.batch_sizes.append(batch_size)
+        self.batch_latencies_ms.append(batch_latency_ms)
+        self.frame_latencies_ms.extend(frame_latencies_ms)
+
+    @staticmethod
+    def _percentiles(values) -> Dict:
+        if not values:
+            return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+        p50, p95, p99 = np.percentile(np.fromiter(values, dtype=np.float64), [50, 95, 99])
+        return {"p50": round(float(p50), 2), "p95": round(float(p95), 2), "p99": round(float(p99), 2)}
+
+    def summary(self) -> Dict:
+        mean_batch = float(np.mean(self.batch_sizes)) if self.batch_sizes else 0.0
+        return {
+            "total_batches": self.total_batches,
+            "total_frames": self.total_frames,
+            "max_batch_size": self.max_batch_size,
+            "mean_batch_size": round(mean_batch, 2),
+            "mean_occupancy": round(mean_batch / self.max_batch_size, 3),
+            "batch_latency_ms": self._percentiles(self.batch_latencies_ms),
+            "frame_latency_ms": self._percentiles(self.frame_latencies_ms),
+        }
+
+
+class InferenceScheduler:
+    """
+    Collects frames from every active connection into a bounded queue and runs
+    them through the model in micro-batches. A batch is dispatched once it holds
+    max_batch_size frames or max_wait_ms has passed since its first frame arrived.
+
+    Decode and inference run in a worker pool, never on the event loop. Up to one
+    batch per worker is in flight at a time.
+    """
+
+    def __init__(self, max_batch_size: int = MAX_BATCH_SIZE, max_wait_ms: float = MAX_BATCH_WAIT_MS,
+                 queue_size: int = INFERENCE_QUEUE_SIZE, executor_backend: str = EXECUTOR_BACKEND,
+                 workers: int = INFERENCE_WORKERS, threads: int = WORKER_THREADS, imgsz: Optional[int] = None,
+                 motion_gate: bool = MOTION_GATE, frame_ring_slots: int = FRAME_RING_SLOTS):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue_size = queue_size
+        self.executor_backend = executor_backend
+        self.workers = max(1, workers)
+        self.threads = threads  # per worker, 0 = a share of the CPU cores
+        self.imgsz = imgsz  # model input size, None = VIEWGUARD_IMGSZ
+        self.motion_gate = motion_gate
+        self.frame_ring_slots = frame_ring_slots
+        self.frame_ring: Optional[FrameRing] = None
+        self.stats = BatchStats(self.max_batch_size)
+        self.queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._executor: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._inflight = set()
+
+    def start(self):
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self._slots = asyncio.Semaphore(self.workers)
+        self._executor = create_executor(self.executor_backend, self.workers,
+                                         threads_per_worker(self.workers, self.threads, self.executor_backend),
+                                         self.imgsz)
+        if self.executor_backend == "process" and self.frame_ring_slots > 0:
+            # Thread workers read the caller's array directly; only processes need the ring
+            self.frame_ring = FrameRing(self.frame_ring_slots, int(FRAME_RING_SLOT_MB * 1024 * 1024))
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Inference scheduler started (executor={self.executor_backend}, workers={self.workers}, "
+                    f"max_batch_size={self.max_batch_size}, max_wait_ms={self.max_wait * 1000:.1f}, "
+                    f"queue_size={self.queue_size}, motion_gate={self.motion_gate}, "
+                    f"frame_ring_slots={self.frame_ring.slots if self.frame_ring is not None else 0})")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self.frame_ring is not None:
+            self.frame_ring.close()
+            self.frame_ring = None
+
+    def frame_payload(self, frame: np.ndarray, camera_id, timestamp: float) -> Union[np.ndarray, FrameSlot]:
+        """
+        What to submit for a decoded frame: a frame ring slot when workers are processes and
+        a slot is free, else the array itself. Safe to call from source reader threads.
+        submit() recycles the slot after inference; a payload that is dropped instead
+        must be given back with release_payload().
+        """
+        ring = self.frame_ring
+        if ring is None:
+            return frame
+        return ring.put(frame, camera_id, timestamp) or frame
+
+    def release_payload(self, payload):
+        """Recycle the frame ring slot of a payload that was processed or dropped"""
+        if isinstance(payload, FrameSlot) and self.frame_ring is not None:
+            self.frame_ring.release(payload)
+
+    async def warm_up(self) -> List[Dict]:
+        """Load and warm up the model in every worker; returns one warm_up_worker report per worker"""
+        loop = asyncio.get_running_loop()
+        reports = {}
+        # Pools hand tasks to whichever worker is free, so repeat until each one has answered
+        while len(reports) < self.workers:
+            missing = self.workers - len(reports)
+            for report in await asyncio.gather(*(loop.run_in_executor(self._executor, warm_up_worker)
+                                                 for _ in range(missing))):
+                reports[report["pid"], report["thread"]] = report
+        return list(reports.values())
+
+    async def submit(self, payload: Union[str, bytes, np.ndarray, FrameSlot], confidence_threshold: float,
+                     reference: Optional[np.ndarray] = None, options: Optional[Dict] = None) -> Optional[Tuple]:
+        """
+        Queue an encoded frame for the next batch and wait for its result (see
+        decode_and_detect_batch), or None if the frame could not be decoded.
+        With the motion gate on, a frame similar to `reference` skips inference.
+        `options` is the camera's configuration (imgsz, reduce, roi).
+        A frame ring payload is released once its batch has run.
+        """
+        future = asyncio.get_running_loop().create_future()
+        try:
+            await self.queue.put((payload, confidence_threshold, reference, options or {}, future, time.perf_counter()))
+        except asyncio.CancelledError:
+            self.release_payload(payload)
+            raise
+        return await future
+
+    async def _collect_batch(self) -> List[Tuple]:
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self):
+        while True:
+            # Wait for a free worker first so the queue keeps filling while all workers are busy
+            await self._slots.acquire()
+            batch = await self._collect_batch()
+            task = asyncio.create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, batch: List[Tuple]):
+        loop = asyncio.get_running_loop()
+        payloads = [item[0] for item in batch]
+        thresholds = [item[1] for item in batch]
+        references = [item[2] for item in batch] if self.motion_gate else None
+        options = [item[3] for item in batch]
+
+        started = time.perf_counter()
+        try:
+            results = await loop.run_in_executor(self._executor, decode_and_detect_batch, payloads, thresholds,
+                                                 references, options)
+        except Exception as e:
+            logger.error(f"Batch inference failed: {e}")
+            for _, _, _, _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+            for payload in payloads:
+                self.release_payload(payload)
+        finished = time.perf_counter()
+
+        for (_, _, _, _, future, enqueued), result in zip(batch, results):
+            STAGE_SECONDS.observe(started - enqueued, stage="queue")
+            if result is not None:
+                for stage, seconds in result[4].items():
+                    STAGE_SECONDS.observe(seconds, stage=stage)
+            if not future.done():
+                future.set_result(result)
+        BATCH_SIZE.observe(len(batch))
+
+        self.stats.record(
+            len(batch),
+            (finished - started) * 1000,
+            [(finished - enqueued) * 1000 for _, _, _, _, _, enqueued in batch],
+        )
+
+
+class MotionGate:
+    """
+    Motion gate state for one camera: the thumbnail and detections of the last
+    inferred frame, and counters of how much inference the gate skipped
+    """
+
+    def __init__(self, refresh_s: float = MOTION_REFRESH_S):
+        self.refresh_s = refresh_s
+        self.reference: Optional[np.ndarray] = None
+        self.detections: List[Dict] = []
+        self.last_inference = 0.0
+        self.frames_gated = 0
+        self.inference_ms_saved = 0.0
+        self.mean_inference_ms = 0.0  # moving average of per-frame inference time
+
+    def current_reference(self) -> Optional[np.ndarray]:
+        """Reference thumbnail for the next frame, or None to force inference"""
+        if time.perf_counter() - self.last_inference >= self.refresh_s:
+            return None
+        return self.reference
+
+    def inferred(self, thumbnail: Optional[np.ndarray], detections: List[Dict], inference_ms: float):
+        self.reference = thumbnail
+        self.detections = detections
+        self.last_inference = time.perf_counter()
+        if self.mean_inference_ms:
+            self.mean_inference_ms += 0.1 * (inference_ms - self.mean_inference_ms)
+        else:
+            self.mean_inference_ms = inference_ms
+
+    def gated(self) -> List[Dict]:
+        """Count a skipped frame and return the detections it reuses"""
+        self.frames_gated += 1
+        self.inference_ms_saved += self.mean_inference_ms
+        return self.detections
+
+
+scheduler = InferenceScheduler()
+
+
+class ModelState:
+    """Model loading progress of the inference workers, reported by /health/ready"""
+
+    def __init__(self):
+        self.status = "loading"  # then "ready" or "failed"
+        self.error: Optional[str] = None
+        self.model: Optional[Dict] = None
+        self.workers: List[Dict] = []
+        self.startup_s: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def describe(self) -> Dict:
+        return {
+            "status": self.status,
+            "error": self.error,
+            "model": self.model,
+            "startup_s": self.startup_s,
+            "workers": self.workers,
+        }
+
+
+model_state = ModelState()
+
+
+async def load_model():
+    """Warm up every inference worker at boot, then mark the server ready and log startup time and memory"""
+    started = time.perf_counter()
+    try:
+        reports = await scheduler.warm_up()
+    except Exception as e:
+        model_state.status = "failed"
+        model_state.error = str(e)
+        logger.error(f"❌ Model failed to load: {e}")
+        return
+
+    model_state.workers = reports
+    model_state.model = reports[0]["model"]
+    model_state.startup_s = round(time.perf_counter() - SERVER_STARTED, 2)
+    model_state.status = "ready"
+    MODEL_READY.set(1)
+    STARTUP_SECONDS.set(model_state.startup_s)
+
+    load_s = max(report["load_s"] for report in reports)
+    warmup_s = max(report["warmup_s"] for report in reports)
+    memory = f"RSS {resident_memory_mb():.0f} MB"
+    if scheduler.executor_backend == "process":
+        memory += f" (+ workers: {', '.join(str(round(report['rss_mb'])) for report in reports)} MB)"
+    logger.info(f"✅ Model ready in {time.perf_counter() - started:.2f}s (load {load_s:.2f}s, warm-up {warmup_s:.2f}s), "
+                f"startup {model_state.startup_s:.2f}s, {memory}: {model_state.model}")
+
+
+class CameraChannel:
+    """
+    Detections for one camera_id. Frames from every uploader (and from a server-side
+    source) share one mailbox, a single producer runs inference on the newest one,
+    and each result is encoded once per wire format and queued to every subscriber.
+    """
+
+    def __init__(self, camera_id):
+        self.camera_id = camera_id
+        self.subscribers: Set[WebSocket] = set()
+        self.mailbox = FrameMailbox()
+        self.frames_inferred = 0
+        self.messages_sent = 0
+        self.gate = MotionGate()
+        self.published_at = deque(maxlen=1024)  # perf_counter() of recent results, for fps()
+        self._producer: Optional[asyncio.Task] = None
+
+    def push_frame(self, message: Dict):
+        evicted = self.mailbox.put(message)
+        FRAMES_RECEIVED.inc(camera_id=self.camera_id)
+        if evicted is not None:
+            FRAMES_DROPPED.inc(camera_id=self.camera_id)
+            scheduler.release_payload(evicted["data"])
+        if self._producer is None:
+            self._producer = asyncio.create_task(self._produce())
+
+    def close(self):
+        if self._producer is not None:
+            self._producer.cancel()
+            self._producer = None
+        while self.mailbox.pending:
+            scheduler.release_payload(self.mailbox.pending.popleft()["data"])
+
+    async def _produce(self):
+        while True:
+            message = await self.mailbox.get()
+            if not self.subscribers:
+                # Nobody is watching this camera; don't spend inference on it
+                scheduler.release_payload(message["data"])
+                continue
+
+            # Get confidence threshold from message or use default
+            confidence = message.get("confidence", 0.5)
+
+            # Decode and detect persons in the worker pool (batched with frames from other cameras)
+            try:
+                result = await scheduler.submit(message["data"], confidence, self.gate.current_reference(),
+                                                broker.configs.get(self.camera_id))
+            except Exception as e:
+                logger.error(f"Detection failed for camera {self.camera_id}: {e}")
+                continue
+
+            if result is None:
+                logger.warning("Failed to decode frame")
+                continue
+
+            detections, frame_width, frame_height, thumbnail, timings = result
+            if detections is None:
+                # Nothing moved since the last inferred frame: its detections still apply
+                detections = self.gate.gated()
+                FRAMES_GATED.inc(camera_id=self.camera_id)
+                source = "gate"
+            else:
+                self.gate.inferred(thumbnail, detections, timings["inference"] * 1000)
+                self.frames_inferred += 1
+                FRAMES_INFERRED.inc(camera_id=self.camera_id)
+                source = "inference"
+
+            response = {
+                "camera_id": self.camera_id,
+                "detections": detections,
+                "frame_width": frame_width,
+                "frame_height": frame_height,
+                "timestamp": message.get("timestamp", ""),
+                "dropped_frames": self.mailbox.dropped,
+                "frame_age_ms": round((time.perf_counter() - message["received_at"]) * 1000, 1),
+                "source": source,
+            }
+            if "frame_index" in message:
+                response["frame_index"] = message["frame_index"]
+            FRAME_AGE_SECONDS.observe(response["frame_age_ms"] / 1000)
+
+            self.publish(response)
+
+    def fps(self, window_s: float = 5.0) -> float:
+        """Results published per second over the last window_s seconds"""
+        cutoff = time.perf_counter() - window_s
+        return sum(1 for published in self.published_at if published >= cutoff) / window_s
+
+    def publish(self, response: Dict):
+        self.published_at.append(time.perf_counter())
+        encoded: Dict[bool, Union[str, bytes]] = {}
+        for websocket in list(self.subscribers):
+            binary = manager.wants_binary(websocket)
+            if binary not in encoded:
+                encoded[binary] = encode_response(response, binary)
+            manager.enqueue(websocket, encoded[binary])
+            self.messages_sent += 1
+
+    def gate_counts(self) -> Dict[str, float]:
+        return {"frames_gated": self.gate.frames_gated, "frames_inferred": self.frames_inferred,
+                "inference_ms_saved": self.gate.inference_ms_saved}
+
+    def describe(self) -> Dict:
+        totals = broker.gate_totals(self.camera_id)  # includes earlier channels of this camera
+        gated, inferred = totals["frames_gated"], totals["frames_inferred"]
+        return {
+            "camera_id": self.camera_id,
+            "subscribers": len(self.subscribers),
+            "frames_received": self.mailbox.received,
+            "frames_inferred": inferred,
+            "fps": round(self.fps(), 2),
+            "frames_gated": gated,
+            "gate_skip_ratio": round(gated / max(1, gated + inferred), 3),
+            "inference_ms_saved": round(totals["inference_ms_saved"], 1),
+            "dropped_frames": self.mailbox.dropped,
+            "messages_sent": self.messages_sent,
+            "config": broker.configs.get(self.camera_id, {}),
+        }
+
+
+GATE_TOTALS = ("frames_gated", "frames_inferred", "inference_ms_saved")
+
+
+class DetectionBroker:
+    """Pub/sub keyed by camera_id: inference cost scales with cameras, not viewers"""
+
+    def __init__(self):
+        self.channels: Dict[Any, CameraChannel] = {}
+        # Per-camera inference options (see CameraConfig); kept when a camera's channel closes
+        self.configs: Dict[Any, Dict] = {}
+        # Gate and inference counters of closed channels, per camera, so totals survive viewers leaving
+        self.closed_totals: Dict[Any, Dict[str, float]] = {}
+
+    def channel(self, camera_id) -> CameraChannel:
+        channel = self.channels.get(camera_id)
+        if channel is None:
+            channel = self.channels[camera_id] = CameraChannel(camera_id)
+        return channel
+
+    def publish_frame(self, camera_id, message: Dict, uploader: Optional[WebSocket] = None):
+        """Offer a frame for a camera. The uploading socket is subscribed to the results."""
+        channel = self.channel(camera_id)
+        if uploader is not None:
+            channel.subscribers.add(uploader)
+        channel.push_frame(message)
+
+    def configure(self, camera_id, options: Dict):
+        if options:
+            self.configs[camera_id] = options
+        else:
+            self.configs.pop(camera_id, None)
+
+    def subscribe(self, camera_id, websocket: WebSocket):
+        self.channel(camera_id).subscribers.add(websocket)
+
+    def unsubscribe(self, camera_id, websocket: WebSocket):
+        channel = self.channels.get(camera_id)
+        if channel is not None:
+            channel.subscribers.discard(websocket)
+            self.release(camera_id)
+
+    def unsubscribe_all(self, websocket: WebSocket):
+        for camera_id in list(self.channels):
+            self.unsubscribe(camera_id, websocket)
+
+    def release(self, camera_id):
+        """Close a channel once nobody watches it and no server-side source feeds it"""
+        channel = self.channels.get(camera_id)
+        if channel is not None and not channel.subscribers and camera_id not in ingestion.sources:
+            channel.close()
+            totals = self.closed_totals.setdefault(camera_id, dict.fromkeys(GATE_TOTALS, 0))
+            for key, value in channel.gate_counts().items():
+                totals[key] += value
+            del self.channels[camera_id]
+
+    def gate_totals(self, camera_id=None) -> Dict[str, float]:
+        """Cumulative gate and inference counters of one camera (default: all cameras), closed channels included"""
+        counts = list(self.closed_totals.items())
+        counts += [(channel_id, channel.gate_counts()) for channel_id, channel in self.channels.items()]
+        totals = dict.fromkeys(GATE_TOTALS, 0)
+        for counted_id, values in counts:
+            if camera_id is None or counted_id == camera_id:
+                for key in GATE_TOTALS:
+                    totals[key] += values[key]
+        return totals
+
+    def subscriber_count(self, camera_id) -> int:
+        channel = self.channels.get(camera_id)
+        return len(channel.subscribers) if channel is not None else 0
+
+
+broker = DetectionBroker()
+
+
+def resolve_source_url(url: str) -> str:
+    """Stream URLs pass through; relative file paths are looked up under public/videos"""
+    if "://" in url:
+        return url
+    path = Path(url)
+    if not path.is_absolute():
+        path = VIDEOS_DIR / path
+    if not path.exists():
+        raise FileNotFoundError(f"Video file not found: {path}")
+    return str(path)
+
+
+class VideoSource:
+    """
+    A server-side camera feed. A dedicated reader thread decodes the file or RTSP/HTTP
+    stream with cv2.VideoCapture and publishes every `stride`-th frame to the camera's
+    broker channel. Skipped frames are only grabbed, never decoded to BGR.
 
-    detections = []
+    The hand-off to the event loop holds one frame: while a publish is still queued,
+    a newer frame replaces the waiting one instead of queueing another callback, so
+    decoding faster than the loop runs can't pile up frames in memory.
+    """
+
+    RECONNECT_DELAY = 2.0
+
+    def __init__(self, camera_id: int, url: str, stride: int = 5, confidence: float = 0.5,
+                 loop: bool = True, realtime: bool = True):
+        self.camera_id = camera_id
+        self.url = url
+        self.is_file = "://" not in url or url.startswith("file://")
+        self.stride = max(1, stride)
+        self.confidence = confidence
+        self.loop = loop
+        self.realtime = realtime
+        self.status = "starting"
+        self.frames_read = 0
+        self.frames_replaced = 0  # decoded frames replaced in the hand-off before the loop took them
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._handoff: Optional[Dict] = None
+        self._handoff_lock = threading.Lock()
+
+    def start(self):
+        event_loop = asyncio.get_running_loop()
+        self._thread = threading.Thread(target=self._read_frames, args=(event_loop,),
+                                        name=f"source-{self.camera_id}", daemon=True)
+        self._thread.start()
+        logger.info(f"Source {self.camera_id} started: {self.url} (stride={self.stride})")
+
+    async def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self._thread.join)
+        with self._handoff_lock:
+            message, self._handoff = self._handoff, None
+        if message is not None:
+            scheduler.release_payload(message["data"])
+        self.status = "stopped"
+        logger.info(f"Source {self.camera_id} stopped")
+
+    def _open(self) -> Optional[cv2.VideoCapture]:
+        cap = cv2.VideoCapture(self.url)
+        if cap.isOpened():
+            self.status = "running"
+            return cap
+        cap.release()
+        self.status = "reconnecting"
+        logger.warning(f"Source {self.camera_id}: could not open {self.url}")
+        return None
 
-    # Process results
-    for result in results:
-        boxes = result.boxes
-        for box in boxes:
-            # Get box coordinates
-            x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-            confidence = float(box.conf[0])
+    def _read_frames(self, event_loop: asyncio.AbstractEventLoop):
+        cap = None
+        frame_index = 0
+        frame_period = 0.0
+        next_frame_at = time.perf_counter()
 
-            # Filter by confidence threshold
-            if confidence >= confidence_threshold:
-                # Convert to [x, y, width, height] format
-                width = x2 - x1
-                height = y2 - y1
+        while not self._stop.is_set():
+            if cap is None:
+                cap = self._open()
+                if cap is None:
+                    self._stop.wait(self.RECONNECT_DELAY)
+                    continue
+                fps = cap.get(cv2.CAP_PROP_FPS)
+                # Files decode much faster than real time; pace them like a live camera
+                frame_period = 1.0 / fps if self.is_file and self.realtime and fps > 0 else 0.0
+                next_frame_at = time.perf_counter()
 
-                detections.append({
-                    "bbox": [float(x1), float(y1), float(width), float(height)],
-                    "score": confidence
+            if frame_index % self.stride == 0:
+                ok, frame = cap.read()
+            else:
+                ok, frame = cap.grab(), None
+
+            if not ok:
+                if self.is_file and self.loop:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    frame_index = 0
+                    continue
+                cap.release()
+                cap = None
+                if self.is_file:
+                    self.status = "ended"
+                    break
+                self.status = "reconnecting"
+                self._stop.wait(self.RECONNECT_DELAY)
+                continue
+
+            self.frames_read += 1
+            if frame is not None:
+                timestamp = time.time() * 1000
+                self._hand_off(event_loop, {
+                    "data": scheduler.frame_payload(frame, self.camera_id, timestamp),
+                    "confidence": self.confidence,
+                    "frame_index": frame_index,
+                    "timestamp": timestamp,
                 })
+            frame_index += 1
+
+            if frame_period:
+                next_frame_at = max(next_frame_at + frame_period, time.perf_counter() - frame_period)
+                self._stop.wait(max(0.0, next_frame_at - time.perf_counter()))
+
+        if cap is not None:
+            cap.release()
+
+    def _hand_off(self, event_loop: asyncio.AbstractEventLoop, message: Dict):
+        """Reader thread: schedule a publish only if none is queued, else replace the waiting frame"""
+        with self._handoff_lock:
+            replaced, self._handoff = self._handoff, message
+        if replaced is None:
+            event_loop.call_soon_threadsafe(self._publish_handoff)
+        else:
+            self.frames_replaced += 1
+            scheduler.release_payload(replaced["data"])
+
+    def _publish_handoff(self):
+        with self._handoff_lock:
+            message, self._handoff = self._handoff, None
+        if message is not None:
+            broker.publish_frame(self.camera_id, message)
+
+    def describe(self) -> Dict:
+        channel = broker.channels.get(self.camera_id)
+        return {
+            "camera_id": self.camera_id,
+            "url": self.url,
+            "status": self.status,
+            "stride": self.stride,
+            "confidence": self.confidence,
+            "frames_read": self.frames_read,
+            "frames_replaced": self.frames_replaced,
+            "frames_processed": channel.frames_inferred if channel is not None else 0,
+            "dropped_frames": channel.mailbox.dropped if channel is not None else 0,
+            "subscribers": broker.subscriber_count(self.camera_id),
+        }
+
+
+class IngestionManager:
+    """Registry of server-side sources"""
+
+    def __init__(self):
+        self.sources: Dict[int, VideoSource] = {}
+        # Sources given on the command line, started once the event loop is running
+        self.pending_sources: List[Dict] = []
+
+    async def add_source(self, camera_id: int, url: str, **options) -> VideoSource:
+        if camera_id in self.sources:
+            await self.remove_source(camera_id)
+        source = VideoSource(camera_id, resolve_source_url(url), **options)
+        self.sources[camera_id] = source
+        source.start()
+        return source
+
+    async def remove_source(self, camera_id: int) -> bool:
+        source = self.sources.pop(camera_id, None)
+        if source is None:
+            return False
+        await source.stop()
+        broker.release(camera_id)
+        return True
+
+    async def stop_all(self):
+        for camera_id in list(self.sources):
+            await self.remove_source(camera_id)
+
 
-    return detections
+ingestion = IngestionManager()
+
+
+class SourceConfig(BaseModel):
+    camera_id: int
+    url: str
+    stride: int = 5
+    confidence: float = 0.5
+    loop: bool = True
+    realtime: bool = True
+
+
+class CameraConfig(BaseModel):
+    """
+    Per-camera inference options: model input size, decode downscale factor and a
+    region-of-interest polygon as [x, y] fractions of the frame size
+    """
+    imgsz: Optional[int] = None
+    reduce: int = 1
+    roi: Optional[List[List[float]]] = None
+
+
+def camera_options(config: CameraConfig) -> Dict:
+    """Validate a camera configuration and turn it into the options passed to the workers"""
+    if config.imgsz is not None and (config.imgsz < 32 or config.imgsz % 32):
+        raise ValueError(f"imgsz must be a positive multiple of 32, got {config.imgsz}")
+    if config.reduce not in REDUCED_DECODE_FLAGS:
+        raise ValueError(f"reduce must be one of {sorted(REDUCED_DECODE_FLAGS)}, got {config.reduce}")
+    if config.roi is not None:
+        if len(config.roi) < 3 or any(len(point) != 2 for point in config.roi):
+            raise ValueError("roi must be a polygon of at least 3 [x, y] points")
+        if any(not 0 <= value <= 1 for point in config.roi for value in point):
+            raise ValueError("roi points are fractions of the frame size and must lie in [0, 1]")
+
+    options = {"imgsz": config.imgsz, "reduce": config.reduce, "roi": config.roi}
+    return {key: value for key, value in options.items() if value is not None and not (key == "reduce" and value == 1)}
+
+
+def configure_camera(camera_id, message: Dict) -> Dict:
+    """Apply a camera configuration given as a dict (from a WebSocket message or REST body)"""
+    options = camera_options(CameraConfig(**{key: message[key] for key in ("imgsz", "reduce", "roi") if key in message}))
+    broker.configure(camera_id, options)
+    logger.info(f"Camera {camera_id} config: {options or 'defaults'}")
+    return options
 
 
 def frame_to_base64(frame: np.ndarray) -> str:
@@ -94,17 +1386,293 @@ async def root():
     return {
         "service": "ViewGuard Detection Server",
         "status": "running",
-        "model": "YOLOv8n",
+        "model": model_state.model,
         "endpoints": {
             "websocket": "/ws",
-            "health": "/health"
+            "health": "/health",
+            "liveness": "/health/live",
+            "readiness": "/health/ready",
+            "stats": "/stats",
+            "metrics": "/metrics",
+            "sources": "/sources",
+            "camera_config": "/cameras/{camera_id}/config",
+            "boxes": "/boxes/{video}",
+            "box_frame": "/boxes/{video}/frames/{frame_index}",
+            "box_window": "/boxes/{video}/window?start=&end="
         }
     }
 
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy", "model_loaded": True}
+    """Combined status for existing clients; probes should use /health/live and /health/ready"""
+    return {"status": "healthy" if model_state.ready else model_state.status, "model_loaded": model_state.ready}
+
+
+@app.get("/health/live")
+async def liveness():
+    """The server process is up and answering requests (the model may still be loading)"""
+    return {"status": "alive", "uptime_s": round(time.perf_counter() - SERVER_STARTED, 1)}
+
+
+@app.get("/health/ready")
+async def readiness():
+    """200 once every inference worker has loaded and warmed up the model, 503 while loading or after a failure"""
+    return JSONResponse(model_state.describe(), status_code=200 if model_state.ready else 503)
+
+
+@app.get("/stats")
+async def stats():
+    """Batch occupancy and latency percentiles for tuning the batch size"""
+    return {
+        "active_connections": len(manager.active_connections),
+        "evicted_connections": manager.evicted,
+        "queue_depth": scheduler.queue.qsize() if scheduler.queue is not None else 0,
+        "batching": scheduler.stats.summary(),
+        "motion_gate": motion_gate_summary(),
+        "frame_ring": scheduler.frame_ring.summary() if scheduler.frame_ring is not None else None,
+        "box_cache": box_files.summary(),
+        "cameras": [channel.describe() for channel in broker.channels.values()],
+    }
+
+
+def motion_gate_summary() -> Dict:
+    """Frames the motion gate answered from cached detections, over all cameras"""
+    totals = broker.gate_totals()
+    gated, inferred = totals["frames_gated"], totals["frames_inferred"]
+    return {
+        "enabled": scheduler.motion_gate,
+        "threshold": MOTION_THRESHOLD,
+        "refresh_s": MOTION_REFRESH_S,
+        "frames_gated": gated,
+        "frames_inferred": inferred,
+        "skip_ratio": round(gated / max(1, gated + inferred), 3),
+        "inference_ms_saved": round(totals["inference_ms_saved"], 1),
+    }
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus metrics: per-stage latency histograms, per-camera FPS and frame counters, queue and connections"""
+    QUEUE_DEPTH.set(scheduler.queue.qsize() if scheduler.queue is not None else 0)
+    ACTIVE_CONNECTIONS.set(len(manager.active_connections))
+    EVICTED_CONNECTIONS.set(manager.evicted)
+    RESIDENT_MEMORY.set(round(resident_memory_mb() * 1024 * 1024))
+
+    # Gauges follow the open channels; the frame counters are incremented where frames
+    # arrive, and are never reset, so rate() stays correct when a camera's channel closes
+    for metric in (CAMERA_FPS, CAMERA_SUBSCRIBERS):
+        metric.clear()  # cameras come and go
+    for camera_id, channel in broker.channels.items():
+        CAMERA_FPS.set(round(channel.fps(), 3), camera_id=camera_id)
+        CAMERA_SUBSCRIBERS.set(len(channel.subscribers), camera_id=camera_id)
+
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/debug/profile/start")
+async def start_profile(interval_ms: float = 5.0, duration_s: float = 30.0):
+    """Start sampling the server's Python stacks every interval_ms, for at most duration_s"""
+    if not 0.5 <= interval_ms <= 1000 or not 0 < duration_s <= 600:
+        raise HTTPException(status_code=422, detail="interval_ms must be in [0.5, 1000] and duration_s in (0, 600]")
+    # start() joins a sampler that is still running; don't block the event loop on it
+    await asyncio.get_running_loop().run_in_executor(None, profiler.start, interval_ms, duration_s)
+    return profiler.summary()
+
+
+@app.post("/debug/profile/stop")
+async def stop_profile():
+    await asyncio.get_running_loop().run_in_executor(None, profiler.stop)
+    return profiler.summary()
+
+
+@app.get("/debug/profile")
+async def get_profile(format: str = "summary"):
+    """Profiler status and hottest functions, or all samples as folded stacks with ?format=folded"""
+    if format == "folded":
+        return PlainTextResponse(profiler.folded())
+    return profiler.summary()
+
+
+@app.get("/sources")
+async def list_sources():
+    return {"sources": [source.describe() for source in ingestion.sources.values()]}
+
+
+@app.post("/sources")
+async def add_source(config: SourceConfig):
+    """Register a file or RTSP/HTTP stream that the server decodes and runs detection on itself"""
+    try:
+        source = await ingestion.add_source(config.camera_id, config.url, stride=config.stride,
+                                            confidence=config.confidence, loop=config.loop,
+                                            realtime=config.realtime)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return source.describe()
+
+
+@app.delete("/sources/{camera_id}")
+async def remove_source(camera_id: int):
+    if not await ingestion.remove_source(camera_id):
+        raise HTTPException(status_code=404, detail=f"No source registered for camera {camera_id}")
+    return {"camera_id": camera_id, "status": "stopped"}
+
+
+@app.get("/cameras/{camera_id}/config")
+async def get_camera_config(camera_id: int):
+    return {"camera_id": camera_id, **broker.configs.get(camera_id, {})}
+
+
+@app.put("/cameras/{camera_id}/config")
+async def set_camera_config(camera_id: int, config: CameraConfig):
+    """Set a camera's inference size, decode downscale and ROI; an empty body restores the defaults"""
+    try:
+        options = camera_options(config)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    broker.configure(camera_id, options)
+    return {"camera_id": camera_id, **options}
+
+
+class BoxFileCache:
+    """Parsed bounding box files by video, least recently used dropped first; a changed file is reloaded"""
+
+    def __init__(self, directory: Path = BOXES_DIR, max_entries: int = BOX_CACHE_SIZE):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Tuple[Tuple[int, int], BoxTrack, str]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def path_for(self, video: str) -> Path:
+        """`<video>_boxes.bbx` (memory-mapped) unless `<video>_boxes.json` is newer, else the JSON"""
+        name = re.sub(r"\.(mp4|avi|mov|mkv|webm)$", "", video, flags=re.IGNORECASE)
+        if not re.fullmatch(r"[\w-][\w.-]*", name):
+            raise HTTPException(status_code=404, detail=f"No bounding boxes for {video}")
+        return current_box_file(self.directory / f"{name}_boxes.json")
+
+    def _stat(self, video: str) -> Tuple[Path, Tuple[int, int]]:
+        path = self.path_for(video)
+        try:
+            stat = path.stat()
+        except OSError:
+            raise HTTPException(status_code=404, detail=f"No bounding boxes for {video}")
+        return path, (stat.st_mtime_ns, stat.st_size)
+
+    def lookup(self, video: str) -> Optional[Tuple[BoxTrack, str]]:
+        """The video's track and an ETag for the file version if it is cached and unchanged, else None"""
+        path, version = self._stat(video)
+        with self.lock:
+            entry = self.entries.get(str(path))
+            if entry is None or entry[0] != version:
+                return None
+            self.entries.move_to_end(str(path))
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def load(self, video: str) -> Tuple[BoxTrack, str]:
+        """Parse the video's box file into the cache (slow for large JSON files: call it off the event loop)"""
+        path, version = self._stat(video)
+        track = load_boxes(path)
+        tag = "%x-%x" % version
+        with self.lock:
+            self.misses += 1
+            self.entries[str(path)] = (version, track, tag)
+            self.entries.move_to_end(str(path))
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return track, tag
+
+    def summary(self) -> Dict:
+        return {"entries": len(self.entries), "max_entries": self.max_entries, "hits": self.hits,
+                "misses": self.misses}
+
+
+box_files = BoxFileCache()
+
+
+async def get_box_track(video: str) -> Tuple[BoxTrack, str]:
+    return box_files.lookup(video) or await asyncio.to_thread(box_files.load, video)
+
+
+def cacheable_response(request: Request, etag: str, build) -> Response:
+    """JSON from build() with ETag/Cache-Control, 304 when the client already has it, gzip or Brotli compressed"""
+    etag = f'W/"{etag}"'
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={BOXES_MAX_AGE}", "Vary": "Accept-Encoding"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+
+    body = json.dumps(build(), separators=(",", ":")).encode()
+    accepted = request.headers.get("accept-encoding", "")
+    if len(body) >= COMPRESS_MIN_BYTES:
+        if brotli is not None and "br" in accepted:
+            body = brotli.compress(body, quality=5)
+            headers["Content-Encoding"] = "br"
+        elif "gzip" in accepted:
+            body = gzip.compress(body, compresslevel=6)
+            headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def frame_range(track: BoxTrack, start: Optional[float], end: Optional[float], start_frame: Optional[int],
+                end_frame: Optional[int]) -> Tuple[int, int]:
+    """First and last frame of a window given in frames or, for the parts not given in frames, seconds"""
+    fps = float(track.video_info.get("fps") or 30.0)
+    if start_frame is None:
+        start_frame = int(start * fps) if start is not None else 0
+    if end_frame is None:
+        end_frame = int(end * fps) if end is not None else track.frame_count - 1
+    if start_frame < 0 or end_frame < start_frame:
+        raise HTTPException(status_code=422, detail="The window must have 0 <= start <= end")
+    return start_frame, min(end_frame, max(0, track.frame_count - 1))
+
+
+@app.get("/boxes/{video}")
+async def box_info(video: str, request: Request):
+    """Video info and box file size, to pick windows without downloading the boxes"""
+    track, tag = await get_box_track(video)
+    return cacheable_response(request, tag, lambda: {
+        "video_info": track.video_info,
+        "frame_count": track.frame_count,
+        "duration_s": round(track.frame_count / float(track.video_info.get("fps") or 30.0), 3),
+        "keyframe_count": len(track.keyframes),
+        "box_count": len(track.boxes),
+        "tracked": track.track_ids is not None,
+    })
+
+
+@app.get("/boxes/{video}/frames/{frame_index}")
+async def box_frame(video: str, frame_index: int, request: Request):
+    """Boxes shown at one frame, interpolated between keyframes when the file has track IDs"""
+    track, tag = await get_box_track(video)
+
+    def build():
+        boxes, confidences = track.frame(frame_index)
+        track_ids = track.frame_track_ids(frame_index)
+        return {
+            "frame": frame_index,
+            "boxes": np.asarray(boxes).astype(np.int64).tolist(),
+            "confidences": np.round(np.asarray(confidences, dtype=np.float64), 3).tolist(),
+            **({} if track_ids is None else {"track_ids": track_ids.tolist()}),
+        }
+
+    return cacheable_response(request, f"{tag}-f{frame_index}", build)
+
+
+@app.get("/boxes/{video}/window")
+async def box_window(video: str, request: Request, start: Optional[float] = None, end: Optional[float] = None,
+                     start_frame: Optional[int] = None, end_frame: Optional[int] = None):
+    """
+    The keyframes covering a time window (start/end in seconds, or start_frame/end_frame) as a v2 box document
+    (see bbox_format.py), including the keyframe before the window and the one after it, so every frame in
+    the window can be looked up and interpolated exactly as with the whole file.
+    """
+    track, tag = await get_box_track(video)
+    first, last = frame_range(track, start, end, start_frame, end_frame)
+    return cacheable_response(request, f"{tag}-{first}-{last}",
+                              lambda: {**track.window(first, last).to_v2(), "window": [first, last]})
 
 
 @app.websocket("/ws")
@@ -120,6 +1688,12 @@ async def websocket_endpoint(websocket: WebSocket):
         "confidence": 0.5
     }
 
+    To receive detections from a server-side source (see /sources) instead of uploading
+    frames, send {"type": "subscribe", "camera_id": 1} (and "unsubscribe" to stop).
+
+    Clients may instead send binary messages (FRAME_HEADER + raw JPEG/WebP bytes),
+    which skips the JSON and base64 round trip. Text and binary frames can be mixed.
+
     Response format:
     {
         "camera_id": 1,
@@ -129,42 +1703,78 @@ async def websocket_endpoint(websocket: WebSocket):
                 "score": 0.85
             }
         ],
-        "timestamp": "2025-11-08T12:00:00"
+        "timestamp": "2025-11-08T12:00:00",
+        "dropped_frames": 0,
+        "frame_age_ms": 120.5,
+        "source": "inference"
     }
+
+    Responses are JSON unless the connection negotiates packed binary results, either
+    with `/ws?response_format=binary` or by sending {"type": "hello", "response_format": "binary"}.
+
+    Per-camera inference options can be set with
+    {"type": "config", "camera_id": 1, "imgsz": 320, "reduce": 2, "roi": [[x, y], ...]},
+    or as a "cameras" list of such objects in the hello message (see CameraConfig and
+    PUT /cameras/{camera_id}/config). Boxes are always in original frame pixels.
+
+    Each camera_id has one mailbox shared by every socket sending frames for it: frames
+    that arrive while the previous one is still being processed replace the pending frame
+    instead of queueing behind it, and each result goes to every socket sending or
+    subscribed to that camera. Responses carry "dropped_frames" (cumulative for the
+    camera) and "frame_age_ms" (time from receiving the frame to sending its result).
+
+    "source" is "inference" when the model ran on the frame, or "gate" when the
+    motion gate found the scene unchanged and resent the last inferred detections
+    (JSON responses only; the binary result format is unchanged).
     """
-    await manager.connect(websocket)
+    await manager.connect(websocket, binary_responses=websocket.query_params.get("response_format") == "binary")
 
     try:
         while True:
-            # Receive frame from client
-            data = await websocket.receive_text()
-            message = json.loads(data)
+            # Receive frame from client (text = JSON, bytes = binary frame)
+            received = await websocket.receive()
+            if received["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(received.get("code", 1000))
 
+            started = time.perf_counter()
+            if received.get("bytes") is not None:
+                try:
+                    message = parse_binary_frame(received["bytes"])
+                except ValueError as e:
+                    logger.warning(f"Rejected binary frame: {e}")
+                    continue
+            else:
+                message = json.loads(received["text"])
             if message.get("type") == "frame":
-                # Decode base64 image
-                img_data = base64.b64decode(message["data"])
-                np_arr = np.frombuffer(img_data, np.uint8)
-                frame = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-
-                if frame is not None:
-                    # Get confidence threshold from message or use default
-                    confidence = message.get("confidence", 0.5)
-
-                    # Detect persons
-                    detections = detect_persons(frame, confidence)
-
-                    # Send results back
-                    response = {
-                        "camera_id": message.get("camera_id", 0),
-                        "detections": detections,
-                        "frame_width": frame.shape[1],
-                        "frame_height": frame.shape[0],
-                        "timestamp": message.get("timestamp", "")
-                    }
-
-                    await manager.send_detections(websocket, response)
-                else:
-                    logger.warning("Failed to decode frame")
+                STAGE_SECONDS.observe(time.perf_counter() - started, stage="receive")
+
+            if message.get("type") == "hello":
+                manager.set_binary_responses(websocket, message.get("response_format") == "binary")
+                for camera in message.get("cameras", []):
+                    try:
+                        configure_camera(camera["camera_id"], camera)
+                    except (KeyError, ValueError) as e:
+                        logger.warning(f"Rejected camera config: {e}")
+                continue
+
+            if message.get("type") == "config":
+                try:
+                    configure_camera(message["camera_id"], message)
+                except (KeyError, ValueError) as e:
+                    logger.warning(f"Rejected camera config: {e}")
+                continue
+
+            if message.get("type") == "subscribe":
+                broker.subscribe(message["camera_id"], websocket)
+                continue
+
+            if message.get("type") == "unsubscribe":
+                broker.unsubscribe(message["camera_id"], websocket)
+                continue
+
+            if message.get("type") == "frame":
+                # Frames for the same camera from every viewer share one mailbox and one inference
+                broker.publish_frame(message.get("camera_id", 0), message, uploader=websocket)
 
     except WebSocketDisconnect:
         manager.disconnect(websocket)
@@ -173,8 +1783,127 @@ async def websocket_endpoint(websocket: WebSocket):
         manager.disconnect(websocket)
 
 
+# What apply_tuning_profile() found, once it has run
+tuning_profile: Optional[Dict] = None
+
+
+def apply_tuning_profile(path: str = autotune.DEFAULT_PROFILE_PATH) -> Dict:
+    """
+    Use the settings autotune.py measured on this machine for the VIEWGUARD_* variables
+    that aren't set: the scheduler's executor, workers, threads per worker and batch size,
+    and the model input size. __main__ calls it before parsing the command line, so flags
+    win; otherwise the lifespan handler calls it before the worker pool is built.
+    """
+    global tuning_profile
+    profile = tuning_profile = autotune.resolve_profile(path)
+    settings = profile["applied"]
+    if "VIEWGUARD_EXECUTOR" in settings:
+        scheduler.executor_backend = settings["VIEWGUARD_EXECUTOR"]
+    if "VIEWGUARD_WORKERS" in settings:
+        scheduler.workers = max(1, int(settings["VIEWGUARD_WORKERS"]))
+    if "VIEWGUARD_WORKER_THREADS" in settings:
+        scheduler.threads = int(settings["VIEWGUARD_WORKER_THREADS"])
+    if "VIEWGUARD_MAX_BATCH_SIZE" in settings:
+        scheduler.max_batch_size = max(1, int(settings["VIEWGUARD_MAX_BATCH_SIZE"]))
+        scheduler.stats = BatchStats(scheduler.max_batch_size)
+    if "VIEWGUARD_IMGSZ" in settings:
+        scheduler.imgsz = int(settings["VIEWGUARD_IMGSZ"])
+
+    if profile["applied"]:
+        logger.info(f"✅ Tuning profile {profile['path']}: "
+                    + ", ".join(f"{name}={value}" for name, value in profile["applied"].items())
+                    + (f" (set in the environment: {', '.join(profile['overridden'])})" if profile["overridden"] else ""))
+    elif profile["ignored"] and profile["ignored"] != "not found":
+        logger.warning(f"⚠️  Tuning profile {profile['path']} ignored: {profile['ignored']} (rerun autotune.py)")
+    return profile
+
+
+def serve_forked(host: str, port: int, processes: int):
+    """
+    Serve from `processes` forked copies of the server sharing one listening socket. The
+    model is loaded once before forking and the heap frozen (gc.freeze), so its weights sit
+    in copy-on-write pages shared by every process instead of one private copy each.
+    Cameras are per process: all viewers of a camera should reach the same process.
+    """
+    import uvicorn
+
+    global _preloaded_detector
+    if not hasattr(os, "fork"):
+        raise SystemExit("--processes needs os.fork (Linux or macOS)")
+    if scheduler.executor_backend == "thread":
+        # Only load: running inference first would start library thread pools, which don't survive a fork
+        started = time.perf_counter()
+        _preloaded_detector = load_detector(imgsz=scheduler.imgsz,
+                                            num_threads=threads_per_worker(scheduler.workers, scheduler.threads,
+                                                                           scheduler.executor_backend))
+        logger.info(f"Preloaded model for {processes} processes in {time.perf_counter() - started:.2f}s, "
+                    f"RSS {resident_memory_mb():.0f} MB")
+    else:
+        logger.warning("Process workers load their own models; forking only shares the server code")
+
+    config = uvicorn.Config(app, host=host, port=port)
+    sock = config.bind_socket()
+    # Move everything allocated so far out of the collector's reach: a collection would touch
+    # (and so copy) every page holding a tracked object in each child
+    gc.collect()
+    gc.freeze()
+
+    children = []
+    for _ in range(processes):
+        pid = os.fork()
+        if pid == 0:
+            uvicorn.Server(config).run(sockets=[sock])
+            os._exit(0)
+        children.append(pid)
+
+    def forward(signum, _frame):
+        for child in children:
+            try:
+                os.kill(child, signum)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, forward)
+    signal.signal(signal.SIGTERM, forward)
+    for child in children:
+        os.waitpid(child, 0)
+
+
 if __name__ == "__main__":
     import uvicorn
+
+    # Settings measured by autotune.py fill in what the environment doesn't set; flags still win
+    apply_tuning_profile()
+
+    parser = argparse.ArgumentParser(description="ViewGuard Detection Server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--executor", choices=["thread", "process"], default=scheduler.executor_backend,
+                        help="Worker pool for decode + inference (env: VIEWGUARD_EXECUTOR)")
+    parser.add_argument("--workers", type=int, default=scheduler.workers,
+                        help="Number of inference workers, each with its own model (env: VIEWGUARD_WORKERS)")
+    parser.add_argument("--source", action="append", default=[], metavar="CAMERA_ID=URL",
+                        help="Ingest a video file (relative to public/videos) or RTSP/HTTP stream server-side. "
+                             "Can be repeated.")
+    parser.add_argument("--stride", type=int, default=5, help="Run detection on every Nth frame of each source")
+    parser.add_argument("--processes", type=int, default=SERVER_PROCESSES,
+                        help="Forked server processes sharing one model load (env: VIEWGUARD_PROCESSES)")
+    parser.add_argument("--no-motion-gate", action="store_true",
+                        help="Run inference on every frame, even when the scene hasn't changed (env: VIEWGUARD_MOTION_GATE=0)")
+    args = parser.parse_args()
+
+    for spec in args.source:
+        camera_id, sep, url = spec.partition("=")
+        if not sep or not camera_id.isdigit():
+            parser.error(f"--source must look like CAMERA_ID=URL, got {spec!r}")
+        ingestion.pending_sources.append({"camera_id": int(camera_id), "url": url, "stride": args.stride})
+
+    scheduler.executor_backend = args.executor
+    scheduler.workers = max(1, args.workers)
+    scheduler.motion_gate = MOTION_GATE and not args.no_motion_gate
+
     logger.info("Starting ViewGuard Detection Server...")
-    logger.info("Loading YOLOv8 model...")
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+    if args.processes > 1:
+        serve_forked(args.host, args.port, args.processes)
+    else:
+        uvicorn.run(app, host=args.host, port=args.port)
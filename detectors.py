@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+ViewGuard Detector Backends
+Person detectors behind a single interface, so the detection server and the offline
+scripts can switch between Ultralytics (PyTorch), ONNX Runtime and a deterministic
+stub without code changes.
+
+Every backend's predict() takes a list of BGR frames and returns one
+(xyxy, confidences) pair of float32 arrays per frame, in original frame pixels.
+An `imgsz` passed to predict() overrides the model input size for that call.
+
+Usage:
+    # Export YOLOv8 weights to ONNX for CPU serving (needs ultralytics, once)
+    python detectors.py export yolov8n.pt --imgsz 640
+
+    # Then serve without torch
+    VIEWGUARD_BACKEND=onnx VIEWGUARD_MODEL=yolov8n.onnx python detection_server.py
+"""
+
+import argparse
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+PERSON_CLASS_ID = 0  # 'person' in the COCO dataset
+
+# Defaults, overridable through the environment
+DEFAULT_BACKEND = os.getenv("VIEWGUARD_BACKEND", "")
+DEFAULT_WEIGHTS = os.getenv("VIEWGUARD_MODEL", "yolov8n.pt")
+DEFAULT_IMGSZ = int(os.getenv("VIEWGUARD_IMGSZ", "640"))
+DEFAULT_THREADS = int(os.getenv("VIEWGUARD_THREADS", "0"))  # 0 = library default
+
+Prediction = Tuple[np.ndarray, np.ndarray]
+
+
+class Detector:
+    """Base class for person detectors"""
+
+    backend = "base"
+    # True when num_threads is process-wide (torch), so thread workers in one process share one count
+    shared_threads = False
+
+    def __init__(self, weights: str = "", imgsz: int = DEFAULT_IMGSZ, num_threads: int = DEFAULT_THREADS):
+        self.weights = weights
+        self.imgsz = imgsz
+        self.num_threads = num_threads
+
+    def predict(self, frames: Sequence[np.ndarray], conf: float = 0.25, iou: float = 0.7,
+                imgsz: Optional[int] = None) -> List[Prediction]:
+        """Detect persons in each frame: returns (xyxy [N, 4], confidences [N]) per frame"""
+        raise NotImplementedError
+
+    def set_num_threads(self, num_threads: int):
+        self.num_threads = num_threads
+
+    def describe(self) -> Dict:
+        return {
+            "backend": self.backend,
+            "weights": Path(self.weights).name if self.weights else None,
+            "imgsz": self.imgsz,
+            "threads": self.num_threads or None,
+        }
+
+
+class UltralyticsDetector(Detector):
+    """YOLOv8 through the ultralytics package (PyTorch)"""
+
+    backend = "ultralytics"
+    shared_threads = True
+
+    def __init__(self, weights: str = "yolov8n.pt", imgsz: int = DEFAULT_IMGSZ, num_threads: int = DEFAULT_THREADS):
+        super().__init__(weights, imgsz, num_threads)
+        from ultralytics import YOLO
+
+        self.set_num_threads(num_threads)
+        self.model = YOLO(weights)  # Will auto-download on first run
+
+    def set_num_threads(self, num_threads: int):
+        super().set_num_threads(num_threads)
+        if num_threads > 0:
+            import torch
+
+            torch.set_num_threads(num_threads)
+
+    def predict(self, frames: Sequence[np.ndarray], conf: float = 0.25, iou: float = 0.7,
+                imgsz: Optional[int] = None) -> List[Prediction]:
+        results = self.model(list(frames), verbose=False, classes=[PERSON_CLASS_ID], conf=conf, iou=iou,
+                             imgsz=imgsz or self.imgsz)
+        predictions = []
+        for result in results:
+            # One device-to-host transfer for all boxes: (N, 6) = x1, y1, x2, y2, conf, class
+            data = result.boxes.data.cpu().numpy()
+            predictions.append((data[:, :4].astype(np.float32), data[:, 4].astype(np.float32)))
+        return predictions
+
+
+class OnnxDetector(Detector):
+    """
+    YOLOv8 exported to ONNX (see export_onnx), run with ONNX Runtime. Needs neither
+    torch nor ultralytics. Pre-processing (letterbox) and NMS match what ultralytics
+    does, using OpenCV.
+    """
+
+    backend = "onnx"
+    STRIDE = 32
+
+    def __init__(self, weights: str = "yolov8n.onnx", imgsz: int = DEFAULT_IMGSZ, num_threads: int = DEFAULT_THREADS,
+                 providers: Optional[List[str]] = None):
+        super().__init__(weights, imgsz, num_threads)
+        self.providers = providers or os.getenv("VIEWGUARD_ONNX_PROVIDERS", "CPUExecutionProvider").split(",")
+        self._create_session()
+
+    def _create_session(self):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.num_threads > 0:
+            options.intra_op_num_threads = self.num_threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(self.weights, sess_options=options, providers=self.providers)
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        batch, _, height, width = model_input.shape
+        # Models exported without dynamic=True have a fixed input size and batch of 1
+        self.dynamic_shape = not (isinstance(height, int) and isinstance(width, int))
+        if not self.dynamic_shape:
+            self.imgsz = height
+        self.fixed_batch = batch if isinstance(batch, int) else None
+
+    def set_num_threads(self, num_threads: int):
+        if num_threads != self.num_threads:
+            super().set_num_threads(num_threads)
+            self._create_session()
+
+    def _letterbox(self, frame: np.ndarray, rect: bool, imgsz: int) -> Tuple[np.ndarray, float, Tuple[float, float]]:
+        """
+        Resize keeping aspect ratio and pad with gray, like ultralytics. With rect=True
+        the padding only goes up to the next multiple of the model stride instead of a
+        full imgsz x imgsz square, which saves compute on non-square frames.
+        """
+        height, width = frame.shape[:2]
+        ratio = min(imgsz / height, imgsz / width)
+        new_width, new_height = round(width * ratio), round(height * ratio)
+        pad_x, pad_y = imgsz - new_width, imgsz - new_height
+        if rect:
+            pad_x, pad_y = pad_x % self.STRIDE, pad_y % self.STRIDE
+        pad_x, pad_y = pad_x / 2, pad_y / 2
+
+        if (width, height) != (new_width, new_height):
+            frame = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+        top, bottom = round(pad_y - 0.1), round(pad_y + 0.1)
+        left, right = round(pad_x - 0.1), round(pad_x + 0.1)
+        frame = cv2.copyMakeBorder(frame, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+        return frame, ratio, (left, top)
+
+    def predict(self, frames: Sequence[np.ndarray], conf: float = 0.25, iou: float = 0.7,
+                imgsz: Optional[int] = None) -> List[Prediction]:
+        if not frames:
+            return []
+
+        # Rectangular inputs and other input sizes need a dynamic-shape model
+        rect = self.dynamic_shape and len({frame.shape for frame in frames}) == 1
+        imgsz = imgsz if imgsz and self.dynamic_shape else self.imgsz
+        letterboxed = [self._letterbox(frame, rect, imgsz) for frame in frames]
+        # BGR uint8 HWC -> RGB float32 NCHW in [0, 1]
+        blob = cv2.dnn.blobFromImages([image for image, _, _ in letterboxed], scalefactor=1 / 255.0, swapRB=True)
+
+        if self.fixed_batch == 1 and len(frames) > 1:
+            outputs = np.concatenate([self.session.run(None, {self.input_name: blob[i:i + 1]})[0]
+                                      for i in range(len(frames))])
+        else:
+            outputs = self.session.run(None, {self.input_name: blob})[0]
+
+        predictions = []
+        for output, frame, (_, ratio, (pad_x, pad_y)) in zip(outputs, frames, letterboxed):
+            # (4 + num_classes, anchors) -> keep the person score only
+            boxes_cxcywh = output[:4].T
+            scores = output[4 + PERSON_CLASS_ID]
+            keep = scores >= conf
+            boxes_cxcywh, scores = boxes_cxcywh[keep], scores[keep]
+
+            xyxy = np.empty_like(boxes_cxcywh)
+            xyxy[:, :2] = boxes_cxcywh[:, :2] - boxes_cxcywh[:, 2:] / 2
+            xyxy[:, 2:] = boxes_cxcywh[:, :2] + boxes_cxcywh[:, 2:] / 2
+
+            if len(scores):
+                xywh = np.column_stack([xyxy[:, :2], boxes_cxcywh[:, 2:]])
+                indices = np.asarray(cv2.dnn.NMSBoxes(xywh.tolist(), scores.tolist(), conf, iou),
+                                     dtype=np.int64).reshape(-1)
+                xyxy, scores = xyxy[indices], scores[indices]
+
+            # Undo the letterbox and clip to the original frame
+            xyxy[:, [0, 2]] = ((xyxy[:, [0, 2]] - pad_x) / ratio).clip(0, frame.shape[1])
+            xyxy[:, [1, 3]] = ((xyxy[:, [1, 3]] - pad_y) / ratio).clip(0, frame.shape[0])
+            predictions.append((xyxy.astype(np.float32), scores.astype(np.float32)))
+
+        return predictions
+
+
+class StubDetector(Detector):
+    """
+    Deterministic fake detector for tests and benchmarks. Boxes are derived from
+    the frame contents, so the same frame always yields the same detections, and an
+    optional fixed latency stands in for inference cost. Needs no model files.
+    """
+
+    backend = "stub"
+
+    def __init__(self, weights: str = "", imgsz: int = DEFAULT_IMGSZ, num_threads: int = DEFAULT_THREADS,
+                 latency_ms: float = float(os.getenv("VIEWGUARD_STUB_LATENCY_MS", "0")), max_persons: int = 3):
+        super().__init__(weights, imgsz, num_threads)
+        self.latency_ms = latency_ms
+        self.max_persons = max_persons
+
+    def predict(self, frames: Sequence[np.ndarray], conf: float = 0.25, iou: float = 0.7,
+                imgsz: Optional[int] = None) -> List[Prediction]:
+        if self.latency_ms:
+            time.sleep(self.latency_ms * len(frames) / 1000)
+
+        predictions = []
+        for frame in frames:
+            height, width = frame.shape[:2]
+            seed = int(frame[::16, ::16].sum(dtype=np.uint64))
+            rng = np.random.default_rng(seed)
+
+            count = int(rng.integers(0, self.max_persons + 1))
+            x1 = rng.uniform(0, width * 0.8, count)
+            y1 = rng.uniform(0, height * 0.6, count)
+            x2 = np.minimum(x1 + rng.uniform(width * 0.05, width * 0.2, count), width)
+            y2 = np.minimum(y1 + rng.uniform(height * 0.2, height * 0.4, count), height)
+            scores = rng.uniform(0.2, 0.95, count)
+
+            keep = scores >= conf
+            xyxy = np.column_stack([x1, y1, x2, y2])[keep]
+            predictions.append((xyxy.astype(np.float32).reshape(-1, 4), scores[keep].astype(np.float32)))
+        return predictions
+
+
+BACKENDS = {
+    UltralyticsDetector.backend: UltralyticsDetector,
+    OnnxDetector.backend: OnnxDetector,
+    StubDetector.backend: StubDetector,
+}
+
+
+def load_detector(backend: Optional[str] = None, weights: Optional[str] = None, imgsz: Optional[int] = None,
+                  num_threads: Optional[int] = None) -> Detector:
+    """
+    Build a detector. Arguments left as None fall back to VIEWGUARD_BACKEND,
+    VIEWGUARD_MODEL, VIEWGUARD_IMGSZ and VIEWGUARD_THREADS. Without an explicit
+    backend, `.onnx` weights select ONNX Runtime and anything else Ultralytics.
+    """
+    backend, weights, imgsz = resolve_model(backend, weights, imgsz)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown detector backend: {backend!r} (expected one of {', '.join(BACKENDS)})")
+
+    return BACKENDS[backend](
+        weights=weights,
+        imgsz=imgsz,
+        num_threads=DEFAULT_THREADS if num_threads is None else num_threads,
+    )
+
+
+def resolve_model(backend: Optional[str] = None, weights: Optional[str] = None,
+                  imgsz: Optional[int] = None) -> Tuple[str, str, int]:
+    """The (backend, weights, imgsz) load_detector() would use, without loading anything"""
+    weights = weights or DEFAULT_WEIGHTS
+    backend = backend or DEFAULT_BACKEND or ("onnx" if weights.endswith(".onnx") else "ultralytics")
+    if backend == StubDetector.backend:
+        weights = ""
+    return backend, weights, imgsz or DEFAULT_IMGSZ
+
+
+def export_onnx(weights: str, imgsz: int = DEFAULT_IMGSZ, dynamic: bool = True) -> str:
+    """Export Ultralytics YOLOv8 weights to ONNX (requires ultralytics and onnx)"""
+    from ultralytics import YOLO
+
+    return YOLO(weights).export(format="onnx", imgsz=imgsz, dynamic=dynamic)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ViewGuard detector backends")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Export YOLOv8 weights to ONNX")
+    export_parser.add_argument("weights", help="Ultralytics weights, e.g. yolov8n.pt")
+    export_parser.add_argument("--imgsz", type=int, default=DEFAULT_IMGSZ)
+    export_parser.add_argument("--static", action="store_true", help="Fixed batch size of 1 instead of dynamic axes")
+
+    args = parser.parse_args()
+    if args.command == "export":
+        output = export_onnx(args.weights, imgsz=args.imgsz, dynamic=not args.static)
+        print(f"💾 Saved: {output}")
+        print(f"\nServe it with: VIEWGUARD_BACKEND=onnx VIEWGUARD_MODEL={output} python detection_server.py")
+
+
+if __name__ == "__main__":
+    main()
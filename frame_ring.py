@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+ViewGuard Shared-Memory Frame Ring
+Fixed-size frame slots in one multiprocessing.shared_memory block, so decoded
+frames reach process-pool inference workers without being pickled.
+
+The owning process (the detection server) copies a frame into a free slot and
+hands the worker a small FrameSlot descriptor (block name, slot, camera_id,
+timestamp, shape) instead of the array. The worker maps the block once and
+reads the slot as an ndarray view, without a copy.
+
+Slots are recycled explicitly: every put() that returns a descriptor must be
+matched by one release() once the worker's result is back or the frame was
+dropped. Until then the slot is never handed out again, so a worker can't see
+a frame being overwritten. When every slot is in use (or a frame is larger than
+a slot) put() returns None and the caller sends the array itself.
+
+Usage:
+    ring = FrameRing(slots=16, slot_bytes=1920 * 1080 * 3)
+    descriptor = ring.put(frame, camera_id=101, timestamp=time.time() * 1000)
+    # in a worker process
+    frame = read_frame(descriptor)
+    # back in the owner, once the worker is done
+    ring.release(descriptor)
+
+    python frame_ring.py bench --width 1920 --height 1080   # pickling vs ring through a process pool
+"""
+
+import argparse
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Dict, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+DEFAULT_SLOTS = 16
+DEFAULT_SLOT_BYTES = 1920 * 1080 * 3  # one 1080p BGR frame
+
+
+class FrameSlot(NamedTuple):
+    """Where a frame lives in a ring; small enough to pickle for every frame"""
+    ring: str  # shared memory block name
+    slot: int
+    offset: int  # byte offset of the slot in the block
+    shape: Tuple[int, ...]
+    dtype: str
+    camera_id: Any = None
+    timestamp: float = 0.0
+
+
+class FrameRing:
+    """Owner side of a ring: hands out free slots and takes them back"""
+
+    def __init__(self, slots: int = DEFAULT_SLOTS, slot_bytes: int = DEFAULT_SLOT_BYTES):
+        self.slots = max(1, slots)
+        self.slot_bytes = slot_bytes
+        self.memory = shared_memory.SharedMemory(create=True, size=self.slots * slot_bytes)
+        self.name = self.memory.name
+        self._free = deque(range(self.slots))
+        self._in_use = set()
+        self._lock = threading.Lock()  # put() runs on source reader threads, release() on the event loop
+        self.writes = 0
+        self.full = 0
+        self.oversized = 0
+
+    def put(self, frame: np.ndarray, camera_id: Any = None, timestamp: float = 0.0) -> Optional[FrameSlot]:
+        """Copy a frame into a free slot; None if it is larger than a slot or every slot is in use"""
+        with self._lock:
+            if frame.nbytes > self.slot_bytes:
+                self.oversized += 1
+                return None
+            if not self._free:
+                self.full += 1
+                return None
+            slot = self._free.popleft()
+            self._in_use.add(slot)
+            self.writes += 1
+        offset = slot * self.slot_bytes
+        np.copyto(np.ndarray(frame.shape, frame.dtype, buffer=self.memory.buf, offset=offset), frame)
+        return FrameSlot(self.name, slot, offset, frame.shape, frame.dtype.str, camera_id, timestamp)
+
+    def release(self, descriptor: FrameSlot):
+        """Give a slot back once nothing reads its frame anymore; releasing twice is a no-op"""
+        with self._lock:
+            if descriptor.ring == self.name and descriptor.slot in self._in_use:
+                self._in_use.discard(descriptor.slot)
+                self._free.append(descriptor.slot)
+
+    def summary(self) -> Dict:
+        return {
+            "slots": self.slots,
+            "slot_mb": round(self.slot_bytes / 1024 / 1024, 2),
+            "in_use": len(self._in_use),
+            "writes": self.writes,
+            "full": self.full,
+            "oversized": self.oversized,
+        }
+
+    def close(self):
+        """Unmap and remove the block; workers keep their own mapping until they exit"""
+        _attached.pop(self.name, None)
+        try:
+            self.memory.close()
+        except BufferError:
+            pass  # a frame view is still alive in this process; the mapping goes away with it
+        self.memory.unlink()
+
+
+# Rings this process has mapped, by block name
+_attached: Dict[str, shared_memory.SharedMemory] = {}
+
+
+def read_frame(descriptor: FrameSlot) -> np.ndarray:
+    """The descriptor's frame as a view into shared memory (maps the ring on first use in this process)"""
+    memory = _attached.get(descriptor.ring)
+    if memory is None:
+        memory = _attached[descriptor.ring] = shared_memory.SharedMemory(name=descriptor.ring)
+    return np.ndarray(descriptor.shape, np.dtype(descriptor.dtype), buffer=memory.buf, offset=descriptor.offset)
+
+
+def _touch(payload: Union[np.ndarray, FrameSlot]) -> int:
+    """Benchmark worker: read every byte of the frame, like preprocessing does"""
+    frame = read_frame(payload) if isinstance(payload, FrameSlot) else payload
+    return int(frame[::64, ::64].sum()) + int(frame.max())
+
+
+def bench(width: int, height: int, frames: int, workers: int):
+    rng = np.random.default_rng(0)
+    images = [rng.integers(0, 255, (height, width, 3), dtype=np.uint8) for _ in range(8)]
+    ring = FrameRing(slots=workers * 2, slot_bytes=images[0].nbytes)
+    print(f"{frames} frames of {width}x{height} ({images[0].nbytes / 1024 / 1024:.1f} MB) to {workers} workers")
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        list(pool.map(_touch, images[:workers]))  # start the workers
+
+        started = time.perf_counter()
+        inflight = deque()
+        for i in range(frames):
+            if len(inflight) >= workers * 2:
+                inflight.popleft().result()
+            inflight.append(pool.submit(_touch, images[i % len(images)]))
+        for future in inflight:
+            future.result()
+        pickled = time.perf_counter() - started
+
+        started = time.perf_counter()
+        inflight = deque()
+        for i in range(frames):
+            if len(inflight) >= ring.slots:
+                descriptor, future = inflight.popleft()
+                future.result()
+                ring.release(descriptor)
+            descriptor = ring.put(images[i % len(images)], camera_id=0, timestamp=time.time() * 1000)
+            inflight.append((descriptor, pool.submit(_touch, descriptor)))
+        for descriptor, future in inflight:
+            future.result()
+            ring.release(descriptor)
+        shared = time.perf_counter() - started
+    ring.close()
+
+    print(f"  pickled arrays   {frames / pickled:8.1f} fps")
+    print(f"  shared ring      {frames / shared:8.1f} fps  ({pickled / shared:.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ViewGuard shared-memory frame ring")
+    parser.add_argument("command", choices=["bench"])
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+    bench(args.width, args.height, args.frames, args.workers)
+
+
+if __name__ == "__main__":
+    main()
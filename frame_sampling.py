@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+ViewGuard Frame Sampling
+Iterates over a subset of a video's frames without paying for the frames it skips.
+
+cap.read() decodes a frame *and* converts it to a BGR image. Skipped frames only
+need cap.grab(), which advances the decoder without the conversion and copy, and
+for large gaps the sampler can seek instead of decoding everything in between.
+
+Usage:
+    # Every 15th frame: 0, 15, 30, ...
+    for index, frame in FrameSampler("video.mp4", every=15):
+        ...
+
+    # 2 frames per second, whatever the source frame rate
+    for index, frame in FrameSampler("video.mp4", fps=2):
+        ...
+"""
+
+from pathlib import Path
+from typing import Iterator, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+
+class FrameSampler:
+    """
+    Yield (frame_index, frame) for the sampled frames of a video, with 0-based
+    frame indices. Frames are selected either by stride (every `every`-th frame
+    starting at `offset`) or by time (`fps` frames per second of video).
+
+    Skipped frames are grabbed, not decoded to images. When `seek_min_gap` is
+    set and the source supports seeking, gaps of at least that many frames are
+    jumped over with CAP_PROP_POS_FRAMES instead. Seeking restarts decoding at
+    the previous keyframe, so it only pays off when gaps are much longer than
+    the video's keyframe interval (see benchmarks/bench_sampling.py).
+
+    `start` skips all samples before that frame index, seeking to it when the
+    source allows (used to resume an interrupted run).
+    """
+
+    def __init__(self, source: Union[str, Path, cv2.VideoCapture], every: int = 1, offset: int = 0,
+                 fps: Optional[float] = None, seek_min_gap: Optional[int] = None, start: int = 0):
+        if every < 1:
+            raise ValueError(f"every must be >= 1, got {every}")
+        if fps is not None and fps <= 0:
+            raise ValueError(f"fps must be > 0, got {fps}")
+
+        self.cap = source if isinstance(source, cv2.VideoCapture) else cv2.VideoCapture(str(source))
+        self.every = every
+        self.offset = offset
+        self.sample_fps = fps
+        self.seek_min_gap = seek_min_gap
+        self.start = start
+
+        # Index of the next frame the decoder will return, i.e. frames walked so far.
+        # After iterating to the end without seeking, this is the exact frame count.
+        self.position = 0
+        self.seeks = 0
+
+    @property
+    def fps(self) -> float:
+        return self.cap.get(cv2.CAP_PROP_FPS)
+
+    @property
+    def total_frames(self) -> int:
+        """Frame count reported by the container (may be approximate)"""
+        return int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    @property
+    def width(self) -> int:
+        return int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+
+    @property
+    def height(self) -> int:
+        return int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    def sample_indices(self) -> Iterator[int]:
+        """Frame indices to sample, in increasing order (unbounded)"""
+        if self.sample_fps is not None and self.fps > 0:
+            # k-th sample is the frame nearest to k / sample_fps seconds
+            step = max(self.fps / self.sample_fps, 1.0)
+            k = 0
+            while True:
+                yield int(round(k * step))
+                k += 1
+        else:
+            index = self.offset
+            while True:
+                yield index
+                index += self.every
+
+    def _seek(self, index: int) -> bool:
+        if not self.cap.set(cv2.CAP_PROP_POS_FRAMES, index):
+            # Not seekable (e.g. a live stream): grab from here on
+            self.seek_min_gap = None
+            return False
+        self.position = index
+        self.seeks += 1
+        return True
+
+    def __iter__(self) -> Iterator[Tuple[int, np.ndarray]]:
+        if self.start > self.position:
+            self._seek(self.start)
+
+        for target in self.sample_indices():
+            if target < self.start:
+                continue
+            if self.seek_min_gap is not None and target - self.position >= self.seek_min_gap:
+                self._seek(target)
+
+            # Advance to the target without converting the skipped frames
+            while self.position < target:
+                if not self.cap.grab():
+                    return
+                self.position += 1
+
+            ret, frame = self.cap.read()
+            if not ret:
+                return
+            self.position += 1
+            yield target, frame
+
+    def release(self):
+        self.cap.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
@@ -4,37 +4,87 @@ Video Annotation Generator
 Processes video files and generates JSON annotations with person detection bounding boxes.
 """
 
+import argparse
 import cv2
 import json
 import os
 import sys
+import time
 from pathlib import Path
 
-def process_video(video_path, output_dir):
-    """
-    Process a video file and generate annotations with person detections.
+import numpy as np
 
-    Args:
-        video_path: Path to the video file
-        output_dir: Directory to save the annotation JSON
-    """
-    print(f"\nProcessing: {video_path}")
+from detection_cache import DEFAULT_CACHE_MAX_MB, DEFAULT_CACHE_PATH, DetectionCache
+from frame_sampling import FrameSampler
+from result_log import ResultLog, write_json_stream
 
-    # Load YOLO model for person detection
-    # Using YOLOv3 - you can switch to YOLOv4 or YOLOv5 for better accuracy
-    try:
-        # Download these files if you don't have them:
-        # wget https://pjreddie.com/media/files/yolov3.weights
-        # wget https://github.com/pjreddie/darknet/blob/master/cfg/yolov3.cfg
-        # wget https://github.com/pjreddie/darknet/blob/master/data/coco.names
+# Detection settings (they are part of the detection cache key)
+INPUT_SIZE = 416
+MIN_CONFIDENCE = 0.5
+NMS_THRESHOLD = 0.4
+
+# Sampled frames per forward pass
+BATCH_SIZE = 8
+
+# The log is checkpointed (and progress printed) after this many records or seconds, whichever comes first
+CHECKPOINT_RECORDS = 10
+CHECKPOINT_SECONDS = 5.0
 
-        net = cv2.dnn.readNet("yolov3.weights", "yolov3.cfg")
-        layer_names = net.getLayerNames()
-        output_layers = [layer_names[i - 1] for i in net.getUnconnectedOutLayers()]
 
-        # Load COCO class labels
-        with open("coco.names", "r") as f:
+class YoloV3PersonDetector:
+    """
+    YOLOv3 (Darknet weights) through OpenCV's DNN module, loaded once and shared by
+    every video. Frames are detected in batches with a single forward pass each.
+    """
+
+    def __init__(self, weights="yolov3.weights", config="yolov3.cfg", names="coco.names", input_size=INPUT_SIZE):
+        self.model_files = [weights, config]
+        self.input_size = input_size
+        self.net = cv2.dnn.readNet(weights, config)
+        layer_names = self.net.getLayerNames()
+        self.output_layers = [layer_names[i - 1] for i in np.asarray(self.net.getUnconnectedOutLayers()).flatten()]
+
+        # COCO class labels
+        with open(names, "r") as f:
             classes = [line.strip() for line in f.readlines()]
+        self.person_class = classes.index("person")
+
+    def detect(self, frames):
+        """
+        Person detections for each frame as [N, 5] float32 arrays of center x, center y,
+        width, height (relative to the frame) and confidence, after non-maximum suppression
+        """
+        blob = cv2.dnn.blobFromImages(frames, 0.00392, (self.input_size, self.input_size), (0, 0, 0), True,
+                                      crop=False)
+        self.net.setInput(blob)
+        outs = self.net.forward(self.output_layers)
+
+        # Each output layer gives [rows, 85] for one image or [batch, rows, 85] for several:
+        # rows are center x, center y, width, height, objectness, then 80 class scores
+        rows = np.concatenate([out.reshape(len(frames), -1, out.shape[-1]) for out in outs], axis=1)
+        class_ids = rows[:, :, 5:].argmax(axis=2)
+        confidences = np.take_along_axis(rows[:, :, 5:], class_ids[:, :, None], axis=2)[:, :, 0]
+        keep = (class_ids == self.person_class) & (confidences > MIN_CONFIDENCE)
+
+        persons = []
+        for frame_rows, frame_confidences, frame_keep in zip(rows, confidences, keep):
+            boxes = frame_rows[frame_keep, :4]
+            scores = frame_confidences[frame_keep]
+            if len(boxes):
+                # IoU doesn't change when both axes are scaled, so relative boxes can go straight into NMS
+                xywh = np.column_stack([boxes[:, :2] - boxes[:, 2:] / 2, boxes[:, 2:]])
+                indices = np.asarray(cv2.dnn.NMSBoxes(xywh.tolist(), scores.tolist(), MIN_CONFIDENCE,
+                                                      NMS_THRESHOLD), dtype=np.int64).reshape(-1)
+                boxes, scores = boxes[indices], scores[indices]
+            persons.append(np.column_stack([boxes, scores]).astype(np.float32).reshape(-1, 5))
+        return persons
+
+
+def load_detector(**kwargs):
+    """Load the YOLOv3 person detector, or print how to get the model files and return None"""
+    # Using YOLOv3 - you can switch to YOLOv4 or YOLOv5 for better accuracy
+    try:
+        return YoloV3PersonDetector(**kwargs)
     except Exception as e:
         print(f"Error loading YOLO model: {e}")
         print("\nPlease download the YOLO model files:")
@@ -43,6 +93,32 @@ def process_video(video_path, output_dir):
         print("3. wget https://raw.githubusercontent.com/pjreddie/darknet/master/data/coco.names")
         return None
 
+
+def process_video(video_path, output_dir, frame_skip=5, sample_fps=None, resume=True, cache=None, detector=None,
+                  batch_size=BATCH_SIZE):
+    """
+    Process a video file and generate annotations with person detections.
+
+    Detections are appended to a `.partial.jsonl` log as frames are processed, so
+    memory stays constant and an interrupted run resumes where it stopped.
+
+    Args:
+        video_path: Path to the video file
+        output_dir: Directory to save the annotation JSON
+        frame_skip: Process every Nth frame (default: 5)
+        sample_fps: Process this many frames per second of video instead of every Nth frame
+        resume: Continue from the checkpoint of an interrupted run with the same settings
+        cache: DetectionCache holding raw network detections from earlier runs (default: no cache)
+        detector: Loaded YoloV3PersonDetector to share between videos (default: load one)
+        batch_size: Sampled frames per forward pass
+    """
+    print(f"\nProcessing: {video_path}")
+
+    if detector is None:
+        detector = load_detector()
+        if detector is None:
+            return None
+
     # Open video
     cap = cv2.VideoCapture(str(video_path))
     if not cap.isOpened():
@@ -57,74 +133,129 @@ def process_video(video_path, output_dir):
 
     print(f"Duration: {duration:.2f}s, Resolution: {width}x{height}, FPS: {fps:.2f}")
 
-    detections = []
-    frame_count = 0
-
-    # Process every 5th frame to speed up (adjust as needed)
-    frame_skip = 5
-
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        frame_count += 1
-
-        # Skip frames for performance
-        if frame_count % frame_skip != 0:
-            continue
-
+    # Detections of every processed frame go to the log, checkpointed periodically
+    output_file = output_dir / f"{video_path.stem}.json"
+    header = {"video": video_path.name, "frame_skip": frame_skip, "sample_fps": sample_fps}
+    log = ResultLog(output_file.with_name(output_file.name + ".partial.jsonl"), header, resume=resume)
+    if log.resumed_records:
+        print(f"Resuming from frame {log.last_frame + 1}")
+
+    # Process every Nth frame (or sample_fps frames per second) to speed up.
+    # Skipped frames are grabbed without being decoded to images.
+    if sample_fps:
+        sampler = FrameSampler(cap, fps=sample_fps, start=log.last_frame + 1)
+    else:
+        sampler = FrameSampler(cap, every=frame_skip, offset=frame_skip - 1, start=log.last_frame + 1)
+
+    # Raw person detections (center x, center y, width, height, confidence; relative
+    # to the frame) are cached per frame, so only the conversion below reruns when
+    # the video and model are unchanged
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.run_key(video_path, model_files=detector.model_files,
+                                  params={"task": "yolov3_persons", "input_size": detector.input_size,
+                                          "min_confidence": MIN_CONFIDENCE, "nms_threshold": NMS_THRESHOLD})
+
+    def detect_batch(batch):
+        """Detections for a list of (frame index, frame), from the cache where possible"""
+        cached = cache.get_many(cache_key, [frame_index for frame_index, _ in batch]) if cache is not None else {}
+        misses = [(frame_index, frame) for frame_index, frame in batch if frame_index not in cached]
+        results = {frame_index: np.array(persons, dtype=np.float32).reshape(-1, 5)
+                   for frame_index, persons in cached.items()}
+        if misses:
+            results.update(zip([frame_index for frame_index, _ in misses],
+                               detector.detect([frame for _, frame in misses])))
+        return results, {frame_index: results[frame_index].tolist() for frame_index, _ in misses}
+
+    def sampled_frames():
+        """(frame index, raw detections) for every sampled frame, from the cache where possible"""
+        new_results = {}
+
+        # A video processed to the end before can come entirely from the cache, without decoding
+        cached_frame_count = cache.get_frame_count(cache_key) if cache is not None else None
+        if cached_frame_count is not None:
+            indices = []
+            for frame_index in sampler.sample_indices():
+                if frame_index >= cached_frame_count:
+                    break
+                if frame_index >= sampler.start:
+                    indices.append(frame_index)
+            cached = cache.get_many(cache_key, indices)
+            if len(cached) == len(indices):
+                print("All frames found in the detection cache")
+                for frame_index in indices:
+                    yield frame_index, np.array(cached[frame_index], dtype=np.float32).reshape(-1, 5)
+                return
+
+        batch = []
+        for sample in sampler:
+            batch.append(sample)
+            if len(batch) < batch_size:
+                continue
+            results, detected = detect_batch(batch)
+            new_results.update(detected)
+            for frame_index, _ in batch:
+                yield frame_index, results[frame_index]
+            batch = []
+
+            if cache is not None and len(new_results) >= 50:
+                cache.put_many(cache_key, new_results)
+                new_results = {}
+
+        if batch:
+            results, detected = detect_batch(batch)
+            new_results.update(detected)
+            for frame_index, _ in batch:
+                yield frame_index, results[frame_index]
+
+        if cache is not None:
+            cache.put_many(cache_key, new_results)
+            cache.set_frame_count(cache_key, sampler.position)
+
+    unsaved_records = 0
+    last_checkpoint = time.monotonic()
+    for frame_index, persons in sampled_frames():
+        frame_count = frame_index + 1
         current_time = frame_count / fps
 
-        # Detect objects in frame
-        blob = cv2.dnn.blobFromImage(frame, 0.00392, (416, 416), (0, 0, 0), True, crop=False)
-        net.setInput(blob)
-        outs = net.forward(output_layers)
-
-        # Process detections
-        for out in outs:
-            for detection in out:
-                scores = detection[5:]
-                class_id = scores.argmax()
-                confidence = scores[class_id]
-
-                # Only keep "person" class (class_id 0) with confidence > 0.5
-                if class_id == 0 and confidence > 0.5:
-                    # Get bounding box coordinates
-                    center_x = int(detection[0] * width)
-                    center_y = int(detection[1] * height)
-                    w = int(detection[2] * width)
-                    h = int(detection[3] * height)
-
-                    # Convert to top-left corner coordinates
-                    x = int(center_x - w / 2)
-                    y = int(center_y - h / 2)
-
-                    # Convert to percentages
-                    x_percent = (x / width) * 100
-                    y_percent = (y / height) * 100
-                    w_percent = (w / width) * 100
-                    h_percent = (h / height) * 100
-
-                    detections.append({
-                        "time": round(current_time, 2),
-                        "type": "PERSON",
-                        "confidence": round(float(confidence) * 100, 1),
-                        "boundingBox": {
-                            "x": round(x_percent, 1),
-                            "y": round(y_percent, 1),
-                            "width": round(w_percent, 1),
-                            "height": round(h_percent, 1)
-                        }
-                    })
-
-        # Progress indicator
-        if frame_count % (frame_skip * 10) == 0:
+        # Bounding boxes in whole pixels: center and size, then the top-left corner
+        center_x = np.trunc(persons[:, 0] * width).astype(np.float64)
+        center_y = np.trunc(persons[:, 1] * height).astype(np.float64)
+        w = np.trunc(persons[:, 2] * width).astype(np.float64)
+        h = np.trunc(persons[:, 3] * height).astype(np.float64)
+        x = np.trunc(center_x - w / 2)
+        y = np.trunc(center_y - h / 2)
+
+        # Convert to percentages
+        boxes = np.column_stack([x / width, y / height, w / width, h / height]) * 100
+        confidences = persons[:, 4].astype(np.float64) * 100
+
+        detections = [{
+            "time": round(current_time, 2),
+            "type": "PERSON",
+            "confidence": round(confidence, 1),
+            "boundingBox": {
+                "x": round(box[0], 1),
+                "y": round(box[1], 1),
+                "width": round(box[2], 1),
+                "height": round(box[3], 1)
+            }
+        } for box, confidence in zip(boxes.tolist(), confidences.tolist())]
+
+        log.append({"frame": frame_index, "detections": detections})
+
+        # Checkpoint and report progress by records and time, not by frame index: with
+        # sample_fps the sampled indices rarely land on a fixed multiple
+        unsaved_records += 1
+        if unsaved_records >= CHECKPOINT_RECORDS or time.monotonic() - last_checkpoint >= CHECKPOINT_SECONDS:
+            log.checkpoint()
+            unsaved_records = 0
+            last_checkpoint = time.monotonic()
             progress = (frame_count / total_frames) * 100
             print(f"Progress: {progress:.1f}%", end='\r')
 
     cap.release()
-    print(f"\nDetected {len(detections)} person instances")
+    log.checkpoint()
 
     # Determine category from path
     video_name = video_path.name
@@ -139,24 +270,40 @@ def process_video(video_path, output_dir):
 
     category = category_map.get(parent_dir.replace('usable_', ''), 'unknown')
 
-    # Create annotation object
+    # Create annotation object; detections are streamed in from the log
     annotation = {
         "videoFile": video_name,
         "category": category,
         "duration": round(duration, 2),
-        "detections": detections,
+        "detections": [],
         "events": []  # User will manually add these
     }
 
-    # Save to JSON
-    output_file = output_dir / f"{video_path.stem}.json"
-    with open(output_file, 'w') as f:
-        json.dump(annotation, f, indent=2)
+    detection_count = 0
+
+    def logged_detections():
+        nonlocal detection_count
+        for record in log.records():
+            detection_count += len(record["detections"])
+            yield from record["detections"]
 
+    # Save to JSON in one streaming pass, then drop the log
+    write_json_stream(output_file, annotation, "detections", logged_detections())
+    log.remove()
+
+    print(f"\nDetected {detection_count} person instances")
     print(f"Saved annotations to: {output_file}")
-    return annotation
+    return output_file
 
 def main():
+    parser = argparse.ArgumentParser(description="Generate person detection annotations for the footage videos")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH,
+                        help="Detection cache file (default: ~/.cache/viewguard/detections.sqlite, env: VIEWGUARD_CACHE)")
+    parser.add_argument("--cache-max-mb", type=float, default=DEFAULT_CACHE_MAX_MB,
+                        help="Cache size cap; least recently used frames are evicted (env: VIEWGUARD_CACHE_MAX_MB)")
+    parser.add_argument("--no-cache", action="store_true", help="Neither read nor write the detection cache")
+    args = parser.parse_args()
+
     # Paths
     footage_dir = Path("/home/leo/code/footage")
     output_dir = Path("/home/leo/code/vigilant-ai-stream/public/annotations")
@@ -180,11 +327,20 @@ def main():
         print("No videos found!")
         return
 
+    # Load the network once for all videos
+    detector = load_detector()
+    if detector is None:
+        return
+
+    # Detections are cached across runs (see detection_cache.py), so rerunning
+    # after changing only the output conversion skips inference
+    cache = None if args.no_cache else DetectionCache(args.cache, args.cache_max_mb)
+
     # Process each video
     for i, video_path in enumerate(all_videos, 1):
         print(f"\n[{i}/{len(all_videos)}]")
         try:
-            process_video(video_path, output_dir)
+            process_video(video_path, output_dir, cache=cache, detector=detector)
         except Exception as e:
             print(f"Error processing {video_path}: {e}")
             continue
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+ViewGuard Sampling Profiler
+Low-overhead profiler that can be switched on in a running server: a background
+thread periodically snapshots the Python stack of every other thread in the
+process (sys._current_frames) and counts identical stacks. Nothing is traced
+between samples, so the hot path runs at full speed.
+
+Results are "folded" stacks, one line per unique stack with its sample count,
+which flamegraph.pl, speedscope and similar tools read directly:
+
+    MainThread;run (server.py:10);handle (server.py:42) 17
+
+Only threads of the current process are sampled; with process workers, the
+model runs in other processes and shows up as time spent waiting on them.
+"""
+
+import collections
+import os
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+
+class SamplingProfiler:
+    """Collects folded stack samples from all threads until stopped or a duration elapses"""
+
+    def __init__(self):
+        self.samples: collections.Counter = collections.Counter()
+        self.sample_count = 0
+        self.interval_ms = 0.0
+        self.started_at: Optional[float] = None
+        self.stopped_at: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()  # samples is written by the sampler thread and read by requests
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval_ms: float = 5.0, duration_s: float = 30.0):
+        """Start sampling from scratch; stops by itself after duration_s so a forgotten profile can't run forever"""
+        self.stop()
+        with self._lock:
+            self.samples.clear()
+        self.sample_count = 0
+        self.interval_ms = interval_ms
+        self.started_at = time.time()
+        self.stopped_at = None
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval_ms / 1000, duration_s),
+                                        name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, interval: float, duration_s: float):
+        own_id = threading.get_ident()
+        deadline = time.perf_counter() + duration_s
+        while not self._stop.wait(interval) and time.perf_counter() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                stacks.append(";".join(reversed(stack)))
+            with self._lock:
+                self.samples.update(stacks)
+                self.sample_count += 1
+        self.stopped_at = time.time()
+
+    def _snapshot(self) -> collections.Counter:
+        """A copy of the samples, safe to iterate while the sampler keeps adding to them"""
+        with self._lock:
+            return self.samples.copy()
+
+    def folded(self) -> str:
+        """Collected stacks in folded format, most frequent first"""
+        return "".join(f"{stack} {count}\n" for stack, count in self._snapshot().most_common())
+
+    def summary(self, top: int = 20) -> Dict:
+        """Status and the functions most often on top of a stack ("self" samples)"""
+        with self._lock:
+            samples, sample_count = self.samples.copy(), self.sample_count
+        leaves: collections.Counter = collections.Counter()
+        for stack, count in samples.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return {
+            "running": self.running,
+            "interval_ms": self.interval_ms,
+            "started_at": self.started_at,
+            "stopped_at": self.stopped_at,
+            "samples": sample_count,
+            "top_functions": [{"function": name, "samples": count} for name, count in leaves.most_common(top)],
+        }
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+ViewGuard Result Log
+Append-only JSON Lines log for long-running offline jobs (bounding box and
+annotation generation), so results go to disk as they are produced instead of
+accumulating in memory, and a crashed run resumes from its last checkpoint.
+
+The first line holds a header describing the job; every further line is one
+record. A run whose header matches resumes after the last complete record; a
+different header (other video, other settings) starts the log over. The final
+output file is then produced from the log in a single streaming pass.
+
+Usage:
+    log = ResultLog("out.json.partial.jsonl", header={"video": "a.mp4", "interval": 15})
+    start = log.last_frame + 1
+    for ...:
+        log.append({"frame": index, ...})
+        log.checkpoint()
+    write_json_stream("out.json", template, "frames", items_from(log.records()))
+    log.remove()
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Union
+
+
+class ResultLog:
+    """JSON Lines result log with checkpoint/resume"""
+
+    def __init__(self, path: Union[str, Path], header: Dict, resume: bool = True):
+        self.path = Path(path)
+        self.header = header
+        self.last_frame = -1  # "frame" of the last complete record
+        self.resumed_records = 0
+
+        if resume and self.path.exists() and self._recover():
+            self.file = open(self.path, "a")
+        else:
+            self.file = open(self.path, "w")
+            self.file.write(json.dumps({"header": header}) + "\n")
+            self.checkpoint()
+
+    def _recover(self) -> bool:
+        """Check the header and cut off a partially written last line; False if the log can't be resumed"""
+        valid_bytes = 0
+        with open(self.path, "rb") as f:
+            first = f.readline()
+            try:
+                if not first.endswith(b"\n") or json.loads(first).get("header") != self.header:
+                    return False
+            except ValueError:
+                return False
+            valid_bytes = len(first)
+
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                valid_bytes += len(line)
+                self.resumed_records += 1
+                self.last_frame = record.get("frame", self.last_frame)
+
+        with open(self.path, "r+b") as f:
+            f.truncate(valid_bytes)
+        return True
+
+    def append(self, record: Dict):
+        self.file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        if "frame" in record:
+            self.last_frame = record["frame"]
+
+    def checkpoint(self):
+        """Make everything appended so far durable; a crash after this resumes from here"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def records(self) -> Iterator[Dict]:
+        """Stream the records back from disk, in the order they were appended"""
+        self.file.flush()
+        with open(self.path) as f:
+            next(f)  # header
+            for line in f:
+                yield json.loads(line)
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+    def remove(self):
+        self.close()
+        self.path.unlink(missing_ok=True)
+
+
+def _indent_block(text: str, prefix: str) -> str:
+    return text.replace("\n", "\n" + prefix)
+
+
+def write_json_stream(path: Union[str, Path], template: Dict, key: str, items: Iterable[Any],
+                      indent: int = 2):
+    """
+    Write `template` as JSON with `template[key]` filled in from `items`, one item at
+    a time, so the whole value never has to be in memory. If template[key] is a dict,
+    items are (name, value) pairs and become an object; otherwise they become a list.
+    The output is identical to json.dump(..., indent=indent) of the complete object.
+    Written through a temporary file, so readers never see a partial file.
+    """
+    path = Path(path)
+    is_mapping = isinstance(template[key], dict)
+    placeholder = "\x00stream\x00"
+
+    text = json.dumps({**template, key: placeholder}, indent=indent)
+    prefix, suffix = text.split(json.dumps(placeholder), 1)
+    item_indent = " " * (indent * 2)  # items sit two levels deep: top-level object -> key's container
+
+    temp_path = path.with_name(path.name + ".tmp")
+    with open(temp_path, "w") as f:
+        f.write(prefix)
+        first = True
+        for item in items:
+            f.write(("{" if is_mapping else "[") + "\n" if first else ",\n")
+            first = False
+            if is_mapping:
+                name, value = item
+                f.write(f"{item_indent}{json.dumps(name)}: {_indent_block(json.dumps(value, indent=indent), item_indent)}")
+            else:
+                f.write(item_indent + _indent_block(json.dumps(item, indent=indent), item_indent))
+        if first:
+            f.write("{}" if is_mapping else "[]")
+        else:
+            f.write("\n" + " " * indent + ("}" if is_mapping else "]"))
+        f.write(suffix)
+    os.replace(temp_path, path)
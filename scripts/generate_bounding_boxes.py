@@ -2,16 +2,64 @@
 """
 YOLOv8-based Bounding Box Generator
 Generates pre-computed bounding box JSON files for videos with person detection.
+Files are written in the keyframe-only v2 format (see bbox_format.py).
+
+Videos are processed in parallel by a pool of worker processes, each loading the
+model once, and keyframes within a video are detected in batches. Videos whose
+output is newer than the video and was made with the same model and settings
+are skipped unless --force is given.
+
+Results are appended to a `*.partial.jsonl` log as they are produced (see
+result_log.py), so memory stays constant and an interrupted run resumes from
+its last checkpoint. The log is consolidated into the final file at the end.
+
+Keyframe detections are also kept in an on-disk cache (see detection_cache.py),
+so rerunning with the same video, model and thresholds skips inference.
+
+Boxes are linked across keyframes by a SORT-style tracker (see tracking.py),
+so every box gets a persistent track ID and viewers can interpolate between
+keyframes instead of holding the boxes still.
 """
 
+import argparse
 import cv2
 import json
+import multiprocessing
 import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from ultralytics import YOLO
 import numpy as np
 
-def generate_bounding_boxes(video_path: str, output_dir: str, frame_interval: int = 15):
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from bbox_format import binary_path, write_track_stream
+from detection_cache import DEFAULT_CACHE_MAX_MB, DEFAULT_CACHE_PATH, DetectionCache
+from detectors import Detector, load_detector, resolve_model
+from frame_sampling import FrameSampler
+from result_log import ResultLog
+from tracking import Tracker
+
+# Detector and cache opened once per worker process by _init_worker
+_worker_detector = None
+_worker_cache = None
+
+
+def detect_keyframes(detector: Detector, frames, width: int, height: int, conf: float, iou: float):
+    """Run one batched predict over keyframes and return (boxes, confidences) per frame"""
+    outputs = []
+    for xyxy_boxes, confs in detector.predict(frames, conf=conf, iou=iou):
+        # Ensure boxes stay within frame bounds, as integer [x1, y1, x2, y2]
+        boxes = np.clip(xyxy_boxes.astype(np.int64), 0, [width, height, width, height])
+        outputs.append((boxes.tolist(), confs.astype(float).tolist()))
+    return outputs
+
+
+def generate_bounding_boxes(video_path: str, output_dir: str, frame_interval: int = 15,
+                            detector: Detector = None, batch_size: int = 8,
+                            conf: float = 0.2, iou: float = 0.2, verbose: bool = True,
+                            format_version: int = 2, binary: bool = False, resume: bool = True,
+                            cache: DetectionCache = None, track: bool = True, track_iou: float = 0.3):
     """
     Generate bounding boxes for a video using YOLOv8.
 
@@ -19,15 +67,28 @@ def generate_bounding_boxes(video_path: str, output_dir: str, frame_interval: in
         video_path: Path to the input video file
         output_dir: Directory to save the JSON output
         frame_interval: Process every Nth frame (default: 15)
+        detector: Person detector to use (default: YOLOv8 small via Ultralytics)
+        batch_size: Keyframes per detector call (default: 8)
+        conf: Confidence threshold (default: 0.2)
+        iou: IoU threshold for NMS (default: 0.2)
+        verbose: Print video info and progress
+        format_version: 2 for keyframe-only compact JSON, 1 for the per-frame format
+        binary: Also write a .bbx binary file (see bbox_format.py)
+        resume: Continue from the checkpoint of an interrupted run with the same settings
+        cache: Detection cache to reuse keyframe results from (default: no cache)
+        track: Assign persistent track IDs so boxes are interpolated between keyframes
+        track_iou: Minimum IoU between a track's predicted box and a detection to continue the track
     """
     video_name = Path(video_path).name
-    print(f"\n{'='*60}")
-    print(f"Processing: {video_name}")
-    print(f"{'='*60}")
+    if verbose:
+        print(f"\n{'='*60}")
+        print(f"Processing: {video_name}")
+        print(f"{'='*60}")
 
-    # Load YOLOv8 small model
-    print("Loading YOLOv8 small model...")
-    model = YOLO("yolov8s.pt")
+    if detector is None:
+        if verbose:
+            print("Loading YOLOv8 small model...")
+        detector = load_detector(weights="yolov8s.pt")
 
     # Open video
     cap = cv2.VideoCapture(video_path)
@@ -41,108 +102,226 @@ def generate_bounding_boxes(video_path: str, output_dir: str, frame_interval: in
     fps = cap.get(cv2.CAP_PROP_FPS)
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
 
-    print(f"Video Info:")
-    print(f"  Resolution: {width}x{height}")
-    print(f"  FPS: {fps:.2f}")
-    print(f"  Total Frames: {total_frames}")
-    print(f"  Frame Interval: {frame_interval}")
-
-    # Initialize data structure
-    video_data = {
-        "video_info": {
-            "name": video_name,
-            "width": width,
-            "height": height,
-            "fps": fps,
-            "total_frames": total_frames,
-            "frame_interval": frame_interval
-        },
-        "frames": {}
+    if verbose:
+        print(f"Video Info:")
+        print(f"  Resolution: {width}x{height}")
+        print(f"  FPS: {fps:.2f}")
+        print(f"  Total Frames: {total_frames}")
+        print(f"  Frame Interval: {frame_interval}")
+
+    # The settings are stored with the output so a rerun can tell whether it is still up to date
+    model_info = detector.describe()
+    video_info = {
+        "name": video_name,
+        "width": width,
+        "height": height,
+        "fps": fps,
+        "total_frames": total_frames,
+        "frame_interval": frame_interval,
+        "settings": run_settings(detector.backend, detector.weights, detector.imgsz,
+                                 frame_interval, conf, iou, format_version, binary, track, track_iou),
     }
 
-    # Variables for tracking
-    frame_count = 0
-    last_boxes = []
-    last_confidences = []
-
-    print("\nProcessing frames...")
-
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        # Check if this is a keyframe (frame to process)
-        is_keyframe = (frame_count % frame_interval == 0)
-
-        if is_keyframe:
-            # Run YOLOv8 detection
-            results = model.predict(
-                frame,
-                classes=[0],  # Only detect person (class 0 in COCO)
-                conf=0.2,     # Confidence threshold
-                iou=0.2,      # IoU threshold for NMS
-                verbose=False
-            )
-
-            # Extract bounding boxes and confidences
-            boxes = []
-            confidences = []
-
-            if len(results) > 0 and results[0].boxes is not None:
-                # Get boxes in xyxy format [x1, y1, x2, y2]
-                xyxy_boxes = results[0].boxes.xyxy.cpu().numpy()
-                confs = results[0].boxes.conf.cpu().numpy()
-
-                for box, conf in zip(xyxy_boxes, confs):
-                    # Ensure boxes stay within frame bounds
-                    x1 = max(0, min(int(box[0]), width))
-                    y1 = max(0, min(int(box[1]), height))
-                    x2 = max(0, min(int(box[2]), width))
-                    y2 = max(0, min(int(box[3]), height))
-
-                    boxes.append([x1, y1, x2, y2])
-                    confidences.append(float(conf))
-
-            # Update last known boxes
-            last_boxes = boxes
-            last_confidences = confidences
+    output_file = Path(output_dir) / f"{Path(video_name).stem}_boxes.json"
+
+    # Keyframe detections are appended to the log one batch at a time. The header
+    # identifies the run, so a checkpoint is only resumed with the same settings.
+    header = {"video": video_name, "frame_interval": frame_interval, "conf": conf, "iou": iou,
+              "backend": model_info["backend"], "weights": model_info["weights"], "imgsz": model_info["imgsz"]}
+    log = ResultLog(output_file.with_name(output_file.name + ".partial.jsonl"), header, resume=resume)
+    start_frame = log.last_frame + 1
+    if verbose and log.resumed_records:
+        print(f"\nResuming from frame {start_frame} ({log.resumed_records} keyframes already done)")
+
+    # Cached detections depend on the video, the model and the inference settings,
+    # not on the frame interval or output format
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.run_key(video_path, model_files=[detector.weights or detector.backend],
+                                  params={"task": "person_boxes", "backend": detector.backend,
+                                          "imgsz": detector.imgsz, "conf": conf, "iou": iou})
+
+    def flush_batch(indices, frames):
+        results = cache.get_many(cache_key, indices) if cache is not None else {}
+        missing = [i for i, frame_index in enumerate(indices) if frame_index not in results]
+        if missing:
+            outputs = detect_keyframes(detector, [frames[i] for i in missing], width, height, conf, iou)
+            new_results = {indices[i]: {"boxes": boxes, "confidences": confidences}
+                           for i, (boxes, confidences) in zip(missing, outputs)}
+            if cache is not None:
+                cache.put_many(cache_key, new_results)
+            results.update(new_results)
+
+        for frame_index in indices:
+            log.append({"frame": frame_index, **results[frame_index]})
+        log.checkpoint()
+
+    # A video processed to the end before can come entirely from the cache, without decoding
+    cached_frame_count = cache.get_frame_count(cache_key) if cache is not None else None
+    if cached_frame_count is not None:
+        first_keyframe = -(-start_frame // frame_interval) * frame_interval
+        keyframe_indices = range(first_keyframe, cached_frame_count, frame_interval)
+        cached = cache.get_many(cache_key, keyframe_indices)
+        if len(cached) < len(keyframe_indices):
+            cached_frame_count = None  # partly evicted: decode, reusing what is left
         else:
-            # Interpolate: reuse last detected boxes
-            boxes = last_boxes
-            confidences = last_confidences
+            for frame_index in keyframe_indices:
+                log.append({"frame": frame_index, **cached[frame_index]})
+            log.checkpoint()
+            frame_count = cached_frame_count
+            if verbose:
+                print(f"\nAll {len(keyframe_indices)} keyframes found in the detection cache")
+
+    if cached_frame_count is None:
+        pending_indices = []
+        pending_frames = []
+
+        if verbose:
+            print("\nProcessing frames...")
+
+        # Only keyframes are decoded to images; the frames in between are just grabbed
+        sampler = FrameSampler(cap, every=frame_interval, start=start_frame)
+        for frame_index, frame in sampler:
+            pending_indices.append(frame_index)
+            pending_frames.append(frame)
+
+            if len(pending_frames) >= batch_size:
+                flush_batch(pending_indices, pending_frames)
+                pending_indices, pending_frames = [], []
+
+                # Progress indicator
+                if verbose:
+                    progress = (sampler.position / total_frames) * 100
+                    print(f"  Progress: {progress:.1f}% ({sampler.position}/{total_frames} frames)")
+
+        if pending_frames:
+            flush_batch(pending_indices, pending_frames)
+
+        # The sampler grabs through to the end of the video, so this is the exact frame count
+        frame_count = sampler.position
+        if cache is not None:
+            cache.set_frame_count(cache_key, frame_count)
+
+    cap.release()
 
-        # Store frame data
-        video_data["frames"][str(frame_count)] = {
-            "boxes": boxes,
-            "confidences": confidences,
-            "is_keyframe": is_keyframe
-        }
+    # Consolidate the log into the output in one streaming pass. Files are written
+    # to a temporary file first so a crash here never leaves a truncated file that
+    # looks up to date; the log is only removed once the output is complete.
+    # Tracking runs here, over the keyframes in order, so a resumed run gets the
+    # same track IDs as an uninterrupted one.
+    keyframes = ((record["frame"], record["boxes"], record["confidences"]) for record in log.records())
+    if track:
+        tracker = Tracker(iou_threshold=track_iou)
+        keyframes = ((frame_index, boxes, confidences, tracker.update(boxes).tolist())
+                     for frame_index, boxes, confidences in keyframes)
+    write_track_stream(keyframes, video_info, frame_count, output_file, version=format_version, binary=binary,
+                       tracked=track)
+    log.remove()
+
+    if verbose:
+        print(f"\n✅ Processing complete!")
+        print(f"  Total frames processed: {frame_count}")
+        print(f"💾 Saved: {output_file}")
+
+    return {"video_info": video_info, "frame_count": frame_count, "output": str(output_file)}
+
+
+def output_path(video_path: Path, output_dir: Path) -> Path:
+    return output_dir / f"{video_path.stem}_boxes.json"
+
+
+def run_settings(backend: str, weights: str, imgsz: int, frame_interval: int, conf: float, iou: float,
+                 format_version: int, binary: bool, track: bool, track_iou: float) -> dict:
+    """Everything that shapes an output file; a local weights file is identified by size and mtime too"""
+    model = {"backend": backend, "weights": weights, "imgsz": imgsz}
+    if weights and Path(weights).is_file():
+        stat = Path(weights).stat()
+        model.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+    return {"model": model, "frame_interval": frame_interval, "conf": conf, "iou": iou,
+            "format": format_version, "binary": binary, "track": track, "track_iou": track_iou if track else None}
+
+
+def is_up_to_date(video_path: Path, output_dir: Path, settings: dict) -> bool:
+    """True if the video's JSON is newer than the video and was written with the same settings"""
+    output_file = output_path(video_path, output_dir)
+    if not output_file.exists() or output_file.stat().st_mtime < video_path.stat().st_mtime:
+        return False
+    if settings["binary"] and not binary_path(output_file).exists():
+        return False
+    try:
+        with open(output_file) as f:
+            stored = json.load(f)["video_info"].get("settings")
+    except (OSError, ValueError, KeyError, AttributeError):
+        return False
+    return stored == settings
+
+
+def count_frames(video_path: Path) -> int:
+    cap = cv2.VideoCapture(str(video_path))
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return max(total_frames, 1)
 
-        frame_count += 1
 
-        # Progress indicator
-        if frame_count % 100 == 0:
-            progress = (frame_count / total_frames) * 100
-            print(f"  Progress: {progress:.1f}% ({frame_count}/{total_frames} frames)")
+def _init_worker(backend, weights, imgsz, threads, cache_path, cache_max_mb):
+    """Pool initializer: load the detector and open the cache once per worker process"""
+    global _worker_detector, _worker_cache
+    cv2.setNumThreads(1)
+    _worker_detector = load_detector(backend=backend, weights=weights, imgsz=imgsz, num_threads=threads)
+    if cache_path:
+        _worker_cache = DetectionCache(cache_path, cache_max_mb)
 
-    cap.release()
 
-    print(f"\n✅ Processing complete!")
-    print(f"  Total frames processed: {frame_count}")
-    print(f"  Keyframes: {frame_count // frame_interval + 1}")
+def _process_video(video_path: str, output_dir: str, frame_interval: int, batch_size: int,
+                   conf: float, iou: float, format_version: int, binary: bool, resume: bool, track: bool,
+                   track_iou: float):
+    """Worker job: process one video with this worker's detector"""
+    start = time.time()
+    result = generate_bounding_boxes(video_path, output_dir, frame_interval, detector=_worker_detector,
+                                     batch_size=batch_size, conf=conf, iou=iou, verbose=False,
+                                     format_version=format_version, binary=binary, resume=resume,
+                                     cache=_worker_cache, track=track, track_iou=track_iou)
+    frames = result["frame_count"] if result else 0
+    return frames, time.time() - start
 
-    # Save to JSON
-    output_file = Path(output_dir) / f"{Path(video_name).stem}_boxes.json"
-    with open(output_file, 'w') as f:
-        json.dump(video_data, f, indent=2)
 
-    print(f"💾 Saved: {output_file}")
+def format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}m{seconds:02d}s" if minutes else f"{seconds}s"
 
-    return video_data
 
 def main():
     """Main function to process all videos in the videos directory."""
+    parser = argparse.ArgumentParser(description="Generate bounding box JSON files for all videos")
+    parser.add_argument("--backend", choices=["ultralytics", "onnx", "stub"], default=None,
+                        help="Detector backend (default: inferred from --weights)")
+    parser.add_argument("--weights", default="yolov8s.pt", help="Model weights (.pt or exported .onnx)")
+    parser.add_argument("--imgsz", type=int, default=None, help="Model input size (default: 640)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Videos processed in parallel, one model per worker (default: CPU count)")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="Inference threads per worker (default: CPU count / workers)")
+    parser.add_argument("--batch-size", type=int, default=8, help="Keyframes per detector call (default: 8)")
+    parser.add_argument("--interval", type=int, default=15, help="Process every Nth frame (default: 15)")
+    parser.add_argument("--conf", type=float, default=0.2, help="Confidence threshold (default: 0.2)")
+    parser.add_argument("--iou", type=float, default=0.2, help="IoU threshold for NMS (default: 0.2)")
+    parser.add_argument("--format", type=int, choices=[1, 2], default=2,
+                        help="Output format: 2 = keyframe-only compact JSON (default), 1 = one entry per frame")
+    parser.add_argument("--binary", action="store_true", help="Also write .bbx binary files")
+    parser.add_argument("--force", action="store_true", help="Regenerate videos whose output is up to date")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH,
+                        help="Detection cache file (default: ~/.cache/viewguard/detections.sqlite, env: VIEWGUARD_CACHE)")
+    parser.add_argument("--cache-max-mb", type=float, default=DEFAULT_CACHE_MAX_MB,
+                        help="Cache size cap; least recently used frames are evicted (env: VIEWGUARD_CACHE_MAX_MB)")
+    parser.add_argument("--no-cache", action="store_true", help="Neither read nor write the detection cache")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="Start over instead of resuming interrupted videos from their checkpoint")
+    parser.add_argument("--no-track", action="store_true",
+                        help="Don't assign track IDs; boxes hold still between keyframes as before")
+    parser.add_argument("--track-iou", type=float, default=0.3,
+                        help="Minimum IoU to continue a track from one keyframe to the next (default: 0.3)")
+    args = parser.parse_args()
+
     # Paths
     videos_dir = Path(__file__).parent.parent / "public" / "videos"
     output_dir = Path(__file__).parent.parent / "public" / "bounding_boxes"
@@ -164,26 +343,79 @@ def main():
     # Filter out files ending with _boxes.mp4
     video_files = [v for v in video_files if not v.name.endswith('_boxes.mp4')]
 
-    print(f"\nFound {len(video_files)} videos to process\n")
+    print(f"\nFound {len(video_files)} videos")
 
     if not video_files:
         print("⚠️  No video files found!")
         return
 
-    # Process each video
-    for i, video_path in enumerate(video_files, 1):
-        print(f"\n[{i}/{len(video_files)}]")
-        try:
-            generate_bounding_boxes(str(video_path), str(output_dir), frame_interval=15)
-        except Exception as e:
-            print(f"❌ Error processing {video_path.name}: {e}")
-            import traceback
-            traceback.print_exc()
-            continue
+    # Skip videos whose JSON is already newer than the video and made with these settings
+    if not args.force:
+        backend, weights, imgsz = resolve_model(args.backend, args.weights, args.imgsz)
+        settings = run_settings(backend, weights, imgsz, args.interval, args.conf, args.iou, args.format,
+                                args.binary, not args.no_track, args.track_iou)
+        skipped = [v for v in video_files if is_up_to_date(v, output_dir, settings)]
+        video_files = [v for v in video_files if v not in skipped]
+        if skipped:
+            print(f"Skipping {len(skipped)} up-to-date videos (use --force to regenerate)")
+
+    if not video_files:
+        print("\n✅ All bounding box files are up to date!")
+        return
 
+    # Longest videos first, so one long video doesn't start last and hold up the end of the run
+    frame_counts = {v: count_frames(v) for v in video_files}
+    video_files.sort(key=lambda v: frame_counts[v], reverse=True)
+    total_frames = sum(frame_counts.values())
+
+    workers = max(1, min(args.workers, len(video_files)))
+    threads = args.threads or max(1, (os.cpu_count() or 1) // workers)
+    print(f"Processing {len(video_files)} videos ({total_frames} frames) with {workers} workers, "
+          f"{threads} threads each\n")
+
+    job_args = (str(output_dir), args.interval, args.batch_size, args.conf, args.iou, args.format, args.binary,
+                not args.no_resume, not args.no_track, args.track_iou)
+    start = time.time()
+    done_frames = 0
+    failed = []
+
+    # Spawn rather than fork: forking after torch has started its thread pools can deadlock
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker,
+                             initargs=(args.backend, args.weights, args.imgsz, threads,
+                                       None if args.no_cache else args.cache, args.cache_max_mb)) as executor:
+        futures = {executor.submit(_process_video, str(v), *job_args): v for v in video_files}
+
+        for i, future in enumerate(as_completed(futures), 1):
+            video_path = futures[future]
+            done_frames += frame_counts[video_path]
+            elapsed = time.time() - start
+            eta = elapsed / done_frames * (total_frames - done_frames)
+
+            try:
+                frames, video_elapsed = future.result()
+            except Exception as e:
+                failed.append(video_path)
+                print(f"[{i}/{len(video_files)}] ❌ Error processing {video_path.name}: {e}")
+                continue
+
+            if frames == 0:
+                failed.append(video_path)
+                continue
+
+            print(f"[{i}/{len(video_files)}] ✅ {video_path.name}: {frames} frames in {video_elapsed:.1f}s "
+                  f"({frames / video_elapsed:.0f} fps) | "
+                  f"{done_frames / total_frames * 100:.0f}% done, elapsed {format_duration(elapsed)}, "
+                  f"ETA {format_duration(eta)}")
+
+    elapsed = time.time() - start
     print("\n" + "="*60)
-    print("✅ All videos processed!")
+    if failed:
+        print(f"⚠️  {len(video_files) - len(failed)}/{len(video_files)} videos processed, {len(failed)} failed")
+    else:
+        print("✅ All videos processed!")
     print("="*60)
+    print(f"Total time: {format_duration(elapsed)} ({total_frames / elapsed:.0f} frames/s)")
     print(f"\nBounding box files saved to: {output_dir}")
     print("\nNext steps:")
     print("1. Use the React component to display bounding boxes")
@@ -4,6 +4,7 @@ interface BoundingBox {
   boxes: number[][]; // [[x1, y1, x2, y2], ...]
   confidences: number[];
   is_keyframe: boolean;
+  track_ids?: number[];    // present when the boxes were tracked across keyframes
 }
 
 interface VideoInfo {
@@ -15,11 +16,74 @@ interface VideoInfo {
   frame_interval: number;
 }
 
-interface BoundingBoxData {
+// v1: one entry per frame
+interface BoundingBoxDataV1 {
   video_info: VideoInfo;
   frames: Record<string, BoundingBox>;
 }
 
+// v2: keyframes only, as columnar arrays (see bbox_format.py)
+interface BoundingBoxDataV2 {
+  version: 2;
+  video_info: VideoInfo;
+  frame_count: number;
+  keyframes: number[];     // frame index of each keyframe, increasing
+  box_offsets: number[];   // boxes of keyframe k are box_offsets[k]..box_offsets[k + 1]
+  boxes: number[];         // flat [x1, y1, x2, y2, ...]
+  confidences: number[];   // confidence * 255
+  track_ids?: number[];    // persistent track ID of each box, if tracked (see tracking.py)
+}
+
+interface BoundingBoxData {
+  video_info: VideoInfo;
+  boxesAt: (frame: number) => number[][];
+}
+
+const toBoundingBoxData = (data: BoundingBoxDataV1 | BoundingBoxDataV2): BoundingBoxData => {
+  if (!("version" in data) || data.version !== 2) {
+    const { frames } = data as BoundingBoxDataV1;
+    return {
+      video_info: data.video_info,
+      boxesAt: (frame) => frames[frame.toString()]?.boxes ?? [],
+    };
+  }
+
+  const { keyframes, box_offsets, boxes, frame_count, track_ids } = data;
+  return {
+    video_info: data.video_info,
+    boxesAt: (frame) => {
+      if (frame < 0 || frame >= frame_count) return [];
+
+      // Binary search for the last keyframe at or before this frame
+      let lo = 0;
+      let hi = keyframes.length;
+      while (lo < hi) {
+        const mid = (lo + hi) >> 1;
+        if (keyframes[mid] <= frame) lo = mid + 1;
+        else hi = mid;
+      }
+      const k = lo - 1;
+      if (k < 0) return [];
+
+      const result: number[][] = [];
+      for (let i = box_offsets[k]; i < box_offsets[k + 1]; i++) {
+        result.push(boxes.slice(i * 4, i * 4 + 4));
+      }
+      if (!track_ids || k + 1 >= keyframes.length || frame === keyframes[k]) return result;
+
+      // Move each track towards its box in the next keyframe; tracks that end here hold still
+      const alpha = (frame - keyframes[k]) / (keyframes[k + 1] - keyframes[k]);
+      const next = new Map<number, number>();
+      for (let j = box_offsets[k + 1]; j < box_offsets[k + 2]; j++) next.set(track_ids[j], j);
+      return result.map((box, n) => {
+        const j = next.get(track_ids[box_offsets[k] + n]);
+        if (j === undefined) return box;
+        return box.map((v, c) => v + alpha * (boxes[j * 4 + c] - v));
+      });
+    },
+  };
+};
+
 interface BoundingBoxesOverlayProps {
   videoRef: React.RefObject<HTMLVideoElement>;
   videoSrc: string;
@@ -57,7 +121,7 @@ export const BoundingBoxesOverlay = ({ videoRef, videoSrc, enabled = true }: Bou
           throw new Error(`Failed to load bounding boxes: ${response.status}`);
         }
 
-        const data: BoundingBoxData = await response.json();
+        const data = toBoundingBoxData(await response.json());
         setBoxData(data);
         console.log(`✅ [BoundingBoxes] Loaded data for ${videoName}:`, {
           totalFrames: data.video_info.total_frames,
@@ -92,13 +156,7 @@ export const BoundingBoxesOverlay = ({ videoRef, videoSrc, enabled = true }: Bou
       const currentFrame = Math.floor(currentTime * fps);
 
       // Get boxes for this frame
-      const frameData = boxData.frames[currentFrame.toString()];
-
-      if (frameData && frameData.boxes.length > 0) {
-        setCurrentBoxes(frameData.boxes);
-      } else {
-        setCurrentBoxes([]);
-      }
+      setCurrentBoxes(boxData.boxesAt(currentFrame));
     };
 
     // Update on timeupdate event
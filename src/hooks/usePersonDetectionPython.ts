@@ -5,12 +5,36 @@ export interface DetectedPerson {
   score: number; // confidence 0-1
 }
 
+// Binary frame header, must match FRAME_HEADER in detection_server.py:
+// uint8 version, uint8 codec, uint16 reserved, uint32 camera_id, float64 timestamp, float32 confidence
+const FRAME_HEADER_SIZE = 20;
+const PROTOCOL_VERSION = 1;
+const CODEC_JPEG = 0;
+
+const encodeBinaryFrame = (jpeg: ArrayBuffer, cameraId: number, confidence: number): ArrayBuffer => {
+  const buffer = new ArrayBuffer(FRAME_HEADER_SIZE + jpeg.byteLength);
+  const view = new DataView(buffer);
+  view.setUint8(0, PROTOCOL_VERSION);
+  view.setUint8(1, CODEC_JPEG);
+  view.setUint16(2, 0, true);
+  view.setUint32(4, cameraId, true);
+  view.setFloat64(8, Date.now(), true);
+  view.setFloat32(16, confidence, true);
+  new Uint8Array(buffer, FRAME_HEADER_SIZE).set(new Uint8Array(jpeg));
+  return buffer;
+};
+
+const canvasToJpeg = (canvas: HTMLCanvasElement, quality: number): Promise<Blob | null> =>
+  new Promise((resolve) => canvas.toBlob(resolve, 'image/jpeg', quality));
+
 interface DetectionResponse {
   camera_id: number;
   detections: DetectedPerson[];
   frame_width: number;
   frame_height: number;
   timestamp: string;
+  dropped_frames?: number; // frames replaced by a newer one before they were processed
+  frame_age_ms?: number; // server-side time from receiving the frame to sending this result
 }
 
 export const usePersonDetectionPython = (
@@ -19,7 +43,8 @@ export const usePersonDetectionPython = (
   isEnabled: boolean = true,
   detectionInterval: number = 300, // Send frame every 300ms
   confidenceThreshold: number = 0.5,
-  serverUrl: string = 'ws://localhost:8001/ws'
+  serverUrl: string = 'ws://localhost:8001/ws',
+  binaryProtocol: boolean = false // Send raw JPEG bytes instead of base64-in-JSON
 ) => {
   const [detections, setDetections] = useState<DetectedPerson[]>([]);
   const [isConnected, setIsConnected] = useState(false);
@@ -124,6 +149,15 @@ export const usePersonDetectionPython = (
           if (ctx) {
             ctx.drawImage(video, 0, 0, canvas.width, canvas.height);
 
+            if (binaryProtocol) {
+              // Send header + raw JPEG bytes (no base64, no JSON)
+              const blob = await canvasToJpeg(canvas, 0.8);
+              if (blob && ws.readyState === WebSocket.OPEN) {
+                ws.send(encodeBinaryFrame(await blob.arrayBuffer(), cameraId, confidenceThreshold));
+              }
+              return;
+            }
+
             // Convert canvas to base64 JPEG
             const base64Data = canvas.toDataURL('image/jpeg', 0.8).split(',')[1];
 
@@ -152,7 +186,7 @@ export const usePersonDetectionPython = (
         clearInterval(intervalRef.current);
       }
     };
-  }, [isEnabled, isConnected, videoRef, cameraId, detectionInterval, confidenceThreshold]);
+  }, [isEnabled, isConnected, videoRef, cameraId, detectionInterval, confidenceThreshold, binaryProtocol]);
 
   return {
     detections,
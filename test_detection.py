@@ -1,12 +1,15 @@
 """
 Quick test script to verify the detection server works
-This script tests the YOLOv8 model on a sample video
+This script tests the configured detector on a sample video
+(set VIEWGUARD_BACKEND / VIEWGUARD_MODEL to try ONNX Runtime or the stub).
+For repeatable performance numbers, use benchmarks/run.py instead.
 """
 
 import cv2
-from ultralytics import YOLO
 import time
 
+from detectors import load_detector
+
 def test_detection(video_path: str, max_frames: int = 30):
     """Test person detection on a video file"""
 
@@ -17,9 +20,9 @@ def test_detection(video_path: str, max_frames: int = 30):
     print(f"Processing up to {max_frames} frames...\n")
 
     # Load model
-    print("Loading YOLOv8 model...")
-    model = YOLO('yolov8n.pt')
-    print("✓ Model loaded\n")
+    print("Loading detector...")
+    detector = load_detector()
+    print(f"✓ Model loaded: {detector.describe()}\n")
 
     # Open video
     cap = cv2.VideoCapture(video_path)
@@ -47,21 +50,17 @@ def test_detection(video_path: str, max_frames: int = 30):
             break
 
         # Run detection
-        results = model(frame, verbose=False, classes=[0])  # 0 = person
+        boxes, confidences = detector.predict([frame])[0]
 
         # Count detections
-        persons_in_frame = 0
-        for result in results:
-            boxes = result.boxes
-            persons_in_frame = len(boxes)
-            total_persons += persons_in_frame
-
-            if persons_in_frame > 0:
-                detection_count += 1
-                # Print detection info
-                for box in boxes:
-                    confidence = float(box.conf[0])
-                    print(f"Frame {frame_count:3d}: Person detected (confidence: {confidence:.2f})")
+        persons_in_frame = len(boxes)
+        total_persons += persons_in_frame
+
+        if persons_in_frame > 0:
+            detection_count += 1
+            # Print detection info
+            for confidence in confidences:
+                print(f"Frame {frame_count:3d}: Person detected (confidence: {confidence:.2f})")
 
         frame_count += 1
 
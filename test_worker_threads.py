@@ -0,0 +1,51 @@
+"""
+Tests for how the detection server divides CPU threads between inference workers
+Run with: python -m pytest test_worker_threads.py
+"""
+
+import pytest
+
+import detection_server
+
+
+@pytest.fixture
+def eight_cores(monkeypatch):
+    monkeypatch.setattr(detection_server.os, "cpu_count", lambda: 8)
+
+
+def use_backend(monkeypatch, backend):
+    monkeypatch.setattr(detection_server, "resolve_model", lambda: (backend, "", 640))
+
+
+def test_process_workers_split_the_cores(eight_cores, monkeypatch):
+    for backend in ("ultralytics", "onnx"):
+        use_backend(monkeypatch, backend)
+        assert detection_server.threads_per_worker(4, 0, "process") == 2
+
+
+def test_thread_workers_split_the_cores_with_per_session_threads(eight_cores, monkeypatch):
+    use_backend(monkeypatch, "onnx")
+    assert detection_server.threads_per_worker(4, 0, "thread") == 2
+
+
+def test_torch_thread_workers_get_all_cores(eight_cores, monkeypatch):
+    # torch.set_num_threads is process-wide: a split would leave 4 workers on 2 threads in total
+    use_backend(monkeypatch, "ultralytics")
+    assert detection_server.threads_per_worker(4, 0, "thread") == 8
+
+
+def test_explicit_threads_win(eight_cores, monkeypatch):
+    use_backend(monkeypatch, "ultralytics")
+    assert detection_server.threads_per_worker(4, 3, "thread") == 3
+    assert detection_server.threads_per_worker(4, 3, "process") == 3
+
+
+@pytest.mark.skipif(detection_server.WORKER_THREADS > 0, reason="VIEWGUARD_WORKER_THREADS is set")
+@pytest.mark.parametrize("backend, expected", [("ultralytics", 8), ("onnx", 2)])
+def test_thread_executor_default_threads(eight_cores, monkeypatch, backend, expected):
+    use_backend(monkeypatch, backend)
+    executor = detection_server.create_executor("thread", 4)
+    try:
+        assert executor.submit(lambda: detection_server._worker_state.num_threads).result() == expected
+    finally:
+        executor.shutdown(wait=True)
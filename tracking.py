@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+ViewGuard Person Tracking
+Lightweight SORT-style multi-object tracker: a constant-velocity Kalman filter
+per track, greedy IoU matching between predicted tracks and new detections, and
+persistent integer track IDs. Runs on keyframes only, so every detection keeps
+its exact box and just gains an ID.
+
+With IDs, the boxes between two keyframes can be linearly interpolated per
+track (interpolate_boxes) instead of freezing until the next keyframe, which
+allows a larger keyframe interval for the same visual smoothness.
+
+Usage:
+    tracker = Tracker()
+    for boxes in keyframe_boxes:          # [N, 4] x1, y1, x2, y2 per keyframe
+        track_ids = tracker.update(boxes)  # [N] persistent IDs
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+
+
+def iou_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of [N, 4] and [M, 4] xyxy boxes, as [N, M]"""
+    boxes_a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=np.float64).reshape(-1, 4)
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+
+def greedy_match(iou: np.ndarray, threshold: float) -> List[Tuple[int, int]]:
+    """Pair rows with columns by descending IoU, each used at most once, keeping pairs >= threshold"""
+    if iou.size == 0:
+        return []
+    rows, cols = np.nonzero(iou >= threshold)
+    order = np.argsort(-iou[rows, cols], kind="stable")
+    used_rows, used_cols = set(), set()
+    matches = []
+    for row, col in zip(rows[order].tolist(), cols[order].tolist()):
+        if row not in used_rows and col not in used_cols:
+            used_rows.add(row)
+            used_cols.add(col)
+            matches.append((row, col))
+    return matches
+
+
+class KalmanBoxTracker:
+    """
+    Constant-velocity Kalman filter over [cx, cy, area, aspect ratio] with
+    velocities for cx, cy and area, as in SORT. One step = one keyframe.
+    """
+
+    # State transition and measurement matrices (shared by all tracks)
+    F = np.eye(7)
+    F[0, 4] = F[1, 5] = F[2, 6] = 1.0
+    H = np.eye(4, 7)
+    Q = np.diag([1.0, 1.0, 1.0, 1.0, 0.01, 0.01, 0.0001])
+    R = np.diag([1.0, 1.0, 10.0, 10.0])
+
+    def __init__(self, box: np.ndarray, track_id: int):
+        self.id = track_id
+        self.x = np.zeros(7)
+        self.x[:4] = self._to_measurement(box)
+        self.P = np.diag([10.0, 10.0, 10.0, 10.0, 1000.0, 1000.0, 1000.0])
+        self.time_since_update = 0
+        self.hits = 1
+
+    @staticmethod
+    def _to_measurement(box: np.ndarray) -> np.ndarray:
+        width, height = box[2] - box[0], box[3] - box[1]
+        return np.array([box[0] + width / 2, box[1] + height / 2, width * height, width / max(height, 1e-6)])
+
+    def box(self) -> np.ndarray:
+        """Current state estimate as [x1, y1, x2, y2]"""
+        cx, cy, area, ratio = self.x[:4]
+        area = max(area, 0.0)
+        width = np.sqrt(area * max(ratio, 0.0))
+        height = area / width if width > 0 else 0.0
+        return np.array([cx - width / 2, cy - height / 2, cx + width / 2, cy + height / 2])
+
+    def predict(self) -> np.ndarray:
+        if self.x[2] + self.x[6] <= 0:
+            self.x[6] = 0.0  # don't let the area shrink below zero
+        self.x = self.F @ self.x
+        self.P = self.F @ self.P @ self.F.T + self.Q
+        self.time_since_update += 1
+        return self.box()
+
+    def update(self, box: np.ndarray):
+        residual = self._to_measurement(box) - self.H @ self.x
+        S = self.H @ self.P @ self.H.T + self.R
+        K = self.P @ self.H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ residual
+        self.P = (np.eye(7) - K @ self.H) @ self.P
+        self.time_since_update = 0
+        self.hits += 1
+
+
+class Tracker:
+    """
+    Assigns persistent IDs to per-keyframe detections. Tracks that go unmatched
+    for more than `max_age` keyframes are dropped; a detection that matches no
+    track (IoU below `iou_threshold` with every prediction) starts a new one.
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, max_age: int = 2):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.tracks: List[KalmanBoxTracker] = []
+        self.next_id = 1
+
+    def update(self, boxes: np.ndarray) -> np.ndarray:
+        """Match one keyframe's [N, 4] xyxy boxes to tracks; returns their [N] track IDs"""
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        predicted = np.array([track.predict() for track in self.tracks]).reshape(-1, 4)
+
+        track_ids = np.zeros(len(boxes), dtype=np.int32)
+        matched = set()
+        for detection, track_index in greedy_match(iou_matrix(boxes, predicted), self.iou_threshold):
+            track = self.tracks[track_index]
+            track.update(boxes[detection])
+            track_ids[detection] = track.id
+            matched.add(detection)
+
+        for detection in range(len(boxes)):
+            if detection not in matched:
+                track = KalmanBoxTracker(boxes[detection], self.next_id)
+                self.next_id += 1
+                self.tracks.append(track)
+                track_ids[detection] = track.id
+
+        self.tracks = [track for track in self.tracks if track.time_since_update <= self.max_age]
+        return track_ids
+
+
+def interpolate_boxes(boxes_a: np.ndarray, ids_a: np.ndarray, boxes_b: np.ndarray, ids_b: np.ndarray,
+                      alphas: np.ndarray) -> np.ndarray:
+    """
+    Boxes of keyframe A moved towards keyframe B, for each fraction in `alphas`
+    (0 = at A, 1 = at B). Tracks present in both keyframes are linearly
+    interpolated; tracks that end at A hold their box. Returns [len(alphas), N, 4]
+    in keyframe A's box order, computed for all frames at once.
+    """
+    boxes_a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 4)
+    targets = boxes_a.copy()
+    if len(ids_b):
+        order = np.argsort(ids_b)
+        positions = np.searchsorted(ids_b, ids_a, sorter=order).clip(max=len(ids_b) - 1)
+        in_b = ids_b[order[positions]] == ids_a
+        targets[in_b] = np.asarray(boxes_b, dtype=np.float64).reshape(-1, 4)[order[positions[in_b]]]
+    alphas = np.asarray(alphas, dtype=np.float64)[:, None, None]
+    return boxes_a[None] + alphas * (targets - boxes_a)[None]